@@ -0,0 +1,179 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import panel
+
+############################
+# Compact Bar Container
+############################
+# The per-ticker screeners used to keep one DataFrame per ticker: float64
+# OHLC, int64 Volume, a tz-aware DatetimeIndex, and then float64 indicator
+# and int64 flag columns added on top, each with its own index and block
+# manager. Bars keeps the same data for every ticker at once:
+#
+#     times    one int64 array of bar times (ns since the epoch, UTC), shared
+#              by every field and ticker
+#     values   field/indicator name -> contiguous (bars x tickers) float64
+#              array; with SCANNER_FLOAT32=1 the OHLC prices are float32
+#     flags    signal name -> (bars x tickers) int8 array
+#
+# so memory per ticker is a few bytes per bar and field, and the indicator
+# kernels in panel.py read one contiguous block instead of gathering a column
+# out of 500 frames. DataFrames are only built at the edges: `panel()` for a
+# kernel's input, `frame()` for a ticker's rows going to the bar store, and
+# `signals()` for the screener results.
+#
+# Only the raw prices can go to float32: indicators (R² near 0.9, RSI near
+# 30/70, linreg crossovers) stay float64 so no threshold or cross flips, and
+# so does Volume, which float32 cannot hold exactly past 2**24. `panel()`
+# and `frame()` hand prices out as float64 re-rounded to the decimals
+# `round_prices` applied, which restores them exactly for prices below about
+# 1e5 at 2 decimals (float32 keeps ~7 significant digits); above that the
+# float32 prices are off by up to a few cents, hence opt-in.
+
+FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+PRICE_FIELDS = ('Open', 'High', 'Low', 'Close')
+
+
+def default_dtype():
+    """
+    Storage type for prices: float64, or float32 with SCANNER_FLOAT32=1.
+    """
+    return np.float32 if os.getenv('SCANNER_FLOAT32') == '1' else np.float64
+
+
+class Bars:
+    """
+    Bars and derived columns for many tickers on one shared time axis.
+    """
+
+    def __init__(self, times, tickers, tz=None, dtype=None):
+        self.times = np.ascontiguousarray(times, dtype=np.int64)
+        self.tickers = list(tickers)
+        self.tz = tz
+        self.dtype = np.dtype(default_dtype() if dtype is None else dtype)
+        self.values = {}
+        self.flags = {}
+        self.decimals = None
+
+    @classmethod
+    def from_panels(cls, panels, dtype=None):
+        """
+        From (bars x tickers) panels sharing one index, e.g. panel.from_history.
+        """
+        first = next(iter(panels.values()))
+        index = pd.DatetimeIndex(first.index)
+        bars = cls(_epoch_ns(index), first.columns, index.tz, dtype)
+        for field, values in panels.items():
+            bars.set(field, values.to_numpy())
+        return bars
+
+    @classmethod
+    def from_frames(cls, frames, fields=FIELDS, dtype=None):
+        """
+        From {ticker: DataFrame} as fetcher.download_many returns them, on
+        the union of their bar times. Bars a ticker lacks are NaN.
+        """
+        frames = {t: df for t, df in frames.items() if df is not None and not df.empty}
+        tz = next((df.index.tz for df in frames.values()), None)
+        stamps = {t: _epoch_ns(pd.DatetimeIndex(df.index)) for t, df in frames.items()}
+        times = np.unique(np.concatenate(list(stamps.values()))) if stamps else np.empty(0, np.int64)
+        bars = cls(times, frames, tz, dtype)
+        for field in fields:
+            out = np.full((len(times), len(frames)), np.nan, dtype=bars.dtype_for(field))
+            for col, (ticker, df) in enumerate(frames.items()):
+                columns = df.columns.get_level_values(0) if isinstance(df.columns, pd.MultiIndex) else df.columns
+                if field not in columns:
+                    continue
+                rows = np.searchsorted(times, stamps[ticker])
+                out[rows, col] = df.iloc[:, list(columns).index(field)].to_numpy(dtype=np.float64)
+            bars.values[field] = out
+        return bars
+
+    @property
+    def index(self):
+        index = pd.DatetimeIndex(self.times.view('datetime64[ns]'))
+        return index.tz_localize('UTC').tz_convert(self.tz) if self.tz is not None else index
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + sum(a.nbytes for a in (*self.values.values(), *self.flags.values()))
+
+    def dtype_for(self, name):
+        # `dtype` applies to the OHLC prices only
+        return self.dtype if name in PRICE_FIELDS else np.dtype(np.float64)
+
+    def __getitem__(self, name):
+        return self.values[name] if name in self.values else self.flags[name]
+
+    def set(self, name, values):
+        """
+        Stores `values` ((bars x tickers) array or panel) under `name` in the
+        storage type, and returns `values` as given.
+        """
+        array = values.to_numpy() if isinstance(values, pd.DataFrame) else values
+        self.values[name] = np.array(array, dtype=self.dtype_for(name), order='C')
+        return values
+
+    def set_flag(self, name, values):
+        """
+        Stores a 0/1 flag panel under `name` as int8.
+        """
+        array = values.to_numpy() if isinstance(values, pd.DataFrame) else np.asarray(values)
+        self.flags[name] = np.ascontiguousarray(array == 1, dtype=np.int8)
+
+    def round_prices(self, decimals=2):
+        self.decimals = decimals
+        for field in PRICE_FIELDS:
+            if field in self.values:
+                np.round(self.values[field], decimals, out=self.values[field])
+
+    def float64(self, name):
+        """
+        Values of `name` as float64 (flags as stored), prices re-rounded to
+        the decimals `round_prices` applied.
+        """
+        values = self[name]
+        if name in self.flags or values.dtype == np.float64:
+            return values
+        values = values.astype(np.float64)
+        if name in PRICE_FIELDS and self.decimals is not None:
+            np.round(values, self.decimals, out=values)
+        return values
+
+    def panel(self, name):
+        """
+        `name` as a (bars x tickers) DataFrame, for the panel.py kernels.
+        """
+        return pd.DataFrame(self.float64(name), index=self.index, columns=self.tickers)
+
+    def frame(self, ticker, columns=None):
+        """
+        One ticker's bars with every value and flag column, as the
+        per-ticker scripts built them; rows without a Close are dropped.
+        """
+        col = self.tickers.index(ticker)
+        names = list(self.values) + list(self.flags) if columns is None else columns
+        df = pd.DataFrame({name: self.float64(name)[:, col] for name in names}, index=self.index)
+        if 'Close' in self.values:
+            df = df[~np.isnan(self.values['Close'][:, col])]
+        return df
+
+    def signals(self, columns, recent):
+        """
+        Flagged bars within `recent` of each ticker's last bar (see
+        panel.recent_signals). `columns` maps output names to flag names.
+        """
+        flags = {out: self.panel(name) for out, name in columns.items()}
+        return panel.recent_signals(flags, self.panel('Close'), recent)
+
+
+def _epoch_ns(index):
+    """
+    Bar times as int64 ns since the epoch (UTC for tz-aware indexes).
+    """
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return index.as_unit('ns').asi8
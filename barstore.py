@@ -0,0 +1,211 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+
+import metrics
+
+############################
+# Columnar Bar Store
+############################
+# Bars are kept as one Arrow IPC file per timeframe and ticker:
+#
+#     stockdata/bars/{timeframe}/{ticker}.arrow
+#
+# Files are written uncompressed so they can be memory-mapped; reading a
+# ticker maps the file and only copies the rows inside the requested time
+# range. This replaces the per-ticker `stockdata/{ticker}_{tf}_data.csv`
+# dumps: no text parsing or formatting, and reloading history is close to
+# free. Any extra columns (indicators, signal flags) are stored alongside
+# the OHLCV columns.
+
+DEFAULT_ROOT = os.path.join('stockdata', 'bars')
+TIME_COLUMN = '__time__'
+
+
+class BarStore:
+    """
+    Reads and writes per-ticker bar tables under `root`, partitioned by
+    timeframe.
+    """
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+
+    def path(self, ticker, timeframe):
+        # Tickers such as BRK.B are fine as file names; '/' is not.
+        safe = ticker.replace('/', '_')
+        return os.path.join(self.root, timeframe, f'{safe}.arrow')
+
+    def tickers(self, timeframe):
+        """
+        Returns the tickers stored for `timeframe`.
+        """
+        folder = os.path.join(self.root, timeframe)
+        if not os.path.isdir(folder):
+            return []
+        return sorted(name[:-len('.arrow')] for name in os.listdir(folder) if name.endswith('.arrow'))
+
+    ############################
+    # Writing
+    ############################
+    def write(self, ticker, timeframe, df):
+        """
+        Replaces the stored bars for `ticker` with `df` (DatetimeIndex, one
+        column per field). The file is swapped in atomically.
+        """
+        path = self.path(ticker, timeframe)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._write_table(path, self._to_table(df))
+
+    @staticmethod
+    def _to_table(df):
+        df = df.sort_index()
+        # yf.download returns (Price, Ticker) columns even for one ticker
+        if isinstance(df.columns, pd.MultiIndex):
+            df = df.copy()
+            df.columns = df.columns.get_level_values(0)
+        frame = df.reset_index(drop=True)
+        frame.insert(0, TIME_COLUMN, df.index)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[b'index_name'] = (df.index.name or '').encode()
+        return table.replace_schema_metadata(metadata)
+
+    @staticmethod
+    def _write_table(path, table):
+        tmp_path = path + '.tmp'
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+
+    def append(self, ticker, timeframe, df):
+        """
+        Adds the bars in `df` to the stored ones for `ticker`, replacing
+        stored bars from the first timestamp of `df` on. Only the new rows
+        are converted; the stored rows are copied over as Arrow data.
+        """
+        table = self._table(ticker, timeframe)
+        if table is None or df.empty:
+            if table is None:
+                self.write(ticker, timeframe, df)
+            return
+        new = self._to_table(df)
+        times = pd.DatetimeIndex(table.column(TIME_COLUMN).to_pandas())
+        keep, _ = self._bounds(times, new.column(TIME_COLUMN)[0].as_py(), None)
+        try:
+            table = pa.concat_tables([table.slice(0, keep), new.cast(table.schema)])
+        except (pa.ArrowException, ValueError):
+            # Columns or types changed: go through pandas once
+            old = self.read(ticker, timeframe).iloc[:keep]
+            table = self._to_table(pd.concat([old, df.sort_index()]))
+        self._write_table(self.path(ticker, timeframe), table)
+
+    def write_panels(self, timeframe, panels, tickers=None, append=False):
+        """
+        Writes one file per ticker from a dict of (bars x tickers) panels,
+        keeping only the bars each ticker has a Close for. With `append`,
+        the bars are added to the stored ones (see `append`) instead of
+        replacing them.
+        """
+        close = panels['Close']
+        tickers = list(tickers if tickers is not None else close.columns)
+        with metrics.stage(f'store_{timeframe}', items=len(tickers)):
+            for ticker in tickers:
+                has_bar = close[ticker].notna()
+                df = pd.DataFrame({name: panel[ticker][has_bar] for name, panel in panels.items()})
+                try:
+                    if append:
+                        self.append(ticker, timeframe, df)
+                    else:
+                        self.write(ticker, timeframe, df)
+                except Exception as e:
+                    print(f"Failed to store bars for ticker {ticker} on timeframe {timeframe}: {e}")
+
+    ############################
+    # Reading
+    ############################
+    def _table(self, ticker, timeframe):
+        """
+        Memory-maps the stored table, or returns None if there is none.
+        """
+        path = self.path(ticker, timeframe)
+        if not os.path.exists(path):
+            return None
+        return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+    @staticmethod
+    def _bounds(times, start, end):
+        """
+        Row range [lo, hi) of the sorted DatetimeIndex `times` inside
+        [start, end]. Naive bounds are taken to be in the stored timezone.
+        """
+        def align(ts):
+            ts = pd.Timestamp(ts)
+            if times.tz is not None and ts.tzinfo is None:
+                return ts.tz_localize(times.tz)
+            if times.tz is None and ts.tzinfo is not None:
+                return ts.tz_convert(None)
+            return ts
+
+        # Stored times may be in seconds; bounds can carry microseconds
+        times = times.as_unit('ns')
+        lo = 0 if start is None else int(times.searchsorted(align(start), side='left'))
+        hi = len(times) if end is None else int(times.searchsorted(align(end), side='right'))
+        return lo, max(lo, hi)
+
+    def read(self, ticker, timeframe, start=None, end=None, columns=None):
+        """
+        Returns the stored bars for `ticker` between `start` and `end`
+        (inclusive, either may be None), or None if nothing is stored.
+        """
+        table = self._table(ticker, timeframe)
+        if table is None:
+            return None
+        if start is not None or end is not None:
+            times = pd.DatetimeIndex(table.column(TIME_COLUMN).to_pandas())
+            lo, hi = self._bounds(times, start, end)
+            table = table.slice(lo, hi - lo)
+        if columns is not None:
+            table = table.select([TIME_COLUMN] + [c for c in columns if c in table.column_names])
+        df = table.to_pandas()
+        index_name = (table.schema.metadata or {}).get(b'index_name', b'').decode() or None
+        df.index = pd.DatetimeIndex(df.pop(TIME_COLUMN))
+        df.index.name = index_name
+        return df
+
+    def read_panels(self, timeframe, tickers=None, start=None, end=None, columns=None):
+        """
+        Loads many tickers into a dict of (bars x tickers) panels, the same
+        shape `panel.from_history` returns.
+        """
+        frames = {}
+        for ticker in tickers if tickers is not None else self.tickers(timeframe):
+            df = self.read(ticker, timeframe, start, end, columns)
+            if df is not None and not df.empty:
+                frames[ticker] = df
+        if not frames:
+            return {}
+        wide = pd.concat(frames, axis=1, names=['Ticker', 'Price'])
+        fields = wide.columns.get_level_values('Price').unique()
+        return {field: wide.xs(field, axis=1, level='Price') for field in fields}
+
+    def latest_timestamp(self, ticker, timeframe):
+        """
+        Timestamp of the newest stored bar, or None.
+        """
+        table = self._table(ticker, timeframe)
+        if table is None or table.num_rows == 0:
+            return None
+        times = table.column(TIME_COLUMN)
+        return pd.Timestamp(times[len(times) - 1].as_py())
+
+    def earliest_timestamp(self, ticker, timeframe):
+        """
+        Timestamp of the oldest stored bar, or None.
+        """
+        table = self._table(ticker, timeframe)
+        if table is None or table.num_rows == 0:
+            return None
+        return pd.Timestamp(table.column(TIME_COLUMN)[0].as_py())
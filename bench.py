@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import panel
+from barstore import BarStore
+from strategies import STRATEGIES, Dataset
+
+############################
+# Synthetic Pipeline Benchmark
+############################
+# Drives the real screener stages over synthetic OHLCV panels of 500, 2,000
+# and 10,000 tickers on 60m, 2h and 1d bars: resample, every registered
+# strategy in strategies.py as engine.py evaluates it (each indicator --
+# linreg, r2, rsi -- timed on its own, then the crossover/threshold flags and
+# the result assembly), bar store and CSV output. Records per-stage wall
+# time, throughput (ticker-bars per second) and peak RSS as JSON:
+#
+#     python bench.py                           # all sizes -> bench_results/
+#     python bench.py --sizes 500 2000          # selected sizes
+#     python bench.py --compare old.json new.json
+#
+# Every size runs in its own subprocess so peak RSS is per size, not the
+# running maximum of the whole suite.
+
+SIZES = [500, 2000, 10000]
+RESULTS_DIR = 'bench_results'
+
+# Trading days of history per source interval, as the screeners download
+HISTORY_DAYS = {'60m': 30, '1d': 90}
+
+# Benchmarked bars -> the strategy timeframe evaluated on them
+TIMEFRAMES = {'60m': '1h', '2h': '2h', '1d': '1d'}
+
+
+def synthetic_history(n_tickers, interval, days, seed=0):
+    """
+    Random-walk OHLCV panels shaped like `panel.from_history` output, with
+    a few late listings so the NaN-aware paths are exercised.
+    """
+    rng = np.random.default_rng(seed)
+    sessions = pd.bdate_range(end=pd.Timestamp('2026-10-15'), periods=days)
+    if interval == '60m':
+        index = pd.DatetimeIndex([d + pd.Timedelta(hours=h, minutes=30)
+                                  for d in sessions for h in range(9, 16)])
+    else:
+        index = sessions
+    index = index.tz_localize('America/New_York')
+    n = len(index)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (n, n_tickers)), axis=0))
+    spread = np.abs(rng.normal(0, 0.004, (n, n_tickers)))
+    late = rng.random(n_tickers) < 0.02
+    close[:n // 3, late] = np.nan
+    columns = [f'T{i:05d}' for i in range(n_tickers)]
+
+    def frame(values):
+        return pd.DataFrame(values, index=index, columns=columns)
+
+    return {
+        'Open': frame(close * (1 + rng.normal(0, 0.002, (n, n_tickers)))).round(2),
+        'High': frame(close * (1 + spread)).round(2),
+        'Low': frame(close * (1 - spread)).round(2),
+        'Close': frame(close).round(2),
+        'Volume': frame(rng.integers(1000, 100000, (n, n_tickers)).astype(float)),
+    }
+
+
+class Timer:
+    """
+    Collects wall time per named stage. Time spent in a stage nested inside
+    another is counted in the inner stage only, so the stages add up to the
+    total.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._inner = []
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        self._inner.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            inner = self._inner.pop()
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed - inner
+            if self._inner:
+                self._inner[-1] += elapsed
+
+
+class TimedDataset(Dataset):
+    """
+    A Dataset timing each indicator computation as a stage named after the
+    kernel (linreg, r2, rsi). Every indicator is computed once per dataset
+    whichever strategy asks first, so its time does not depend on the
+    strategy order.
+    """
+
+    def __init__(self, timeframe, bars, timer):
+        super().__init__(timeframe, bars)
+        self.timer = timer
+
+    def compute(self, func, source, *args):
+        if (func.__name__, source, args) in self._cache:
+            return super().compute(func, source, *args)
+        with self.timer.stage(func.__name__):
+            return super().compute(func, source, *args)
+
+    def tail(self, recent, warmup):
+        key = (recent, warmup)
+        if key not in self._tails:
+            start = panel.tail_start(self.bars['Close'], recent, warmup)
+            bars = {field: values.iloc[start:] for field, values in self.bars.items()}
+            self._tails[key] = TimedDataset(self.timeframe, bars, self.timer)
+        return self._tails[key]
+
+
+def run_pipeline(bars, timeframe, out_dir, timer):
+    """
+    One screener pass over `bars`: every registered strategy on this
+    timeframe, split as `Strategy.evaluate` runs it into the indicators
+    (shared through the Dataset cache, as in engine.py), the flags
+    ('crossover') and the recent-signal rows ('assembly').
+    """
+    data = TimedDataset(TIMEFRAMES[timeframe], bars, timer)
+    tail = os.getenv('SCANNER_TAIL') == '1'
+    results = {}
+    for strategy in STRATEGIES.values():
+        if strategy.timeframe != data.timeframe:
+            continue
+        view = data
+        if tail and strategy.warmup is not None:
+            with timer.stage('tail'):
+                view = data.tail(strategy.recent, strategy.warmup)
+        with timer.stage('crossover'):
+            flags = strategy.signals(view)
+        with timer.stage('assembly'):
+            results[strategy.name] = panel.recent_signals(flags, view.bars['Close'], strategy.recent)
+    with timer.stage('store'):
+        store = BarStore(os.path.join(out_dir, 'bars'))
+        store.write_panels(timeframe, bars)
+    with timer.stage('csv'):
+        for name, result in results.items():
+            result.to_csv(os.path.join(out_dir, f'{name}.csv'), index=False)
+    return sum(len(result) for result in results.values())
+
+
+def bench_size(n_tickers):
+    """
+    Benchmarks every timeframe for `n_tickers`; returns a JSON-ready dict.
+    """
+    report = {'tickers': n_tickers, 'timeframes': {}}
+    with tempfile.TemporaryDirectory() as out_dir:
+        sources = {}
+        for interval, days in HISTORY_DAYS.items():
+            sources[interval] = synthetic_history(n_tickers, interval, days)
+        for timeframe in ('60m', '2h', '1d'):
+            timer = Timer()
+            if timeframe == '2h':
+                with timer.stage('resample'):
+                    bars = panel.resample(sources['60m'], '2h')
+            else:
+                bars = sources[timeframe]
+            start = time.perf_counter()
+            signals = run_pipeline(bars, timeframe, out_dir, timer)
+            total = time.perf_counter() - start + timer.stages.get('resample', 0.0)
+            ticker_bars = int(bars['Close'].notna().to_numpy().sum())
+            report['timeframes'][timeframe] = {
+                'bars': len(bars['Close']),
+                'ticker_bars': ticker_bars,
+                'signals': signals,
+                'seconds': total,
+                'ticker_bars_per_second': ticker_bars / total if total else None,
+                'stages': timer.stages,
+            }
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report['peak_rss_mb'] = peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return report
+
+
+def _version():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes, out_path=None):
+    results = {
+        'version': _version(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'cpus': os.cpu_count(),
+        'sizes': [],
+    }
+    for n_tickers in sizes:
+        proc = subprocess.run([sys.executable, __file__, '--one', str(n_tickers)],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{n_tickers} tickers failed:\n{proc.stderr}")
+            continue
+        report = json.loads(proc.stdout.strip().splitlines()[-1])
+        results['sizes'].append(report)
+        print_report(report)
+
+    if out_path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out_path = os.path.join(RESULTS_DIR, f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(out_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {out_path}")
+    return results
+
+
+def print_report(report):
+    print(f"\n{report['tickers']} tickers, peak RSS {report['peak_rss_mb']:.0f} MB")
+    for timeframe, item in report['timeframes'].items():
+        stages = '  '.join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in item['stages'].items())
+        print(f"  {timeframe:>4}: {item['seconds']:.2f}s, "
+              f"{item['ticker_bars_per_second'] / 1e6:.2f}M ticker-bars/s | {stages}")
+
+
+def compare(old_path, new_path):
+    """
+    Prints the per-stage change between two result files.
+    """
+    with open(old_path) as f:
+        old = {item['tickers']: item for item in json.load(f)['sizes']}
+    with open(new_path) as f:
+        new = json.load(f)['sizes']
+    for item in new:
+        base = old.get(item['tickers'])
+        if base is None:
+            continue
+        print(f"\n{item['tickers']} tickers, peak RSS {base['peak_rss_mb']:.0f} -> {item['peak_rss_mb']:.0f} MB")
+        for timeframe, current in item['timeframes'].items():
+            before = base['timeframes'].get(timeframe)
+            if before is None:
+                continue
+            for name, seconds in current['stages'].items():
+                was = before['stages'].get(name)
+                if was:
+                    print(f"  {timeframe:>4} {name:<10} {was * 1000:8.1f} -> {seconds * 1000:8.1f} ms "
+                          f"({(seconds / was - 1) * 100:+.0f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic screener pipeline benchmark")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--out', help="JSON output path (default: bench_results/bench_<time>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    parser.add_argument('--one', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.one:
+        print(json.dumps(bench_size(args.one)))
+    elif args.compare:
+        compare(*args.compare)
+    else:
+        run_suite(args.sizes, args.out)
@@ -0,0 +1,325 @@
+import os
+import time
+import traceback
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from barstore import BarStore
+from universe import get_tickers
+from market import is_trading_day
+from session import get_session
+from strategies import STRATEGIES, Dataset
+from state import IndicatorState, recent_signals
+from download import fetch_history, fetch_tail
+from datasource import get_source
+from planner import derive_panels, trim_panels
+import engine
+import metrics
+import panel
+import parallel
+import planner
+
+############################
+# Resident Scheduler
+############################
+# One long-running process instead of a fresh interpreter per cron/Procfile
+# run. pandas, yfinance and the strategies are imported once, and the cached
+# HTTP session, the bars and the indicator state stay in memory between
+# triggers (see WarmInterval), so each trigger only does the incremental
+# work: download the bars that arrived since the previous one, extend the
+# raw and derived panels with them, and step the indicator state over the
+# new bars.
+#
+# Every strategy runs on the schedule of its timeframe (or its own
+# `schedule`), in US/Eastern wall-clock times on trading days (weekdays
+# outside the NYSE holidays, see market.py):
+#
+#     1h   after each hourly bar closes, 10:35 ... 15:35, and 16:05
+#     2h   after each 2h bar closes, 10:35, 12:35, 14:35 and 16:05
+#     1d   once after the close, 16:15
+#
+# Strategies due at the same time run in one pass, so they share their
+# downloads. Triggers that pass while a previous run is still busy are run
+# late, once, rather than skipped or replayed one by one.
+
+EASTERN = pytz.timezone('US/Eastern')
+
+SCHEDULE = {
+    '1h': ['10:35', '11:35', '12:35', '13:35', '14:35', '15:35', '16:05'],
+    '2h': ['10:35', '12:35', '14:35', '16:05'],
+    '1d': ['16:15'],
+}
+
+# Upper bound on one sleep, so clock changes and DST are picked up quickly
+MAX_SLEEP = 60
+
+
+def schedule_for(strategy):
+    return strategy.schedule or SCHEDULE.get(strategy.timeframe, [])
+
+
+def triggers_between(start, end, strategies):
+    """
+    Returns [(time, [strategies])] for every trigger in (start, end], in order.
+    `start` and `end` are aware datetimes.
+    """
+    start, end = start.astimezone(EASTERN), end.astimezone(EASTERN)
+    due = {}
+    day = start.date()
+    while day <= end.date():
+        if is_trading_day(day):
+            for strategy in strategies:
+                for hhmm in schedule_for(strategy):
+                    hour, minute = map(int, hhmm.split(':'))
+                    at = EASTERN.localize(datetime(day.year, day.month, day.day, hour, minute))
+                    if start < at <= end:
+                        due.setdefault(at, []).append(strategy)
+        day += timedelta(days=1)
+    return sorted(due.items(), key=lambda item: item[0])
+
+
+def next_trigger(after, strategies):
+    """
+    The first trigger time after `after`, looking up to two weeks ahead.
+    """
+    found = triggers_between(after, after + timedelta(days=14), strategies)
+    return found[0][0] if found else None
+
+
+def _overlay(new, held):
+    """
+    `new` over `held` (a panel): new values win, held ones fill its gaps,
+    on the union of their bars and the columns of `held`.
+    """
+    index = held.index.union(new.index)
+    top = new.reindex(index=index, columns=held.columns).to_numpy(dtype=float)
+    bottom = held.reindex(index=index).to_numpy(dtype=float)
+    return pd.DataFrame(np.where(np.isnan(top), bottom, top), index=index, columns=held.columns)
+
+
+def state_path(timeframe):
+    return os.path.join('stockdata', f'daemon_{timeframe}_state.json')
+
+
+class WarmInterval:
+    """
+    One download interval (see planner.py) held in memory between triggers:
+    its raw panels, the timeframes built from them, and for timeframes with
+    state-backed strategies (`Strategy.state_flags`) an IndicatorState and
+    the recent rows it evaluated.
+    """
+
+    def __init__(self, interval, item, strategies, store, source):
+        self.interval = interval
+        self.lookback = item['lookback']
+        self.timeframes = item['timeframes']
+        self.store = store
+        self.source = source
+        stateful = {s.timeframe for s in strategies if s.state_flags and s.timeframe in self.timeframes}
+        fields = set(item['fields']) | ({'High', 'Low', 'Close'} if stateful else set())
+        self.fields = [f for f in ('Open', 'High', 'Low', 'Close', 'Volume') if f in fields]
+        # Longest `recent` any state-backed strategy reports, per timeframe
+        self.recent = {}
+        for s in strategies:
+            if s.state_flags and s.timeframe in stateful:
+                self.recent[s.timeframe] = max(self.recent.get(s.timeframe, s.recent), s.recent)
+        self.states = {tf: IndicatorState.load(state_path(tf)) for tf in stateful}
+        self.rows = {}
+        self.raw = None
+        self.derived = {}
+
+    def refresh(self, tickers):
+        """
+        Brings the panels and indicator state up to date for `tickers`.
+        """
+        if self.raw is None or not set(tickers) <= set(self.raw['Close'].columns):
+            self._load(tickers)
+        else:
+            self.raw = {field: values[tickers] for field, values in self.raw.items()}
+            self._extend()
+        for timeframe in self.states:
+            self._step(timeframe)
+
+    def _load(self, tickers):
+        his_data = fetch_history(tickers, self.interval, self.lookback, self.store, source=self.source)
+        with metrics.stage('panels', items=len(tickers)):
+            self.raw = panel.from_history(his_data, self.fields)
+        for timeframe, lookback in self.timeframes.items():
+            with metrics.stage(f'derive_{timeframe}'):
+                self.derived[timeframe] = derive_panels(self.raw, timeframe, lookback)
+            if planner.source(timeframe)[1] is not None:
+                self.store.write_panels(timeframe, self.derived[timeframe])
+
+    def _extend(self):
+        """
+        Downloads the bars since the newest one held per ticker and adds
+        them to the raw and derived panels.
+        """
+        close = self.raw['Close']
+        latest = {ticker: close[ticker].last_valid_index() for ticker in close.columns}
+        latest = {ticker: ts for ticker, ts in latest.items() if ts is not None}
+        his_data, gaps = fetch_tail(latest, self.interval, self.store, source=self.source)
+        if gaps:
+            print(f"Gap in {self.interval} bars for {len(gaps)} tickers, reloading.")
+            self._load(list(close.columns))
+            return
+        if his_data is None:
+            return
+        new = panel.from_history(his_data, self.fields)
+        first = new['Close'].index[0]
+        # Newer downloads win over held bars for the same timestamp
+        raw = {}
+        for field, values in self.raw.items():
+            held = values.index >= first
+            raw[field] = pd.concat([values[~held], _overlay(new[field], values[held])])
+        self.raw = trim_panels(raw, self.lookback)
+
+        for timeframe, lookback in self.timeframes.items():
+            with metrics.stage(f'derive_{timeframe}'):
+                bars = self.derived[timeframe]
+                if planner.source(timeframe)[1] is None:
+                    self.derived[timeframe] = derive_panels(self.raw, timeframe, lookback)
+                    continue
+                # Rebuild from the bucket holding the first new raw bar on
+                index = bars['Close'].index
+                pos = index.searchsorted(first, side='right') - 1
+                if pos < 0:
+                    self.derived[timeframe] = derive_panels(self.raw, timeframe, lookback)
+                    continue
+                since = index[pos]
+                tail = derive_panels({f: v[v.index >= since] for f, v in self.raw.items()}, timeframe)
+                self.derived[timeframe] = trim_panels(
+                    {f: pd.concat([v[v.index < since], tail[f]]) for f, v in bars.items()}, lookback)
+            self.store.write_panels(timeframe, tail, append=True)
+
+    def _step(self, timeframe):
+        """
+        Advances the timeframe's IndicatorState over the bars it has not
+        committed yet and keeps the rows within `recent` of each ticker's
+        last bar.
+        """
+        state = self.states[timeframe]
+        bars = {f: self.derived[timeframe][f] for f in ('High', 'Low', 'Close')}
+        index = bars['Close'].index
+        committed = [state.tickers[t].last_ts if t in state.tickers else None for t in bars['Close'].columns]
+        if committed and None not in committed:
+            since = min(pd.Timestamp(ts) for ts in committed)
+            if len(index) and since >= index[0]:
+                # Only the committed bars and what came after them
+                start = index.searchsorted(since)
+                bars = {field: values.iloc[start:] for field, values in bars.items()}
+        with metrics.stage('indicators', items=len(committed)):
+            rows = parallel.update(state, bars)
+        state.save()
+
+        held = self.rows.get(timeframe)
+        if held is not None and not rows.empty:
+            rows = pd.concat([held, rows]).drop_duplicates(['Ticker', 'Date'], keep='last')
+        elif rows.empty:
+            rows = held if held is not None else rows
+        if not rows.empty:
+            cutoff = rows.groupby('Ticker')['Date'].transform('max') - self.recent[timeframe]
+            rows = rows[rows['Date'] >= cutoff].reset_index(drop=True)
+        self.rows[timeframe] = rows
+
+    def evaluate(self, strategy):
+        """
+        Recent signals of `strategy`: from the indicator state when it is
+        state-backed, otherwise from the held panels.
+        """
+        if strategy.state_flags and strategy.timeframe in self.rows:
+            return recent_signals(self.rows[strategy.timeframe], strategy.state_flags, strategy.recent)
+        datasets = {strategy.timeframe: Dataset(strategy.timeframe, self.derived[strategy.timeframe])}
+        return engine.evaluate([strategy], datasets).get(strategy.name)
+
+
+class Scheduler:
+    """
+    Runs registered strategies on their schedules, keeping the session, the
+    bars and the indicator state warm between triggers.
+    """
+
+    def __init__(self, strategies=None):
+        self.strategies = list(STRATEGIES.values()) if strategies is None else strategies
+        self.store = BarStore()
+        self.session = get_session()
+        self.source = get_source(self.session)
+        self.downloads = engine.plan(self.strategies)
+        self.warm = {}
+        self.checked = datetime.now(pytz.utc)
+
+    def evaluate(self, tickers, strategies):
+        """
+        Refreshes the intervals `strategies` read and evaluates them. Returns
+        {strategy name: DataFrame of recent signals}.
+        """
+        intervals = {planner.source(s.timeframe)[0] for s in strategies}
+        for interval in intervals:
+            if interval not in self.warm:
+                self.warm[interval] = WarmInterval(interval, self.downloads[interval], self.strategies,
+                                                   self.store, self.source)
+            try:
+                self.warm[interval].refresh(tickers)
+            except Exception as e:
+                print(f"Error refreshing {interval} data: {e}")
+                # Start from the store again on the next trigger
+                del self.warm[interval]
+        results = {}
+        for strategy in strategies:
+            warm = self.warm.get(planner.source(strategy.timeframe)[0])
+            if warm is None:
+                continue
+            with metrics.stage(f'evaluate_{strategy.name}'):
+                result = warm.evaluate(strategy)
+            if result is not None:
+                results[strategy.name] = result
+                metrics.count(signals=len(result))
+        return results
+
+    def run_due(self, now):
+        """
+        Runs every strategy with a trigger in (last check, now]. Triggers that
+        piled up while a previous run was busy are coalesced into one run.
+        """
+        due = triggers_between(self.checked, now, self.strategies)
+        self.checked = now
+        if not due:
+            return
+        strategies = []
+        for _, group in due:
+            strategies.extend(s for s in group if s not in strategies)
+        names = ', '.join(s.name for s in strategies)
+        print(f"[{due[-1][0]:%Y-%m-%d %H:%M %Z}] running {names}")
+        started = time.monotonic()
+        metrics.start_run('daemon')
+        try:
+            # SCANNER_UNIVERSE selects the index, as in engine.py
+            with metrics.stage('universe'):
+                tickers = get_tickers(os.getenv('SCANNER_UNIVERSE', 'sp500'))
+            engine.publish(self.evaluate(tickers, strategies))
+        except Exception:
+            # Keep the daemon alive; the next trigger tries again
+            traceback.print_exc()
+        finally:
+            metrics.finish_run()
+        print(f"Finished {names} in {time.monotonic() - started:.1f}s")
+
+    def forever(self):
+        os.makedirs('stockdata', exist_ok=True)
+        print(f"Scheduler started with {len(self.strategies)} strategies.")
+        while True:
+            now = datetime.now(pytz.utc)
+            self.run_due(now)
+            upcoming = next_trigger(self.checked, self.strategies)
+            if upcoming is None:
+                print("No scheduled triggers; exiting.")
+                return
+            wait = (upcoming - datetime.now(pytz.utc)).total_seconds()
+            time.sleep(min(max(wait, 0), MAX_SLEEP))
+
+
+if __name__ == "__main__":
+    Scheduler().forever()
@@ -0,0 +1,197 @@
+import os
+
+import pandas as pd
+
+############################
+# Market Data Sources
+############################
+# Where bars come from, behind one interface, so the screeners, replay and
+# benchmarks do not care whether they talk to Yahoo or read files:
+#
+#     YahooSource   yfinance over HTTP (yf.Tickers / yf.Ticker.history)
+#     StoreSource   bars already on disk in a bar store (see barstore.py),
+#                   read at memory-map speed with no network at all
+#
+# download.fetch_history and fetcher.download_many take a `source`; by
+# default it is chosen with SCANNER_SOURCE:
+#
+#     SCANNER_SOURCE=yahoo                 (default)
+#     SCANNER_SOURCE=store                 the raw bars in stockdata/bars
+#     SCANNER_SOURCE=store:/data/bars      a pre-downloaded bar store
+#
+# A store source answers from the raw downloads ('raw/{interval}'), which is
+# what the Yahoo path keeps up to date, so a store copied from a production
+# box replays the same pipeline offline. Look-backs are counted back from
+# the newest stored bar (or `as_of`), not from now, so old snapshots work.
+
+FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def _frame(panels):
+    """
+    Wide (Price, Ticker) frame from per-field panels, as yf.Tickers returns.
+    """
+    return pd.concat(panels, axis=1, names=['Price', 'Ticker'])
+
+
+def _download_shape(df, ticker, interval):
+    """
+    `df` (one column per field) in yf.download's per-ticker layout.
+    """
+    if interval[-1] not in ('m', 'h') and df.index.tz is not None:
+        df.index = df.index.tz_localize(None)
+    df = df[sorted(df.columns)]
+    df.columns = pd.MultiIndex.from_product([df.columns, [ticker]], names=['Price', 'Ticker'])
+    return df
+
+
+def _align(ts, index):
+    # Compare naive bounds in the index timezone, aware ones in UTC
+    return align_tz(ts, index.tz)
+
+
+def align_tz(ts, tz):
+    """
+    `ts` comparable with bar times in `tz`: naive times are taken to be in
+    `tz`, aware ones are converted to naive UTC when `tz` is None (daily
+    bars are stored tz-naive).
+    """
+    ts = pd.Timestamp(ts)
+    if tz is not None and ts.tzinfo is None:
+        return ts.tz_localize(tz)
+    if tz is None and ts.tzinfo is not None:
+        return ts.tz_convert(None)
+    return ts
+
+
+class DataSource:
+    """
+    Base class for a source of OHLCV bars. `offline` sources hold all their
+    data locally, so callers need not keep their own copy up to date.
+    """
+    offline = False
+
+    def history(self, tickers, interval, start=None, end=None, lookback=None):
+        """
+        Bars of `interval` for `tickers` from `start` (or `lookback`, a
+        timedelta, before the latest bar) to `end`, as a wide (Price,
+        Ticker) frame; None if nothing came back.
+        """
+        raise NotImplementedError
+
+    def ticker_history(self, ticker, interval, start, end, timeout=None):
+        """
+        Bars for one ticker shaped like `yf.download(ticker, ...)`: (Price,
+        Ticker) columns and a tz-naive index for daily and longer bars. An
+        empty frame if there are none.
+        """
+        raise NotImplementedError
+
+
+class YahooSource(DataSource):
+    """
+    Bars from Yahoo Finance through yfinance, over `session` (e.g. the
+    cached, rate-limited session from session.py).
+    """
+
+    def __init__(self, session=None):
+        self.session = session
+
+    def history(self, tickers, interval, start=None, end=None, lookback=None):
+        import yfinance as yf
+        if not tickers:
+            return None
+        # Tickers.history does not hand its own session on to yf.download
+        kwargs = {'interval': interval, 'session': self.session}
+        if start is not None:
+            kwargs.update(start=start, end=end)
+        else:
+            kwargs['period'] = f"{lookback.days}d"
+        dat = yf.Tickers(" ".join(tickers), session=self.session)
+        his_data = dat.history(**kwargs)
+        if his_data is None or his_data.empty:
+            return None
+        return his_data
+
+    def ticker_history(self, ticker, interval, start, end, timeout=None):
+        import yfinance as yf
+        kwargs = {} if timeout is None else {'timeout': timeout}
+        df = yf.Ticker(ticker, session=self.session).history(
+            start=start, end=end, interval=interval, actions=False,
+            auto_adjust=True, raise_errors=True, **kwargs)
+        return _download_shape(df, ticker, interval)
+
+
+class StoreSource(DataSource):
+    """
+    Bars from the raw partitions of a bar store. `as_of` (optional) is the
+    time look-backs are counted back from; by default the newest stored bar.
+    """
+    offline = True
+
+    def __init__(self, store=None, as_of=None):
+        if store is None or isinstance(store, str):
+            from barstore import BarStore
+            store = BarStore() if store is None else BarStore(store)
+        self.store = store
+        self.as_of = as_of
+        self._latest = {}
+
+    def latest(self, interval):
+        """
+        Newest bar stored for `interval` over all tickers (or `as_of`), the
+        time look-backs are counted back from.
+        """
+        from download import raw_partition
+        if self.as_of is not None:
+            return pd.Timestamp(self.as_of)
+        if interval not in self._latest:
+            partition = raw_partition(interval)
+            stamps = [self.store.latest_timestamp(t, partition) for t in self.store.tickers(partition)]
+            stamps = [ts for ts in stamps if ts is not None]
+            self._latest[interval] = max(stamps) if stamps else None
+        return self._latest[interval]
+
+    def history(self, tickers, interval, start=None, end=None, lookback=None):
+        from download import raw_partition
+        if end is None and self.as_of is not None:
+            end = self.as_of
+        panels = self.store.read_panels(raw_partition(interval), tickers,
+                                        start=start, end=end, columns=FIELDS)
+        if not panels:
+            return None
+        if start is None and lookback is not None:
+            index = panels['Close'].index
+            latest = index.max() if self.as_of is None else _align(self.as_of, index)
+            keep = index >= latest - lookback
+            panels = {field: values[keep] for field, values in panels.items()}
+        return _frame({field: panels[field] for field in FIELDS if field in panels})
+
+    def ticker_history(self, ticker, interval, start, end, timeout=None):
+        from download import raw_partition
+        # Callers ask for (now - look-back, now); a window ending after the
+        # newest stored bar is moved back to end on it
+        latest = self.latest(interval)
+        if latest is not None and end is not None:
+            shift = align_tz(end, latest.tz) - latest
+            if shift > pd.Timedelta(0):
+                start = None if start is None else align_tz(start, latest.tz) - shift
+                end = latest
+        df = self.store.read(ticker, raw_partition(interval), start, end, columns=FIELDS)
+        if df is None or df.empty:
+            return pd.DataFrame()
+        return _download_shape(df, ticker, interval)
+
+
+def get_source(session=None):
+    """
+    The source selected by SCANNER_SOURCE ('yahoo', 'store' or
+    'store:{bar store root}'); Yahoo requests go over `session`.
+    """
+    name = os.getenv('SCANNER_SOURCE', 'yahoo')
+    if name == 'yahoo':
+        return YahooSource(session)
+    if name == 'store' or name.startswith('store:'):
+        root = name.partition(':')[2]
+        return StoreSource(root or None)
+    raise ValueError(f"Unknown SCANNER_SOURCE {name!r}; expected 'yahoo', 'store' or 'store:PATH'")
@@ -0,0 +1,162 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytz
+
+import metrics
+from datasource import FIELDS, align_tz, get_source
+
+############################
+# Delta Downloads
+############################
+# The raw downloaded bars for each interval are kept in the bar store under
+# 'raw/{interval}' (e.g. 'raw/60m'), apart from the screeners' own derived
+# partitions such as '2h'. On the next run only the tail after the
+# newest stored bar is requested and appended; a ticker is fully refreshed
+# only when its stored history does not cover the look-back window (nothing
+# stored, it ends before the window or starts well after it), or the tail
+# does not join up with what is stored (a gap).
+#
+# The stored history is shared by every caller of an interval, so it is
+# never trimmed: a 90-day screener run must not cut the bars a 3-year
+# replay needs. Only the new bars are written (BarStore.append), and only
+# the look-back window is read back for the caller.
+#
+# Yahoo still answers one chart request per ticker, so the saving is in what
+# each request asks for: a few bars instead of 30-180 days, which keeps the
+# responses small and the cached-session/rate-limiter turnaround short.
+#
+# Bars come from a data source (datasource.py), Yahoo by default. An offline
+# source such as a pre-downloaded bar store already holds everything, so it
+# is read directly and nothing is merged or written back.
+
+# Stored history starting this little after the window start still covers
+# it (weekends and holidays at the start of the window)
+START_SLACK = timedelta(days=5)
+
+def raw_partition(interval):
+    """
+    Bar store partition holding the raw downloads for `interval`.
+    """
+    return f'raw/{interval}'
+
+
+def _panels(his_data):
+    """
+    Splits a wide (Price, Ticker) frame into per-field panels.
+    """
+    fields = his_data.columns.get_level_values(0)
+    return {field: his_data[field] for field in FIELDS if field in fields}
+
+
+def _join(panels):
+    """
+    Inverse of `_panels`: rebuilds the wide (Price, Ticker) frame.
+    """
+    return pd.concat(panels, axis=1, names=['Price', 'Ticker'])
+
+
+def fetch_history(tickers, interval, lookback, store, session=None, source=None):
+    """
+    Returns `lookback` (a timedelta) of `interval` bars for `tickers` in the
+    same wide (Price, Ticker) layout as `yf.Tickers(...).history()`, reusing
+    bars already in `store` and downloading only what is missing from
+    `source` (default: SCANNER_SOURCE, see datasource.py). The downloaded
+    bars are added to the store.
+    """
+    if source is None:
+        source = get_source(session)
+    with metrics.stage(f'download_{interval}', items=len(tickers)):
+        if source.offline:
+            his_data = source.history(tickers, interval, lookback=lookback)
+            if his_data is None:
+                raise ValueError(f"No {interval} data in {type(source).__name__} for {len(tickers)} tickers")
+            return his_data
+        return _fetch_history(tickers, interval, lookback, store, source)
+
+
+def _fetch_history(tickers, interval, lookback, store, source):
+    partition = raw_partition(interval)
+    now = datetime.now(pytz.utc)
+    window_start = pd.Timestamp(now - lookback)
+
+    # Split tickers into those we can extend and those needing a full fetch
+    latest = {}
+    full, tail = [], []
+    for ticker in tickers:
+        ts = store.latest_timestamp(ticker, partition)
+        if ts is None:
+            full.append(ticker)
+            continue
+        # Daily bars are stored tz-naive, intraday ones tz-aware
+        start = align_tz(window_start, ts.tz)
+        first = store.earliest_timestamp(ticker, partition)
+        if ts < start or first > start + START_SLACK:
+            full.append(ticker)
+        else:
+            latest[ticker] = ts
+            tail.append(ticker)
+
+    if tail:
+        # Re-request the newest stored bar too: it may have been incomplete,
+        # and it must come back for the tail to count as joined up.
+        start = min(latest[ticker] for ticker in tail)
+        his_data = source.history(tail, interval, start=start)
+        if his_data is not None:
+            close = his_data['Close']
+            joined = []
+            for ticker in tail:
+                if ticker not in close.columns:
+                    continue
+                got = close[ticker].dropna().index
+                if len(got) and latest[ticker] not in got:
+                    print(f"Gap in stored {interval} bars for {ticker}, refreshing in full.")
+                    full.append(ticker)
+                else:
+                    joined.append(ticker)
+            # Only the new bars are converted and added to the stored ones
+            store.write_panels(partition, _panels(his_data), tickers=joined, append=True)
+
+    metrics.count(tail_tickers=len(tail), full_tickers=len(full))
+    if full:
+        print(f"Full {interval} download for {len(full)} of {len(tickers)} tickers.")
+        his_data = source.history(full, interval, lookback=lookback)
+        if his_data is not None:
+            # A full refresh replaces a ticker's stored bars from its first
+            # downloaded bar on; older stored bars are kept.
+            got = [ticker for ticker in full if ticker in his_data['Close'].columns]
+            store.write_panels(partition, _panels(his_data), tickers=got, append=True)
+
+    # The store now holds the merged bars; only the window is read back
+    merged = store.read_panels(partition, tickers, start=window_start, columns=FIELDS)
+    if not merged:
+        raise ValueError(f"No {interval} data downloaded for {len(tickers)} tickers")
+    return _join({field: merged[field] for field in FIELDS if field in merged})
+
+
+def fetch_tail(latest, interval, store, session=None, source=None):
+    """
+    Bars of `interval` since the newest bar a caller already holds for each
+    ticker (`latest`, {ticker: timestamp}), for callers keeping the history
+    in memory (daemon.py). The newest held bar is requested again. The new
+    bars are appended to the stored raw bars. Returns (wide frame or None,
+    tickers whose tail did not join up and need a full reload).
+    """
+    if source is None:
+        source = get_source(session)
+    tickers = list(latest)
+    with metrics.stage(f'download_{interval}', items=len(tickers)):
+        his_data = source.history(tickers, interval, start=min(latest.values()))
+    if his_data is None:
+        return None, []
+    close = his_data['Close']
+    gaps = []
+    for ticker in tickers:
+        got = close[ticker].dropna().index if ticker in close.columns else []
+        if len(got) and latest[ticker] not in got:
+            gaps.append(ticker)
+    metrics.count(tail_tickers=len(tickers))
+    if not source.offline:
+        joined = [ticker for ticker in close.columns if ticker not in gaps]
+        store.write_panels(raw_partition(interval), _panels(his_data), tickers=joined, append=True)
+    return his_data, gaps
@@ -0,0 +1,200 @@
+import os
+from dotenv import load_dotenv
+from market import is_us_market_open
+import metrics
+load_dotenv()
+
+############################
+# Screener Engine
+############################
+# Runs every registered strategy (see strategies.py) in one pass: the
+# planner merges what the strategies ask for into one download per interval,
+# each timeframe is built once from it, and every strategy is evaluated
+# against the shared Dataset. Results are written to each strategy's CSV and
+# sent to Telegram, as the single-purpose scripts do.
+#
+# pandas and the data modules are imported inside the functions that use
+# them, so `python engine.py` outside market hours exits in milliseconds.
+
+############################
+# 1. Market Open Check
+############################
+# is_us_market_open comes from market.py, which imports nothing heavy.
+
+############################
+# 2. Telegram Functions
+############################
+def send_telegram_message(message, on_delivered=None):
+    """
+    Sends a given message to a Telegram chat.
+    """
+    from outbox import send_telegram_message as queue_message
+    # Queued on the shared outbox (outbox.py), so a slow Telegram API does
+    # not hold up the run or, in daemon.py, the next trigger
+    with metrics.stage('telegram', items=1):
+        queue_message(message, on_delivered=on_delivered)
+        metrics.count(bytes_sent=len(message.encode()))
+
+############################
+# 3. Utility Functions
+############################
+# get_tickers (universe.py) and get_session (session.py) are shared.
+
+############################
+# 4. Engine
+############################
+def plan(strategies):
+    """
+    Merges the strategies' (timeframe, lookback) needs into one download per
+    interval (see planner.py) and records the input fields each download
+    must provide and the strategies per timeframe.
+    """
+    from planner import plan_downloads, source
+    downloads = plan_downloads((s.timeframe, s.lookback) for s in strategies)
+    for item in downloads.values():
+        item['fields'] = {'Close'}
+    for strategy in strategies:
+        downloads[source(strategy.timeframe)[0]]['fields'].update(strategy.inputs)
+    return downloads
+
+def load_datasets(tickers, downloads, store, session=None):
+    """
+    Fetches each interval once and derives every timeframe the plan needs
+    from it. Returns {timeframe: Dataset}; intervals that fail to download are
+    skipped.
+    """
+    import panel
+    from download import fetch_history
+    from planner import source, derive_panels
+    from strategies import Dataset
+    datasets = {}
+    for interval, item in downloads.items():
+        try:
+            his_data = fetch_history(tickers, interval, item['lookback'], store, session=session)
+        except Exception as e:
+            print(f"Error downloading bulk data for interval {interval}: {e}")
+            continue
+
+        available_tickers = set(his_data.columns.get_level_values('Ticker'))
+        for ticker in tickers:
+            if ticker not in available_tickers:
+                print(f"Ticker {ticker} not found in {interval} data, skipping.")
+
+        # Split into one (bars x tickers) panel per field the strategies read
+        fields = [f for f in ('Open', 'High', 'Low', 'Close', 'Volume') if f in item['fields']]
+        with metrics.stage('panels', items=len(available_tickers)):
+            bars = panel.from_history(his_data, fields)
+        for timeframe, lookback in item['timeframes'].items():
+            with metrics.stage(f'derive_{timeframe}'):
+                datasets[timeframe] = Dataset(timeframe, derive_panels(bars, timeframe, lookback))
+            if source(timeframe)[1] is not None:
+                # Keep the derived bars for reference, as the 2h scripts did
+                store.write_panels(timeframe, datasets[timeframe].bars)
+    return datasets
+
+def evaluate(strategies, datasets, tail=None):
+    """
+    Runs each strategy on its timeframe's Dataset. Returns {strategy name:
+    DataFrame of recent signals}. With `tail` (default: SCANNER_TAIL=1) the
+    indicators are computed only over the recent window and its warmup.
+    """
+    if tail is None:
+        tail = os.getenv('SCANNER_TAIL') == '1'
+    results = {}
+    for strategy in strategies:
+        data = datasets.get(strategy.timeframe)
+        if data is None:
+            continue
+        try:
+            with metrics.stage(f'evaluate_{strategy.name}'):
+                results[strategy.name] = strategy.evaluate(data, tail=tail)
+                metrics.count(signals=len(results[strategy.name]))
+        except Exception as e:
+            print(f"Strategy {strategy.name} failed: {e}")
+    return results
+
+def run(tickers, store, session=None, strategies=None, chunk_size=None, memory_mb=None):
+    """
+    Evaluates `strategies` (default: every registered one) on shared data.
+    Returns {strategy name: DataFrame of recent signals}.
+
+    With `chunk_size` or `memory_mb` (default: SCANNER_CHUNK_SIZE and
+    SCANNER_MEMORY_MB) the tickers are processed in chunks, each one
+    downloaded, evaluated and released before the next; see memory.py.
+    """
+    import pandas as pd
+    from strategies import STRATEGIES
+    from memory import Chunker, chunking_from_env
+    strategies = list(STRATEGIES.values()) if strategies is None else strategies
+    downloads = plan(strategies)
+    if chunk_size is None and memory_mb is None:
+        chunk_size, memory_mb = chunking_from_env()
+    if chunk_size is None and memory_mb is None:
+        return evaluate(strategies, load_datasets(tickers, downloads, store, session=session))
+
+    chunker = Chunker(chunk_size, memory_mb)
+    parts = {}
+    for chunk in chunker.chunks(tickers):
+        with metrics.stage('chunk', items=len(chunk)):
+            datasets = load_datasets(chunk, downloads, store, session=session)
+            for name, result in evaluate(strategies, datasets).items():
+                parts.setdefault(name, []).append(result)
+            # Only the signal rows outlive the chunk
+            del datasets
+    print(f"Processed {len(tickers)} tickers in chunks, peak RSS {chunker.peak_mb:.0f} MiB.")
+    return {name: pd.concat(frames, ignore_index=True) for name, frames in parts.items()}
+
+def publish(results):
+    """
+    Writes each strategy's results to its CSV and sends its Telegram message
+    for the signals not alerted on by an earlier run (see signalstore.py).
+    The signals are recorded once the message is delivered.
+    """
+    from strategies import STRATEGIES
+    from signalstore import only_new, recorder
+    for name, screener_df in results.items():
+        strategy = STRATEGIES[name]
+        if strategy.results_csv:
+            with metrics.stage('csv', items=len(screener_df)):
+                screener_df.to_csv(strategy.results_csv, index=False)
+        with metrics.stage('dedup', items=len(screener_df)):
+            screener_df = only_new(screener_df, strategy.timeframe, name)
+        message = strategy.message(screener_df)
+        if message is None:
+            print(f"No new {name} signals found.")
+            continue
+        print(f"{strategy.title} ({name}):\n{screener_df.tail()}")
+        send_telegram_message(message, on_delivered=recorder(screener_df, strategy.timeframe, name))
+
+############################
+# 5. Main Screener
+############################
+def main():
+    if not is_us_market_open():
+        print("The US market is currently closed. Script execution halted.")
+        return
+
+    from barstore import BarStore
+    from universe import get_tickers
+    from session import get_session
+
+    # Create directory to store data
+    os.makedirs('stockdata', exist_ok=True)
+    store = BarStore()
+
+    metrics.start_run('engine')
+    try:
+        # Index tickers (cached list, refreshed once a day); SCANNER_UNIVERSE
+        # selects another index, e.g. russell2000
+        with metrics.stage('universe'):
+            tickers = get_tickers(os.getenv('SCANNER_UNIVERSE', 'sp500'))
+
+        publish(run(tickers, store, session=get_session()))
+    finally:
+        metrics.finish_run()
+
+############################
+# 6. Entry Point
+############################
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import asyncio
+import random
+import time
+
+import pandas as pd
+from yfinance.exceptions import YFPricesMissingError, YFTzMissingError
+
+import metrics
+from datasource import get_source
+from ratelimit import get_limiter
+
+############################
+# Concurrent Per-ticker Downloads
+############################
+# Replaces the serial `for ticker in tickers: yf.download(ticker, ...)` loops.
+# Up to `concurrency` requests are in flight at once, all drawing from one
+# token bucket so the run as a whole stays under `rate` requests per second.
+# Each request has its own HTTP timeout and is retried with exponential backoff
+# and jitter. A full universe pass is then bounded by the rate limit instead
+# of by one round trip per ticker.
+#
+# yfinance is synchronous, so each request runs in a worker thread via
+# `asyncio.to_thread`. `yf.download` keeps its results in module-level
+# dicts and is not safe to call from several threads at once, so the
+# requests go through `yf.Ticker(...).history()` (what yf.download calls
+# internally, see datasource.YahooSource) and the result is reshaped to
+# yf.download's layout. An offline source is read directly, without the
+# rate limit.
+#
+# The bucket caps this run; unless the session already goes through it, each
+# request also draws from the limiter shared by every screener process on the
+# host and reports back how Yahoo answered (ratelimit.py). That limiter
+# tracks real Yahoo traffic only: traffic to anything else, such as the
+# stand-in servers in standin.py, passes `limiter=None` so it can neither
+# be held up by the host's rate nor change it.
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RATE = 2.0      # requests per second across the whole run
+DEFAULT_BURST = 4
+DEFAULT_TIMEOUT = 30    # seconds per request
+DEFAULT_RETRIES = 3
+SHARED = 'shared'       # download_many's default limiter: ratelimit.get_limiter()
+
+
+class TokenBucket:
+    """
+    Allows `rate` acquisitions per second on average, with bursts of up to
+    `capacity`. Shared by every task of a run.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+        self.waited = 0.0
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+
+
+def _observe(shared, sent, error=None):
+    """
+    Reports how a request sent at `sent` ended to the shared limiter.
+    """
+    if shared is None:
+        return
+    if error is None or isinstance(error, (YFPricesMissingError, YFTzMissingError)):
+        status = 200
+    elif type(error).__name__ == 'YFRateLimitError' or 'Too Many Requests' in str(error):
+        status = 429
+    else:
+        status = 599
+    shared.observe(status, time.monotonic() - sent)
+
+
+async def _fetch(ticker, interval, start, end, bucket, semaphore, timeout, retries, source, shared):
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                await bucket.acquire()
+                if shared is not None:
+                    bucket.waited += await asyncio.to_thread(shared.acquire)
+                sent = time.monotonic()
+                try:
+                    # The timeout is applied by the HTTP request itself. The slot
+                    # is held until the thread returns, as an abandoned thread
+                    # would keep its request in flight.
+                    df = await asyncio.to_thread(source.ticker_history, ticker, interval, start, end, timeout)
+                except Exception as e:
+                    _observe(shared, sent, e)
+                    raise
+                _observe(shared, sent)
+                return df
+        except (YFPricesMissingError, YFTzMissingError):
+            # No bars for this ticker/range: not worth retrying
+            return pd.DataFrame()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            # Back off outside the semaphore so other tickers keep going
+            delay = min(2 ** attempt, 30) * random.uniform(0.5, 1.5)
+            print(f"Retrying {ticker} ({interval}) in {delay:.1f}s after error: {e!r}")
+            await asyncio.sleep(delay)
+
+
+async def _fetch_all(tickers, interval, start, end, concurrency, rate, burst, timeout, retries, source,
+                     shared):
+    bucket = TokenBucket(rate, burst)
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [_fetch(t, interval, start, end, bucket, semaphore, timeout, retries, source, shared)
+             for t in tickers]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    metrics.count(limiter_wait_seconds=bucket.waited)
+    return results
+
+
+def download_many(tickers, interval, start, end, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE,
+                  burst=DEFAULT_BURST, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, session=None,
+                  source=None, limiter=SHARED):
+    """
+    Downloads `interval` bars between `start` and `end` for every ticker
+    concurrently. Returns {ticker: DataFrame} in the same per-ticker shape
+    `yf.download(ticker, ...)` gives; tickers that still fail after
+    `retries` retries are reported and left out. Bars come from `source`
+    (default: SCANNER_SOURCE over `session`, see datasource.py).
+
+    `limiter` is the host-wide limiter each request also draws from and
+    reports to: by default the shared Yahoo one, unless the session already
+    goes through it. Pass None for traffic that is not to Yahoo.
+    """
+    tickers = list(tickers)
+    if source is None:
+        source = get_source(session)
+    if limiter == SHARED:
+        # A limited session (session.get_session) already draws from it
+        limited = hasattr(getattr(source, 'session', None), 'limiter')
+        limiter = None if limited else get_limiter()
+    with metrics.stage(f'download_{interval}', items=len(tickers)):
+        if source.offline:
+            return {t: source.ticker_history(t, interval, start, end) for t in tickers}
+        results = asyncio.run(_fetch_all(tickers, interval, start, end, concurrency, rate,
+                                         burst, timeout, retries, source, limiter))
+        frames = {}
+        for ticker, result in zip(tickers, results):
+            if isinstance(result, BaseException):
+                print(f"Failed to download data for {ticker} with timeframe {interval}: {result}")
+                continue
+            frames[ticker] = result
+        metrics.count(failed=len(tickers) - len(frames))
+    return frames
@@ -1,27 +1,15 @@
 import pandas as pd
 import yfinance as yf
 from datetime import datetime, timedelta
-import requests
-from bs4 import BeautifulSoup
-
-# Function to fetch S&P 500 tickers from Wikipedia
-def get_sp500_tickers():
-    url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    table = soup.find('table', {'id': 'constituents'})
-    tickers = [row.find('td').text.strip() for row in table.find_all('tr')[1:]]
-    return tickers
+from barstore import BarStore
+from universe import get_sp500_tickers
 
 # Get the S&P 500 tickers
 sp500_tickers = get_sp500_tickers()
 
-# Save the tickers to a CSV file
+# Save the tickers to a CSV file (indicator.py reads it)
 pd.DataFrame(sp500_tickers, columns=["Ticker"]).to_csv('sp500_tickers.csv', index=False)
-
-# Read the tickers from the CSV file
-tickers_df = pd.read_csv('sp500_tickers.csv')
-tickers = tickers_df['Ticker'].tolist()
+tickers = sp500_tickers
 
 # Calculate the date range for the past 3 years
 end_date = datetime.now()
@@ -30,8 +18,10 @@ start_date = end_date - timedelta(days=3*365)
 # Download historical OHLC data for each ticker
 data = yf.download(tickers, start=start_date, end=end_date, interval='1d', group_by='ticker')
 
-# Save the data to a CSV file
-data.to_csv('sp500_ohlc_data.csv')
+# Save the data to the bar store, one file per ticker
+store = BarStore()
+for ticker in data.columns.get_level_values(0).unique():
+    store.write(ticker, '1d', data[ticker].dropna(how='all'))
 
 # Display a sample of the data
 print(data.head())
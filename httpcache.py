@@ -0,0 +1,250 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import timedelta
+from urllib.parse import parse_qs, urlsplit
+
+from requests_cache import SQLiteCache
+from requests_cache.backends.sqlite import SQLiteDict, get_cache_path
+from requests_cache.serializers import SerializerPipeline, Stage, pickle_serializer
+
+############################
+# Bounded HTTP Cache
+############################
+# The requests_cache backend behind session.get_session(). The stock
+# SQLiteCache kept every response forever, and every intraday run asks for a
+# new period1/period2, so yfinance.cache only ever grew. This backend:
+#
+#   - expires chart responses by bar interval (`expire_after`): a 60m
+#     response is only reused for a few minutes, a daily one for an hour,
+#     weekly and monthly ones for longer; anything else for DEFAULT_TTL
+#   - stores payloads zlib-compressed (Yahoo's JSON shrinks ~5-10x)
+#   - keeps the responses under `max_bytes` (SCANNER_CACHE_MB, default
+#     512): past it, expired responses go first, then the least recently
+#     used ones, down to LOW_WATER of the limit
+#   - runs in WAL mode with incremental auto-vacuum; a background thread
+#     returns the freed pages to the filesystem and truncates the WAL after
+#     an eviction, so the file itself shrinks rather than just the table
+#
+# Last-access times are kept in memory and written in batches, so a cache
+# hit is still a single primary-key read.
+
+DEFAULT_MAX_MB = 512
+LOW_WATER = 0.8            # evict down to this share of max_bytes
+TOUCH_BATCH = 100          # access times buffered before they are written
+DEFAULT_TTL = timedelta(hours=1)
+
+# Chart `interval` -> how long a response stays fresh
+INTERVAL_TTLS = {
+    '1m': timedelta(minutes=1),
+    '2m': timedelta(minutes=2),
+    '5m': timedelta(minutes=5),
+    '15m': timedelta(minutes=5),
+    '30m': timedelta(minutes=5),
+    '60m': timedelta(minutes=5),
+    '90m': timedelta(minutes=5),
+    '1h': timedelta(minutes=5),
+    '1d': timedelta(hours=1),
+    '5d': timedelta(hours=1),
+    '1wk': timedelta(hours=6),
+    '1mo': timedelta(hours=6),
+    '3mo': timedelta(hours=6),
+}
+
+compressed_serializer = SerializerPipeline(
+    [*pickle_serializer.stages, Stage(dumps=zlib.compress, loads=zlib.decompress)],
+    name='pickle+zlib',
+    is_binary=True,
+)
+
+
+def expire_after(url, params=None):
+    """
+    Cache lifetime for a request to `url` with query `params`, by the chart
+    interval it asks for.
+    """
+    interval = (params or {}).get('interval')
+    if interval is None:
+        interval = parse_qs(urlsplit(url).query).get('interval', [None])[0]
+    return INTERVAL_TTLS.get(interval, DEFAULT_TTL)
+
+
+def max_bytes_from_env():
+    return int(float(os.getenv('SCANNER_CACHE_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+
+
+class BoundedSQLiteDict(SQLiteDict):
+    """
+    SQLiteDict that records each entry's size and last access and evicts
+    least recently used entries beyond `max_bytes`.
+    """
+
+    def __init__(self, db_path, max_bytes, **kwargs):
+        self.max_bytes = max_bytes
+        self._touched = {}
+        self._total = 0
+        self.compactor = None
+        super().__init__(db_path, **kwargs)
+
+    def init_db(self):
+        super().init_db()
+        with self.connection(commit=True) as con:
+            # Caches written before this backend lack the bookkeeping columns
+            for column in ('size', 'accessed'):
+                try:
+                    con.execute(f'ALTER TABLE {self.table_name} ADD COLUMN {column} INTEGER')
+                except sqlite3.OperationalError:
+                    pass
+            con.execute(f'UPDATE {self.table_name} SET size = LENGTH(value) WHERE size IS NULL')
+            con.execute(f'UPDATE {self.table_name} SET accessed = 0 WHERE accessed IS NULL')
+            con.execute(f'CREATE INDEX IF NOT EXISTS accessed_idx ON {self.table_name}(accessed)')
+            self._total = con.execute(f'SELECT COALESCE(SUM(size), 0) FROM {self.table_name}').fetchone()[0]
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        with self._lock:
+            self._touched[key] = int(time.time())
+            flush = len(self._touched) >= TOUCH_BATCH
+        if flush:
+            self.flush_access()
+        return value
+
+    def flush_access(self):
+        """
+        Writes the buffered last-access times.
+        """
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            if not touched:
+                return
+            with self.connection(commit=True) as con:
+                con.executemany(f'UPDATE {self.table_name} SET accessed = ? WHERE key = ?',
+                                [(t, k) for k, t in touched.items()])
+
+    def _write(self, key, value):
+        expires = getattr(value, 'expires_unix', None)
+        value = self.serialize(value)
+        size = len(value)
+        with self.connection(commit=True) as con:
+            old = con.execute(f'SELECT size FROM {self.table_name} WHERE key = ?', (key,)).fetchone()
+            con.execute(
+                f'INSERT OR REPLACE INTO {self.table_name} (key, value, expires, size, accessed) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, value, expires, size, int(time.time())),
+            )
+            self._total += size - ((old[0] or 0) if old else 0)
+        if self._total > self.max_bytes:
+            self.evict()
+
+    def __delitem__(self, key):
+        with self.connection(commit=True) as con:
+            row = con.execute(f'SELECT size FROM {self.table_name} WHERE key = ?', (key,)).fetchone()
+        super().__delitem__(key)
+        self._total -= (row[0] or 0) if row else 0
+
+    def bulk_delete(self, keys=None, values=None):
+        super().bulk_delete(keys, values)
+        self._recount()
+
+    def _recount(self):
+        with self.connection() as con:
+            self._total = con.execute(f'SELECT COALESCE(SUM(size), 0) FROM {self.table_name}').fetchone()[0]
+
+    def evict(self):
+        """
+        Drops expired entries, then least recently used ones, until the
+        payloads fit in LOW_WATER of `max_bytes`.
+        """
+        self.flush_access()
+        target = self.max_bytes * LOW_WATER
+        with self._lock, self.connection(commit=True) as con:
+            con.execute(f'DELETE FROM {self.table_name} WHERE expires <= ?', (int(time.time()),))
+            total = con.execute(f'SELECT COALESCE(SUM(size), 0) FROM {self.table_name}').fetchone()[0]
+            victims = []
+            if total > target:
+                for key, size in con.execute(f'SELECT key, size FROM {self.table_name} ORDER BY accessed'):
+                    victims.append((key,))
+                    total -= size or 0
+                    if total <= target:
+                        break
+                con.executemany(f'DELETE FROM {self.table_name} WHERE key = ?', victims)
+            self._total = total
+        if self.compactor is not None:
+            self.compactor.request()
+
+    def close(self):
+        if getattr(self, '_touched', None) and self._connection is not None:
+            self.flush_access()
+        super().close()
+
+
+class Compactor:
+    """
+    Background thread returning free pages to the filesystem and truncating
+    the WAL when asked, on its own connection so lookups are not blocked.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.wanted = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def request(self):
+        self.wanted.set()
+
+    def _run(self):
+        while True:
+            self.wanted.wait()
+            self.wanted.clear()
+            try:
+                con = sqlite3.connect(self.db_path, timeout=30)
+                try:
+                    if con.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                        # A cache created before incremental vacuum: one full rebuild
+                        con.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                        con.execute('VACUUM')
+                    else:
+                        con.execute('PRAGMA incremental_vacuum')
+                    con.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                finally:
+                    con.close()
+            except sqlite3.Error as e:
+                print(f"HTTP cache compaction failed: {e}")
+
+
+class BoundedSQLiteCache(SQLiteCache):
+    """
+    SQLiteCache with compressed payloads, a size limit with LRU eviction,
+    WAL mode and background compaction. Use with `expire_after` for
+    per-interval lifetimes.
+    """
+
+    def __init__(self, db_path='yfinance.cache', max_bytes=None, **kwargs):
+        max_bytes = max_bytes_from_env() if max_bytes is None else max_bytes
+        path = str(get_cache_path(db_path))
+        con = sqlite3.connect(path)
+        try:
+            # Only takes effect on a new file; older ones are converted by the compactor
+            con.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            con.execute('PRAGMA journal_mode = WAL')
+        finally:
+            con.close()
+        kwargs.setdefault('wal', True)
+        super().__init__(db_path, **kwargs)
+        self.responses.close()
+        self.responses = BoundedSQLiteDict(
+            db_path, max_bytes, table_name='responses', lock=self.redirects._lock,
+            serializer=kwargs.pop('serializer', compressed_serializer), **kwargs)
+        self.responses.compactor = Compactor(path)
+        if self.responses._total > max_bytes:
+            self.responses.evict()
+        else:
+            # Convert caches made without incremental vacuum, in the background
+            con = sqlite3.connect(path)
+            try:
+                if con.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                    self.responses.compactor.request()
+            finally:
+                con.close()
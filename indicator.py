@@ -1,10 +1,11 @@
 import pandas as pd
-import yfinance as yf
 from datetime import datetime, timedelta
 import pandas_ta as ta
 import numpy as np
 import requests
 from bs4 import BeautifulSoup
+from barstore import BarStore
+from fetcher import download_many
 
 # ---------------------------------------------
 # OPTIONAL: Code to fetch S&P 500 tickers from Wikipedia
@@ -36,27 +37,21 @@ timeframes = {
 # Define the "recent period" for which we want to check signals (last 1 day)
 recent_period = 1
 
-# Function to download data for a given ticker and timeframe
-def download_data(ticker, timeframe, start_date, end_date):
-    # Download data using yfinance. The interval is set by timeframe.
-    return yf.download(ticker, start=start_date, end=end_date, interval=timeframe)
+# Columnar bar store for the per-ticker results
+store = BarStore()
 
 # Dictionary to store data for each timeframe
 data = {tf: {} for tf in timeframes}
 
-# Download historical data for each ticker and timeframe
+# Download historical data for all tickers concurrently, one timeframe at a time
 end_date = datetime.now()
-for ticker in tickers:
-    for tf, delta in timeframes.items():
-        start_date = end_date - delta
-        try:
-            df = download_data(ticker, tf, start_date, end_date)
-            if df.empty:
-                print(f"No data available for {ticker} on timeframe {tf}. Skipping.")
-                continue
-            data[tf][ticker] = df
-        except Exception as e:
-            print(f"Failed to download data for {ticker} with timeframe {tf}: {e}")
+for tf, delta in timeframes.items():
+    start_date = end_date - delta
+    for ticker, df in download_many(tickers, tf, start_date, end_date).items():
+        if df.empty:
+            print(f"No data available for {ticker} on timeframe {tf}. Skipping.")
+            continue
+        data[tf][ticker] = df
 
 # List to store screener results
 screener_results = []
@@ -113,8 +108,8 @@ for tf in timeframes:
         # and the RSI is overbought ( > 70 )
         df['sell_signal'] = np.where((df['r2_smoothed'] > 90) & (df['RSI_14'] > 70), 1, 0)
 
-        # Save each ticker's data to a CSV file for further inspection if needed
-        df.to_csv(f'{ticker}_{tf}_data.csv')
+        # Save each ticker's data to the bar store for further inspection if needed
+        store.write(ticker, tf, df)
 
         # -------------------------------
         # Filter for Recent Data and Signal Conditions
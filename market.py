@@ -0,0 +1,98 @@
+import os
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+import pytz
+
+############################
+# Market Open Check
+############################
+# Kept free of heavy imports so scripts can check the clock and exit before
+# pandas, yfinance or any HTTP session is loaded.
+#
+# SCANNER_MARKET_OPEN=1 / =0 forces the answer, for debugging outside market
+# hours and for startup_report.py.
+#
+# Trading days are weekdays outside the NYSE full-day holidays, computed by
+# rule (`market_holidays`) so no calendar file or package is needed. Early
+# closes (1 PM ET) are not modelled.
+
+
+def _nth_weekday(year, month, weekday, n):
+    """
+    The `n`th `weekday` (0 = Monday) of the month; n=-1 is the last one.
+    """
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    # Anonymous Gregorian algorithm
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    return date(year, month, (h + l - 7 * m + 33 * month + 19) % 32)
+
+
+def _observed(day):
+    # Saturday holidays close the Friday before, Sunday ones the Monday after
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=None)
+def market_holidays(year):
+    """
+    NYSE full-day closures in `year`, as a frozenset of dates.
+    """
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),         # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),         # Washington's Birthday
+        _easter(year) - timedelta(days=2),   # Good Friday
+        _nth_weekday(year, 5, 0, -1),        # Memorial Day
+        _observed(date(year, 7, 4)),         # Independence Day
+        _nth_weekday(year, 9, 0, 1),         # Labor Day
+        _nth_weekday(year, 11, 3, 4),        # Thanksgiving
+        _observed(date(year, 12, 25)),       # Christmas
+    }
+    # A Saturday New Year's Day is not made up on the Friday before
+    if date(year, 1, 1).weekday() != 5:
+        holidays.add(_observed(date(year, 1, 1)))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))   # Juneteenth
+    return frozenset(holidays)
+
+
+def is_trading_day(day):
+    """
+    True for weekdays the NYSE is open.
+    """
+    return day.weekday() < 5 and day not in market_holidays(day.year)
+
+
+def is_us_market_open():
+    """
+    Checks if the current time is within US market hours (9:30 AM - 4:00 PM ET)
+    on a trading day (not a weekend or market holiday).
+    """
+    forced = os.getenv('SCANNER_MARKET_OPEN')
+    if forced in ('0', '1'):
+        return forced == '1'
+    eastern = pytz.timezone('US/Eastern')
+    now = datetime.now(eastern)
+    if not is_trading_day(now.date()):
+        return False
+    market_open = now.replace(hour=9, minute=30, second=0, microsecond=0)
+    market_close = now.replace(hour=16, minute=0, second=0, microsecond=0)
+    return market_open <= now <= market_close
@@ -0,0 +1,136 @@
+import ctypes
+import gc
+import os
+import threading
+
+import psutil
+
+############################
+# Memory-bounded Chunking
+############################
+# For universes too big to hold at once (Russell 2000 x 730 days of 1h
+# bars), the engine runs download -> indicators -> signals on one chunk of
+# tickers at a time and releases everything but the signal rows before the
+# next chunk.
+#
+# Chunk sizes adapt to a peak-memory budget: while a chunk runs, a sampler
+# thread records the peak RSS; the memory used per ticker is then
+# (peak - RSS at chunk start) / tickers, and the next chunk is sized to fit
+# what is left of the budget with some headroom.
+#
+#     SCANNER_CHUNK_SIZE=250     fixed chunk size (the first chunk's size when
+#                                a budget is set)
+#     SCANNER_MEMORY_MB=450      peak RSS budget; chunks shrink or grow to fit
+#
+# With neither set the whole universe is processed at once, as before.
+
+DEFAULT_CHUNK = 250
+MIN_CHUNK = 10
+HEADROOM = 0.8          # use at most this share of the free budget per chunk
+SAMPLE_INTERVAL = 0.05  # seconds between RSS samples
+
+
+def rss_mb():
+    """
+    Resident set size of this process in MiB.
+    """
+    return psutil.Process().memory_info().rss / 2 ** 20
+
+
+def release():
+    """
+    Collects garbage and hands freed heap pages back to the OS where the C
+    library allows it, so the next chunk starts from a low RSS.
+    """
+    gc.collect()
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def chunking_from_env():
+    """
+    (chunk size, memory budget in MiB) from SCANNER_CHUNK_SIZE and
+    SCANNER_MEMORY_MB; None where unset.
+    """
+    chunk_size = os.getenv('SCANNER_CHUNK_SIZE')
+    budget = os.getenv('SCANNER_MEMORY_MB')
+    return (int(chunk_size) if chunk_size else None,
+            float(budget) if budget else None)
+
+
+class PeakSampler:
+    """
+    Context manager recording the peak RSS (MiB) while the block runs.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._process = psutil.Process()
+
+    def _sample(self):
+        rss = self._process.memory_info().rss / 2 ** 20
+        self.peak = max(self.peak, rss)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False
+
+
+class Chunker:
+    """
+    Splits a ticker list into chunks, sizing each one from the memory the
+    previous chunks used per ticker so the peak RSS stays under `budget_mb`.
+    """
+
+    def __init__(self, chunk_size=None, budget_mb=None):
+        self.chunk_size = chunk_size or DEFAULT_CHUNK
+        self.budget_mb = budget_mb
+        self.per_ticker_mb = None
+        self.peak_mb = 0.0
+
+    def _next_size(self, remaining):
+        if self.budget_mb is None or self.per_ticker_mb is None:
+            return min(self.chunk_size, remaining)
+        free = self.budget_mb - rss_mb()
+        size = int(free * HEADROOM / self.per_ticker_mb) if self.per_ticker_mb > 0 else remaining
+        if size < MIN_CHUNK:
+            print(f"Memory budget of {self.budget_mb:.0f} MiB is nearly used up "
+                  f"({rss_mb():.0f} MiB resident); continuing with {MIN_CHUNK}-ticker chunks.")
+        return max(MIN_CHUNK, min(size, remaining))
+
+    def chunks(self, tickers):
+        """
+        Yields lists of tickers. Run each chunk's work before asking for the
+        next one: the time between yields is what gets measured.
+        """
+        tickers = list(tickers)
+        done = 0
+        while done < len(tickers):
+            chunk = tickers[done:done + self._next_size(len(tickers) - done)]
+            release()
+            start_mb = rss_mb()
+            with PeakSampler() as sampler:
+                yield chunk
+            self.peak_mb = max(self.peak_mb, sampler.peak)
+            used = max(sampler.peak - start_mb, 0.0) / len(chunk)
+            # Keep the largest per-ticker cost seen, so one light chunk does
+            # not let the next one overshoot
+            self.per_ticker_mb = max(self.per_ticker_mb or 0.0, used)
+            done += len(chunk)
+        release()
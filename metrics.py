@@ -0,0 +1,196 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+############################
+# Run Metrics
+############################
+# Per-stage instrumentation for screener runs. A run is opened with
+# `start_run(name)`; code wraps its stages in `with metrics.stage(name):`
+# and every stage records its wall time, item counts and, for HTTP done
+# through the shared session (see `watch_session`), the number of requests,
+# cache hits, bytes received and time spent waiting on the rate limiter.
+# Counts go to the innermost open stage, so a download stage nested inside
+# an engine stage is reported on its own.
+#
+# `finish_run()` exports the run according to SCANNER_METRICS:
+#
+#     jsonl   (default) one JSON line per run appended to stockdata/metrics/runs.jsonl
+#     prom    Prometheus text file stockdata/metrics/{run}.prom, for the
+#             node_exporter textfile collector
+#     both    both of the above
+#     off     nothing is recorded
+#
+# Without an open run every call here is a no-op, so library code can be
+# instrumented unconditionally. Only the standard library is imported.
+
+METRICS_DIR = os.path.join('stockdata', 'metrics')
+PREFIX = 'scanner'
+
+_run = None
+
+
+class Run:
+    """
+    Stage records of one screener run.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = datetime.now().astimezone()
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.open = []
+
+    def record(self, name):
+        return self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+
+    def current(self):
+        return self.record(self.open[-1] if self.open else 'run')
+
+    def to_dict(self):
+        stages = {}
+        for name, values in self.stages.items():
+            values = dict(values)
+            requests = values.get('requests', 0)
+            if requests:
+                values['cache_hit_ratio'] = values.get('cache_hits', 0) / requests
+            stages[name] = values
+        return {
+            'run': self.name,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'seconds': time.perf_counter() - self.started,
+            'stages': stages,
+        }
+
+
+def _mode():
+    return os.getenv('SCANNER_METRICS', 'jsonl').lower()
+
+
+def start_run(name):
+    """
+    Opens a run named `name` (e.g. 'engine', 'nrcross2h'); stages recorded
+    from now on belong to it.
+    """
+    global _run
+    _run = Run(name) if _mode() != 'off' else None
+    return _run
+
+
+@contextmanager
+def stage(name, items=None):
+    """
+    Times the enclosed block as stage `name`. `items` (e.g. the number of
+    tickers) is added to the stage's item count.
+    """
+    run = _run
+    if run is None:
+        yield
+        return
+    record = run.record(name)
+    record['calls'] += 1
+    if items is not None:
+        record['items'] = record.get('items', 0) + items
+    run.open.append(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record['seconds'] += time.perf_counter() - start
+        run.open.remove(name)
+
+
+def count(**counts):
+    """
+    Adds `counts` (e.g. rows=12) to the innermost open stage.
+    """
+    if _run is None:
+        return
+    record = _run.current()
+    for key, value in counts.items():
+        record[key] = record.get(key, 0) + value
+
+
+def watch_session(session):
+    """
+    Counts every request sent through `session` (requests, cache hits, bytes
+    received, rate-limiter wait) against the stage open at the time.
+    """
+    send = session.send
+
+    def timed_send(request, **kwargs):
+        if _run is None:
+            return send(request, **kwargs)
+        start = time.perf_counter()
+        response = send(request, **kwargs)
+        wall = time.perf_counter() - start
+        from_cache = bool(getattr(response, 'from_cache', False))
+        length = response.headers.get('Content-Length')
+        received = int(length) if length and length.isdigit() else len(response.content or b'')
+        counts = {'requests': 1, 'cache_hits': int(from_cache), 'bytes': received, 'http_seconds': wall}
+        if not from_cache and response.elapsed is not None:
+            # What the limiter added on top of the round trip itself
+            counts['limiter_wait_seconds'] = max(wall - response.elapsed.total_seconds(), 0.0)
+        count(**counts)
+        return response
+
+    session.send = timed_send
+    return session
+
+
+############################
+# Export
+############################
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def to_prometheus(data):
+    """
+    Prometheus text exposition of a `Run.to_dict()`.
+    """
+    run = _label(data['run'])
+    lines = [
+        f'# TYPE {PREFIX}_run_duration_seconds gauge',
+        f'{PREFIX}_run_duration_seconds{{run="{run}"}} {data["seconds"]:.6f}',
+        f'# TYPE {PREFIX}_run_timestamp_seconds gauge',
+        f'{PREFIX}_run_timestamp_seconds{{run="{run}"}} '
+        f'{datetime.fromisoformat(data["started_at"]).timestamp():.0f}',
+    ]
+    keys = sorted({key for values in data['stages'].values() for key in values})
+    for key in keys:
+        metric = f'{PREFIX}_stage_{key}'
+        lines.append(f'# TYPE {metric} gauge')
+        for name, values in data['stages'].items():
+            if key in values:
+                lines.append(f'{metric}{{run="{run}",stage="{_label(name)}"}} {values[key]}')
+    return '\n'.join(lines) + '\n'
+
+
+def finish_run():
+    """
+    Closes the open run and exports it (see SCANNER_METRICS). Returns the
+    run as a dict, or None if no run was open.
+    """
+    global _run
+    run, _run = _run, None
+    if run is None:
+        return None
+    data = run.to_dict()
+    mode = _mode()
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        if mode in ('jsonl', 'both'):
+            with open(os.path.join(METRICS_DIR, 'runs.jsonl'), 'a') as f:
+                f.write(json.dumps(data) + '\n')
+        if mode in ('prom', 'both'):
+            path = os.path.join(METRICS_DIR, f'{run.name}.prom')
+            with open(path + '.tmp', 'w') as f:
+                f.write(to_prometheus(data))
+            os.replace(path + '.tmp', path)
+    except OSError as e:
+        print(f"Could not write metrics for run {run.name}: {e}")
+    return data
@@ -0,0 +1,241 @@
+import atexit
+import os
+import queue
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+############################
+# Telegram Outbox
+############################
+# Screener alerts go through one outbox instead of a bare `requests.post`
+# per message:
+#
+#   - one pooled keep-alive session for every chat, so a run opens one TLS
+#     connection to api.telegram.org rather than one per message
+#   - messages longer than Telegram's 4096-character cap are split on line
+#     boundaries into valid-sized parts, sent in order
+#   - each chat (the default and the cross channel) has its own worker
+#     thread and queue, so the channels are delivered concurrently and a
+#     slow chat does not hold up the other
+#   - sends to one chat are paced (PER_CHAT_INTERVAL), 429 answers are
+#     retried after the `retry_after` Telegram asks for, and network or 5xx
+#     failures are retried with exponential backoff and jitter
+#
+# `send` only queues the message, so a slow Telegram API never stalls the
+# scan. Queued messages are flushed when the process exits (or with
+# `flush()`), which is what the one-shot cron scripts rely on; the resident
+# daemon just keeps delivering in the background. A caller that must know
+# a message arrived (signalstore.py records signals only once alerted)
+# passes `on_delivered`, called from the worker after the last part is
+# accepted and never if any part is given up on.
+
+API_URL = 'https://api.telegram.org/bot{token}/sendMessage'
+MAX_LENGTH = 4096
+PER_CHAT_INTERVAL = 1.0   # seconds between messages to one chat
+RETRIES = 5
+TIMEOUT = 15
+FLUSH_TIMEOUT = 120       # seconds to wait for queued messages at exit
+
+# channel -> (bot token variable, chat id variable)
+CHANNELS = {
+    'default': ('TELEGRAM_BOT_TOKEN', 'TELEGRAM_CHAT_ID'),
+    'cross': ('CROSS_TELEGRAM_BOT_TOKEN', 'CROSS_TELEGRAM_CHAT_ID'),
+}
+
+
+def _length(text):
+    # Telegram counts UTF-16 code units, so emoji count as two
+    return len(text.encode('utf-16-le')) // 2
+
+
+def split_message(text, limit=MAX_LENGTH):
+    """
+    Splits `text` into parts of at most `limit` characters, breaking between
+    lines where possible so table rows stay whole. Blank lines are kept,
+    except at the ends of a part where the text was split.
+    """
+    if _length(text) <= limit:
+        return [text]
+    parts, current = [], None
+    for line in text.split('\n'):
+        # A single line over the limit is cut into pieces
+        while _length(line) > limit:
+            if current is not None:
+                parts.append(current)
+                current = None
+            cut = limit
+            while _length(line[:cut]) > limit:
+                cut -= 1
+            parts.append(line[:cut])
+            line = line[cut:]
+        candidate = line if current is None else f'{current}\n{line}'
+        if _length(candidate) > limit:
+            parts.append(current)
+            current = line
+        else:
+            current = candidate
+    if current is not None:
+        parts.append(current)
+    # Blank lines at a split separate nothing, and Telegram rejects empty parts
+    last = len(parts) - 1
+    parts = [part.lstrip('\n') if i > 0 else part for i, part in enumerate(parts)]
+    parts = [part.rstrip('\n') if i < last else part for i, part in enumerate(parts)]
+    return [part for part in parts if part]
+
+
+class _Delivery:
+    """
+    Counts the parts of one message down and calls `callback` once all of
+    them were delivered.
+    """
+
+    def __init__(self, parts, callback):
+        self.remaining = parts
+        self.ok = True
+        self.callback = callback
+
+    def done(self, ok):
+        # Parts of one message go through one chat worker, one at a time
+        self.ok = self.ok and ok
+        self.remaining -= 1
+        if self.remaining == 0 and self.ok:
+            try:
+                self.callback()
+            except Exception as e:
+                print(f"Telegram delivery callback failed: {e}")
+
+
+class Outbox:
+    """
+    Queues Telegram messages and delivers them from one worker thread per
+    chat over a shared keep-alive session.
+    """
+
+    def __init__(self, session=None, interval=PER_CHAT_INTERVAL, retries=RETRIES):
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=len(CHANNELS))
+            session.mount('https://', adapter)
+        self.session = session
+        self.interval = interval
+        self.retries = retries
+        self.queues = {}
+        self.lock = threading.Lock()
+        self.failed = 0
+
+    def send(self, text, channel='default', on_delivered=None):
+        """
+        Queues `text` for `channel` ('default' or 'cross'), split as needed.
+        Returns at once; delivery happens in the background, and
+        `on_delivered()` is called once every part has been delivered.
+        """
+        token_var, chat_var = CHANNELS[channel]
+        token, chat_id = os.getenv(token_var), os.getenv(chat_var)
+        if not token or not chat_id:
+            print(f"{token_var} / {chat_var} not set; Telegram message not sent.")
+            return
+        parts = split_message(text)
+        delivery = None if on_delivered is None else _Delivery(len(parts), on_delivered)
+        chat = self._queue(token, chat_id)
+        for part in parts:
+            chat.put((token, chat_id, part, delivery))
+
+    def _queue(self, token, chat_id):
+        with self.lock:
+            key = (token, chat_id)
+            if key not in self.queues:
+                self.queues[key] = queue.Queue()
+                threading.Thread(target=self._worker, args=(self.queues[key],), daemon=True).start()
+            return self.queues[key]
+
+    def _worker(self, chat):
+        last_sent = 0.0
+        while True:
+            token, chat_id, text, delivery = chat.get()
+            try:
+                wait = last_sent + self.interval - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                ok = self._deliver(token, chat_id, text)
+                last_sent = time.monotonic()
+                if delivery is not None:
+                    delivery.done(ok)
+            finally:
+                chat.task_done()
+
+    def _deliver(self, token, chat_id, text):
+        url = API_URL.format(token=token)
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.post(url, data={'chat_id': chat_id, 'text': text},
+                                             timeout=TIMEOUT)
+            except requests.RequestException as e:
+                delay, reason = min(2 ** attempt, 60) * random.uniform(0.5, 1.5), repr(e)
+            else:
+                if response.status_code == 200:
+                    return True
+                if response.status_code == 429:
+                    try:
+                        delay = float(response.json()['parameters']['retry_after'])
+                    except (ValueError, KeyError, TypeError):
+                        delay = min(2 ** attempt, 60)
+                    reason = 'rate limited'
+                elif response.status_code >= 500:
+                    delay = min(2 ** attempt, 60) * random.uniform(0.5, 1.5)
+                    reason = f'HTTP {response.status_code}'
+                else:
+                    # Bad token, chat or text: retrying will not help
+                    print(f"Telegram rejected a message to chat {chat_id}: "
+                          f"HTTP {response.status_code} {response.text[:200]}")
+                    break
+            if attempt < self.retries:
+                print(f"Telegram send to chat {chat_id} failed ({reason}), retrying in {delay:.1f}s.")
+                time.sleep(delay)
+        else:
+            print(f"Giving up on a Telegram message to chat {chat_id} after {self.retries + 1} attempts.")
+        with self.lock:
+            self.failed += 1
+        return False
+
+    def flush(self, timeout=None):
+        """
+        Waits until every queued message has been delivered or given up on,
+        or `timeout` seconds have passed. Returns True if all queues drained.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            chats = list(self.queues.values())
+        for chat in chats:
+            while chat.unfinished_tasks:
+                if deadline is not None and time.monotonic() >= deadline:
+                    print(f"Telegram outbox still has {chat.unfinished_tasks} message(s) queued; exiting.")
+                    return False
+                time.sleep(0.05)
+        return True
+
+
+_outbox = None
+
+
+def get_outbox():
+    """
+    Returns the process-wide Outbox, creating it on first call. Queued
+    messages are flushed at interpreter exit.
+    """
+    global _outbox
+    if _outbox is None:
+        _outbox = Outbox()
+        atexit.register(_outbox.flush, FLUSH_TIMEOUT)
+    return _outbox
+
+
+def send_telegram_message(message, channel='default', on_delivered=None):
+    """
+    Queues `message` for the default (or 'cross') Telegram chat; see
+    `Outbox.send` for `on_delivered`.
+    """
+    get_outbox().send(message, channel, on_delivered)
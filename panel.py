@@ -0,0 +1,254 @@
+import numpy as np
+import pandas as pd
+
+from rsquared import window_moments, window_sum, smoothed_r2
+
+############################
+# Panel-wide Indicators
+############################
+# A "panel" is a DataFrame with one row per bar and one column per ticker,
+# e.g. `his_data['Close']` from `yf.Tickers(...).history()`. Every indicator
+# here runs over all tickers in one vectorized call.
+#
+# Tickers do not always have a bar on every row (late listings, halts, empty
+# resample bins). The per-ticker scripts dropped those rows before computing,
+# so here each column is packed (valid bars moved to the top, in order) before
+# the rolling maths runs and unpacked afterwards. Warmup therefore starts at
+# each ticker's own first bar and windows never span a missing bar.
+
+OHLCV_AGG = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Volume': 'sum',
+}
+
+
+def from_history(his_data, fields=('Open', 'High', 'Low', 'Close', 'Volume')):
+    """
+    Splits the wide `yf.Tickers(...).history()` frame into one panel per
+    price field. Rows where no ticker has data are dropped.
+    """
+    panels = {}
+    for field in fields:
+        if field in his_data.columns.get_level_values(0):
+            panels[field] = his_data[field]
+    close = panels['Close']
+    keep = close.notna().any(axis=1)
+    panels = {field: panel[keep] for field, panel in panels.items()}
+    for field in ('Open', 'High', 'Low', 'Close'):
+        if field in panels:
+            panels[field] = panels[field].round(2)
+    return panels
+
+
+def resample(panels, rule, **kwargs):
+    """
+    Resamples every panel to coarser bars (e.g. '2h'), aggregating each field
+    the same way the per-ticker scripts did. A bar is kept for a ticker only
+    when all of its OHLC fields are present, matching `.dropna()`. Extra
+    keyword arguments (label, closed, ...) go to `DataFrame.resample`.
+    """
+    out = {}
+    for field, panel in panels.items():
+        out[field] = panel.resample(rule, **kwargs).agg(OHLCV_AGG.get(field, 'last'))
+    missing = None
+    for field in ('Open', 'High', 'Low', 'Close'):
+        if field in out:
+            isna = out[field].isna()
+            missing = isna if missing is None else (missing | isna)
+    if 'Volume' in out and missing is not None:
+        # resample().sum() turns empty bins into 0 rather than NaN
+        out['Volume'] = out['Volume'].mask(missing)
+    keep = ~missing.all(axis=1)
+    return {field: panel[keep].mask(missing[keep]) for field, panel in out.items()}
+
+
+############################
+# Packing (NaN-aware warmup)
+############################
+def pack(arr):
+    """
+    Moves the valid values of each column to the top, keeping their order.
+    Returns the packed array and the row order needed to unpack it.
+    """
+    order = np.argsort(np.isnan(arr), axis=0, kind='stable')
+    return np.take_along_axis(arr, order, axis=0), order
+
+
+def unpack(packed, order, valid):
+    """
+    Inverse of `pack`: scatters packed results back onto the original rows.
+    Rows that were missing for a ticker come back as NaN.
+    """
+    out = np.empty_like(packed)
+    np.put_along_axis(out, order, packed, axis=0)
+    return np.where(valid, out, np.nan)
+
+
+def _packed(func):
+    """
+    Runs `func` on the packed (bars x tickers) values of the first panel
+    argument and returns panel(s) with the original index and columns.
+    """
+    def wrapper(panel, *args, **kwargs):
+        arr = panel.to_numpy(dtype=np.float64)
+        valid = ~np.isnan(arr)
+        packed, order = pack(arr)
+        result = func(packed, *args, **kwargs)
+
+        def to_panel(values):
+            values = unpack(values, order, valid)
+            return pd.DataFrame(values, index=panel.index, columns=panel.columns)
+
+        if isinstance(result, tuple):
+            return tuple(to_panel(values) for values in result)
+        return to_panel(result)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+############################
+# Indicators
+############################
+@_packed
+def linreg(arr, length):
+    """
+    Rolling linear regression value at the last bar of each window, the same
+    as `ta.linreg(close, length)` in pandas_ta.
+    """
+    if arr.shape[0] == 0:
+        return arr.copy()
+    mean_y, sxy, _, _ = window_moments(arr, length)
+    sxx = length * (length * length - 1) / 12.0
+    mean_x = (length - 1) / 2.0
+    return mean_y + (sxy / sxx) * (length - 1 - mean_x)
+
+
+@_packed
+def r2(arr, length, avg_len):
+    """
+    Returns (r2, r2_smoothed): rolling R² and its `avg_len`-bar SMA
+    (SquareR and AvgSqrR in cross.txt).
+    """
+    return smoothed_r2(arr, length, avg_len)
+
+
+@_packed
+def sma(arr, length):
+    """
+    Simple moving average over `length` bars.
+    """
+    return window_sum(arr, length) / length
+
+
+@_packed
+def rsi(arr, length=14):
+    """
+    Wilder RSI, matching `ta.rsi(close, length)` from pandas_ta (an RMA of
+    gains and losses with `min_periods=length`).
+    """
+    frame = pd.DataFrame(arr)
+    diff = frame.diff()
+    gains = diff.clip(lower=0)
+    losses = diff.clip(upper=0).abs()
+    alpha = 1.0 / length
+    avg_gain = gains.ewm(alpha=alpha, min_periods=length).mean()
+    avg_loss = losses.ewm(alpha=alpha, min_periods=length).mean()
+    return (100 * avg_gain / (avg_gain + avg_loss)).to_numpy()
+
+
+############################
+# Signal Flags
+############################
+@_packed
+def _shift(arr, periods=1):
+    out = np.full(arr.shape, np.nan)
+    out[periods:] = arr[:-periods]
+    return out
+
+
+def crossover(fast, slow):
+    """
+    1 where `fast` crosses above `slow` on this bar, else 0. The previous bar
+    is the ticker's own previous bar, not the previous panel row.
+    """
+    flags = (fast > slow) & (_shift(fast) <= _shift(slow))
+    return flags.astype(np.int8)
+
+
+def crossunder(fast, slow):
+    """
+    1 where `fast` crosses below `slow` on this bar, else 0.
+    """
+    flags = (fast < slow) & (_shift(fast) >= _shift(slow))
+    return flags.astype(np.int8)
+
+
+def crossunder_level(panel, level):
+    """
+    1 where `panel` drops from above `level` to at or below it, else 0.
+    """
+    flags = (_shift(panel) > level) & (panel <= level)
+    return flags.astype(np.int8)
+
+
+############################
+# Result Assembly
+############################
+def tail_start(close, recent, warmup):
+    """
+    First row needed to evaluate the bars within `recent` of each ticker's
+    last bar, with `warmup` of the ticker's own bars before them. Slicing
+    every panel from this row gives windowed indicators the same values on
+    those bars as the full history does.
+    """
+    has_bar = close.notna().to_numpy()
+    if not has_bar.any():
+        return 0
+    n = has_bar.shape[0]
+    last_row = n - 1 - np.argmax(has_bar[::-1], axis=0)
+    cutoff = (close.index[last_row] - recent).values
+    # First row of each ticker's window, and its bars counted up to each row
+    first_row = (close.index.values[:, None] < cutoff[None, :]).sum(axis=0)
+    counts = np.vstack([np.zeros((1, has_bar.shape[1]), dtype=int), np.cumsum(has_bar, axis=0)])
+    before = counts[first_row, np.arange(has_bar.shape[1])]
+    # The row holding each ticker's `warmup`-th bar before its window
+    needed = np.maximum(before - warmup, 0)
+    start = (counts <= needed[None, :]).sum(axis=0) - 1
+    return int(max(start[has_bar.any(axis=0)].min(), 0))
+
+
+def recent_signals(flags, close, recent):
+    """
+    Collects flagged bars within `recent` (a Timedelta) of each ticker's own
+    last bar; `recent=None` keeps every flagged bar. `flags` maps output
+    column names (e.g. 'Buy Signal') to 0/1 panels. Returns a DataFrame with
+    'Ticker', 'Date' and one column per flag, ordered like the per-ticker
+    loops produced it.
+    """
+    columns = list(flags)
+    if close.empty:
+        return pd.DataFrame(columns=['Ticker', 'Date'] + columns)
+    has_bar = close.notna().to_numpy()
+    if recent is None:
+        in_window = has_bar
+    else:
+        # Last bar per ticker, then the per-ticker cutoff
+        last_row = has_bar.shape[0] - 1 - np.argmax(has_bar[::-1], axis=0)
+        cutoff = (close.index[last_row] - recent).values
+        in_window = (close.index.values[:, None] >= cutoff[None, :]) & has_bar
+
+    any_flag = np.zeros(has_bar.shape, dtype=bool)
+    for panel in flags.values():
+        any_flag |= panel.to_numpy() == 1
+    rows, cols = np.nonzero((any_flag & in_window).T)
+    result = pd.DataFrame({
+        'Ticker': close.columns.to_numpy()[rows],
+        'Date': close.index[cols],
+    })
+    for name, panel in flags.items():
+        result[name] = panel.to_numpy()[cols, rows]
+    return result
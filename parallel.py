@@ -0,0 +1,155 @@
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from state import IndicatorState, TickerState
+
+############################
+# Process-pool Indicator Updates
+############################
+# Optional parallel mode for `IndicatorState.update`. The High/Low/Close
+# panels are written once to a memory-mapped .npy file; each worker maps it
+# read-only and builds its slice of tickers as views, so no DataFrame is
+# pickled per task. Workers get their tickers' saved state (a few hundred
+# floats each), run the same `IndicatorState.update` the serial path runs,
+# and send back the updated state plus compact signal records: the flagged
+# rows and each ticker's last row, which is all `state.recent_signals` needs.
+#
+# Set SCANNER_WORKERS (e.g. SCANNER_WORKERS=8) to enable it in nrcross2h.py
+# and two.py; unset or 1 keeps the serial path. `python parallel.py` prints a
+# scaling report on a synthetic universe.
+
+FIELDS = ('High', 'Low', 'Close')
+FLAG_COLUMNS = ['buy_signal', 'sell_signal', 'cross_signal']
+
+
+def workers_from_env(default=1):
+    """
+    Worker count from SCANNER_WORKERS; 0 means one per CPU.
+    """
+    value = int(os.getenv('SCANNER_WORKERS', default))
+    if value == 0:
+        return os.cpu_count() or 1
+    return max(value, 1)
+
+
+def _compact(rows):
+    """
+    Keeps the flagged rows and each ticker's last row as plain tuples.
+    """
+    if rows.empty:
+        return []
+    flagged = rows[FLAG_COLUMNS].eq(1).any(axis=1)
+    last = ~rows['Ticker'].duplicated(keep='last')
+    return list(rows[flagged | last].itertuples(index=False, name=None))
+
+
+def _worker(path, times, tz, tickers, cols, params, check_every, states):
+    """
+    Runs in a pool process: updates `tickers` (the column slice `cols` of the
+    mapped array) and returns (updated state dicts, compact rows).
+    """
+    arr = np.load(path, mmap_mode='r')
+    index = pd.DatetimeIndex(times)
+    if tz is not None:
+        index = index.tz_localize('UTC').tz_convert(tz)
+    bars = {
+        field: pd.DataFrame(arr[i][:, cols], index=index, columns=tickers, copy=False)
+        for i, field in enumerate(FIELDS)
+    }
+    state = IndicatorState(None, check_every=check_every, **params)
+    state.tickers = {t: TickerState.from_dict(d) for t, d in states.items()}
+    rows = state.update(bars)
+    return {t: item.to_dict() for t, item in state.tickers.items()}, _compact(rows)
+
+
+def update(state, bars, workers=None):
+    """
+    Same as `state.update(bars)`, split across `workers` processes. Returns
+    only the flagged rows and each ticker's last row, which is enough for
+    `state.recent_signals`.
+    """
+    workers = workers_from_env() if workers is None else workers
+    close = bars['Close']
+    if workers <= 1 or close.shape[1] < 2:
+        return state.update(bars)
+
+    index = close.index
+    tz = str(index.tz) if index.tz is not None else None
+    # Plain UTC datetime64 values pickle compactly; the worker restores the tz
+    times = (index.tz_convert('UTC').tz_localize(None) if tz else index).to_numpy()
+    columns = list(close.columns)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'bars.npy')
+        out = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64,
+                                        shape=(len(FIELDS),) + close.shape)
+        for i, field in enumerate(FIELDS):
+            out[i] = bars[field].reindex(index=index, columns=columns).to_numpy(dtype=np.float64)
+        out.flush()
+        del out
+
+        chunks = [c for c in np.array_split(np.arange(len(columns)), workers) if len(c)]
+        with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+            futures = []
+            for chunk in chunks:
+                cols = slice(chunk[0], chunk[-1] + 1)
+                tickers = columns[cols]
+                states = {t: state.tickers[t].to_dict() for t in tickers if t in state.tickers}
+                futures.append(pool.submit(_worker, path, times, tz, tickers, cols,
+                                           state.params, state.check_every, states))
+            records = []
+            for future in futures:
+                states, rows = future.result()
+                state.tickers.update({t: TickerState.from_dict(d) for t, d in states.items()})
+                records.extend(rows)
+
+    columns = ['Ticker', 'Date', 'reg1', 'reg2', 'r2', 'r2_smoothed'] + FLAG_COLUMNS
+    rows = pd.DataFrame(records, columns=columns)
+    if not rows.empty:
+        rows['Date'] = pd.DatetimeIndex(rows['Date'])
+    return rows
+
+
+############################
+# Scaling Report
+############################
+def _synthetic_bars(n_tickers, n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2024-01-02 09:00', periods=n_bars, freq='2h', tz='US/Eastern')
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (n_bars, n_tickers)), axis=0))
+    columns = [f'T{i}' for i in range(n_tickers)]
+    return {
+        'High': pd.DataFrame(close * 1.005, index=index, columns=columns),
+        'Low': pd.DataFrame(close * 0.995, index=index, columns=columns),
+        'Close': pd.DataFrame(close, index=index, columns=columns),
+    }
+
+
+def scaling_report(n_tickers=500, n_bars=1000, max_workers=None):
+    """
+    Times a full rebuild of `n_tickers` x `n_bars` with 1, 2, 4, ... workers
+    and prints wall time and speed-up against the serial path.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    bars = _synthetic_bars(n_tickers, n_bars)
+    counts = sorted({1} | {2 ** k for k in range(1, max_workers.bit_length()) if 2 ** k <= max_workers}
+                    | {max_workers})
+    print(f"Full rebuild, {n_tickers} tickers x {n_bars} bars, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'seconds':>9} {'speed-up':>9}")
+    base = None
+    for count in counts:
+        state = IndicatorState(None)
+        start = time.perf_counter()
+        update(state, bars, workers=count)
+        elapsed = time.perf_counter() - start
+        base = base or elapsed
+        print(f"{count:>8} {elapsed:>9.2f} {base / elapsed:>8.2f}x")
+
+
+if __name__ == "__main__":
+    scaling_report(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytz
+
+import panel
+
+############################
+# Download Planner
+############################
+# Scripts and strategies ask for (timeframe, look-back) pairs such as
+# ('1h', 730 days) or ('2h', 30 days). The planner maps every timeframe to
+# the Yahoo interval it is built from and merges the requests into one
+# download per interval, covering the longest look-back asked of it:
+#
+#     1h          -> 60m (same bars, Yahoo's two names for it)
+#     2h, 4h      -> resampled locally from 60m
+#     1wk         -> resampled locally from 1d
+#
+# so ('60m', 30d) for the hourly screener, ('2h', 30d) for the 2h ones and
+# ('4h', 60d) all come out of a single 60m/60d download.
+
+ALIASES = {'1h': '60m'}
+
+# timeframe -> (source interval, pandas resample rule, extra resample kwargs)
+DERIVED = {
+    '2h': ('60m', '2h', {}),
+    '4h': ('60m', '4h', {}),
+    # Yahoo's weekly bars start on Monday and are labelled with that Monday
+    '1wk': ('1d', 'W-MON', {'label': 'left', 'closed': 'left'}),
+}
+
+# Yahoo only serves this much history for intraday intervals
+MAX_HISTORY = {
+    '15m': timedelta(days=60),
+    '60m': timedelta(days=730),
+}
+
+
+def source(timeframe):
+    """
+    Returns (interval to download, resample rule or None, resample kwargs).
+    """
+    if timeframe in DERIVED:
+        return DERIVED[timeframe]
+    return ALIASES.get(timeframe, timeframe), None, {}
+
+
+def plan_downloads(requests):
+    """
+    Merges (timeframe, lookback) requests into the downloads covering them.
+    Returns {interval: {'lookback': timedelta, 'timeframes': {timeframe:
+    lookback}}}, where each timeframe keeps the longest look-back requested
+    for it. Look-backs beyond what Yahoo serves are clamped with a warning.
+    """
+    downloads = {}
+    for timeframe, lookback in requests:
+        interval = source(timeframe)[0]
+        limit = MAX_HISTORY.get(interval)
+        if limit is not None and lookback > limit:
+            print(f"{timeframe} look-back of {lookback.days} days exceeds the {limit.days} days "
+                  f"Yahoo serves for {interval}; clamping.")
+            lookback = limit
+        item = downloads.setdefault(interval, {'lookback': lookback, 'timeframes': {}})
+        item['lookback'] = max(item['lookback'], lookback)
+        timeframes = item['timeframes']
+        timeframes[timeframe] = max(timeframes.get(timeframe, lookback), lookback)
+    return downloads
+
+
+def _trim(index, lookback):
+    """
+    Mask of the bars in `index` inside the last `lookback`.
+    """
+    start = pd.Timestamp(datetime.now(pytz.utc) - lookback)
+    if index.tz is None:
+        start = start.tz_convert(None)
+    return index >= start
+
+
+def derive_panels(bars, timeframe, lookback=None):
+    """
+    Builds `timeframe` from the (bars x tickers) panels of its source
+    interval, trimmed to `lookback` when given.
+    """
+    _, rule, kwargs = source(timeframe)
+    if rule is not None:
+        bars = panel.resample(bars, rule, **kwargs)
+    if lookback is not None:
+        bars = trim_panels(bars, lookback)
+    return bars
+
+
+def trim_panels(bars, lookback):
+    """
+    The bars of `bars` inside the last `lookback`.
+    """
+    keep = _trim(bars['Close'].index, lookback)
+    return {field: values[keep] for field, values in bars.items()}
+
+
+def derive_frame(df, timeframe, lookback=None):
+    """
+    Single-ticker version of `derive_panels` for an OHLCV DataFrame.
+    """
+    _, rule, kwargs = source(timeframe)
+    if rule is not None:
+        agg = {c: panel.OHLCV_AGG[c] for c in df.columns if c in panel.OHLCV_AGG}
+        df = df.resample(rule, **kwargs).agg(agg)
+        df = df.dropna(subset=[c for c in ('Open', 'High', 'Low', 'Close') if c in df.columns])
+    if lookback is not None:
+        df = df[_trim(df.index, lookback)]
+    return df
@@ -0,0 +1,186 @@
+import os
+import sqlite3
+import threading
+import time
+
+############################
+# Shared Adaptive Rate Limiter
+############################
+# Every screener used to build its own in-memory limiter, so when cron
+# started rcross1h.py and nrcross2h.py in the same minute each one spent the
+# whole budget and together they ran into Yahoo's throttling. The limiter
+# state now lives in a small SQLite file (stockdata/ratelimit.sqlite) that
+# every process on the host draws from: one token bucket per service,
+# updated in a short write transaction per request, so concurrent runs share
+# the rate instead of multiplying it.
+#
+# The rate adapts to how Yahoo answers (additive increase, multiplicative
+# decrease):
+#
+#   - each fast successful request raises it by INCREASE, up to MAX_RATE
+#   - a 429 halves it (down to MIN_RATE) and pauses every process for the
+#     Retry-After the server asked for (or PAUSE)
+#   - a response slower than SLOW_SECONDS cuts it by SLOW_FACTOR
+#
+# Decreases are applied at most once per COOLDOWN, so a burst of 429s from
+# requests already in flight counts as one. The learned rate is kept between
+# runs, so each run starts from the highest rate that was recently safe.
+
+DB_PATH = os.path.join('stockdata', 'ratelimit.sqlite')
+INITIAL_RATE = 1.0      # requests per second for a new bucket
+MIN_RATE = 0.2
+MAX_RATE = 8.0
+BURST = 2.0             # tokens a bucket can hold
+INCREASE = 0.05         # requests/second added per fast success
+BACKOFF = 0.5           # rate multiplier on a 429
+SLOW_SECONDS = 3.0
+SLOW_FACTOR = 0.8       # rate multiplier on a slow response
+PAUSE = 10.0            # seconds to pause after a 429 without Retry-After
+COOLDOWN = 5.0          # seconds between two decreases
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name         TEXT PRIMARY KEY,
+    rate         REAL NOT NULL,   -- requests per second
+    tokens       REAL NOT NULL,
+    updated      REAL NOT NULL,   -- epoch seconds of the last refill
+    paused_until REAL NOT NULL,
+    decreased_at REAL NOT NULL
+)
+"""
+
+
+class SharedLimiter:
+    """
+    A token bucket named `name` stored at `path`, shared by every process
+    using the same file. `acquire` before each request, `observe` after.
+    """
+
+    def __init__(self, name='yahoo', path=DB_PATH, initial_rate=INITIAL_RATE):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.name = name
+        # Autocommit; transactions are opened explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(SCHEMA)
+        self.conn.execute('INSERT OR IGNORE INTO buckets VALUES (?, ?, ?, ?, 0, 0)',
+                          (name, initial_rate, BURST, time.time()))
+        self.lock = threading.Lock()   # one connection, shared by this process's threads
+        self.waited = 0.0
+
+    def _update(self, change):
+        """
+        Runs `change(row, now)` on the bucket row inside a write transaction;
+        it returns (new row, result).
+        """
+        with self.lock:
+            return self._transaction(change)
+
+    def _transaction(self, change):
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = self.conn.execute('SELECT rate, tokens, updated, paused_until, decreased_at '
+                                    'FROM buckets WHERE name = ?', (self.name,)).fetchone()
+            row, result = change(list(row), time.time())
+            self.conn.execute('UPDATE buckets SET rate = ?, tokens = ?, updated = ?, paused_until = ?, '
+                              'decreased_at = ? WHERE name = ?', (*row, self.name))
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        return result
+
+    @staticmethod
+    def _take(row, now):
+        rate, tokens, updated, paused_until, decreased_at = row
+        tokens = min(BURST, tokens + max(now - updated, 0.0) * rate)
+        if now < paused_until:
+            delay = paused_until - now
+        elif tokens >= 1:
+            tokens, delay = tokens - 1, 0.0
+        else:
+            delay = (1 - tokens) / rate
+        return [rate, tokens, now, paused_until, decreased_at], delay
+
+    def acquire(self):
+        """
+        Blocks until this process may send one request. Returns the seconds
+        waited.
+        """
+        waited = 0.0
+        while True:
+            delay = self._update(self._take)
+            if delay <= 0:
+                self.waited += waited
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    def observe(self, status, seconds, retry_after=None):
+        """
+        Adapts the shared rate to a response: its HTTP `status`, its round
+        trip in `seconds` and any Retry-After value.
+        """
+        def change(row, now):
+            rate, tokens, updated, paused_until, decreased_at = row
+            cooled = now - decreased_at >= COOLDOWN
+            if status == 429:
+                try:
+                    pause = float(retry_after)
+                except (TypeError, ValueError):
+                    pause = PAUSE
+                paused_until = max(paused_until, now + pause)
+                if cooled:
+                    rate, decreased_at = max(MIN_RATE, rate * BACKOFF), now
+            elif seconds > SLOW_SECONDS:
+                if cooled:
+                    rate, decreased_at = max(MIN_RATE, rate * SLOW_FACTOR), now
+            elif status < 400:
+                rate = min(MAX_RATE, rate + INCREASE)
+            return [rate, tokens, updated, paused_until, decreased_at], None
+
+        self._update(change)
+
+    @property
+    def rate(self):
+        with self.lock:
+            return self.conn.execute('SELECT rate FROM buckets WHERE name = ?', (self.name,)).fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+class SharedLimiterMixin:
+    """
+    Session mixin sending every request through the shared limiter, in
+    place of requests_ratelimiter's per-process LimiterMixin.
+    """
+    limiter = None
+
+    def send(self, request, **kwargs):
+        if self.limiter is None:
+            self.limiter = get_limiter()
+        self.limiter.acquire()
+        start = time.monotonic()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            self.limiter.observe(599, time.monotonic() - start)
+            raise
+        self.limiter.observe(response.status_code, time.monotonic() - start,
+                             response.headers.get('Retry-After'))
+        return response
+
+
+_limiters = {}
+
+
+def get_limiter(name='yahoo'):
+    """
+    Returns this process's handle on the shared limiter `name`.
+    """
+    if name not in _limiters:
+        _limiters[name] = SharedLimiter(name)
+    return _limiters[name]
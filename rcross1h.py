@@ -1,19 +1,4 @@
-import pytz
-from datetime import datetime, timedelta
-
-def is_us_market_open():
-    """Checks if the current time is within US market hours (9:30 AM - 4:00 PM ET) and not on weekends."""
-    eastern = pytz.timezone('US/Eastern')
-    now = datetime.now(eastern)
-    
-    # Market closed on weekends
-    if now.weekday() in [5, 6]:  # Saturday (5) and Sunday (6)
-        return False
-    
-    market_open = now.replace(hour=9, minute=30, second=0, microsecond=0)
-    market_close = now.replace(hour=16, minute=0, second=0, microsecond=0)
-    
-    return market_open <= now <= market_close
+from market import is_us_market_open
 
 
 # Ensure the script runs only during US market hours
@@ -22,46 +7,28 @@ if not is_us_market_open():
 else:
     
     import pandas as pd
-    import yfinance as yf
     from datetime import datetime, timedelta
-    import pandas_ta as ta
-    import numpy as np
-    import requests
-    from bs4 import BeautifulSoup
     import os
     from dotenv import load_dotenv
+    from barstore import BarStore
+    from bars import Bars
+    import panel
+    from universe import get_sp500_tickers
+    from fetcher import download_many
     load_dotenv()
 
 
-    # Function to fetch S&P 500 tickers from Wikipedia
-    def get_sp500_tickers():
-        url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
-        response = requests.get(url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        table = soup.find('table', {'id': 'constituents'})
-        tickers = [row.find('td').text.strip() for row in table.find_all('tr')[1:]]
-        return tickers
-
     # Function to send message to Telegram
-    def send_telegram_message(message):
-        bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
-        chat_id = os.getenv("TELEGRAM_CHAT_ID")
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        data = {"chat_id": chat_id, "text": message}
-        requests.post(url, data=data)
-
-    # Get the S&P 500 tickers
-    sp500_tickers = get_sp500_tickers()
+    def send_telegram_message(message, on_delivered=None):
+        from outbox import send_telegram_message as queue_message
+        queue_message(message, on_delivered=on_delivered)
 
     # Ensure the stockdata directory exists
     os.makedirs('stockdata', exist_ok=True)
+    store = BarStore()
 
-    # Save the tickers to a CSV file in the stockdata folder
-    pd.DataFrame(sp500_tickers, columns=["Ticker"]).to_csv('stockdata/sp500_tickers.csv', index=False)
-
-    # Read the tickers from the CSV file in the stockdata folder
-    tickers_df = pd.read_csv('stockdata/sp500_tickers.csv')
-    tickers = tickers_df['Ticker'].tolist()
+    # Get the S&P 500 tickers (cached list, refreshed once a day)
+    tickers = get_sp500_tickers()
 
     # Define the timeframes and their corresponding date ranges
     timeframes = {
@@ -74,26 +41,18 @@ else:
     # Define the recent period (in days)
     recent_period = 1
 
-    # Function to download data for a given ticker and timeframe
-    def download_data(ticker, timeframe, start_date, end_date):
-        return yf.download(ticker, start=start_date, end=end_date, interval=timeframe)
+    # Bars per timeframe: one compact container for all tickers (bars.py)
+    data = {}
 
-    # Dictionary to store data for each timeframe
-    data = {tf: {} for tf in timeframes}
-
-    # Download historical data for each ticker and timeframe
+    # Download historical data for all tickers concurrently, one timeframe at a time
     end_date = datetime.now()
-    for ticker in tickers:
-        for tf, delta in timeframes.items():
-            start_date = end_date - delta
-            try:
-                df = download_data(ticker, tf, start_date, end_date)
-                if df.empty:
-                    print(f"No data available for {ticker} on timeframe {tf}. Skipping.")
-                    continue
-                data[tf][ticker] = df
-            except Exception as e:
-                print(f"Failed to download data for {ticker} with timeframe {tf}: {e}")
+    for tf, delta in timeframes.items():
+        start_date = end_date - delta
+        frames = download_many(tickers, tf, start_date, end_date)
+        for ticker, df in frames.items():
+            if df.empty:
+                print(f"No data available for {ticker} on timeframe {tf}. Skipping.")
+        data[tf] = Bars.from_frames(frames)
 
 
 
@@ -101,72 +60,45 @@ else:
     screener_results = []
 
     # Applying the custom indicator and generating buy/sell signals
-    for tf in timeframes:
-        for ticker in data[tf]:
-            df = data[tf][ticker]
-            
-                    # If the DataFrame columns are a MultiIndex, flatten them
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = df.columns.get_level_values(0)
-
-            
-            # Round OHLC values to two decimal points
-            df['Open'] = df['Open'].round(2)
-            df['High'] = df['High'].round(2)
-            df['Low'] = df['Low'].round(2)
-            df['Close'] = df['Close'].round(2)
-            
+    for tf, bars in data.items():
+        if not bars.tickers:
+            continue
+        # Round OHLC values to two decimal points
+        bars.round_prices(2)
+
         # --- Existing calculations ---
-            # Linear Regression Curves
-            
-            df['reg1'] = ta.linreg(df['Close'], length=25)
-            df['reg2'] = ta.linreg(df['Close'], length=50)
-            
-
-            df['buy_signal'] = np.where(
-                (df['reg1'] > df['reg2']) & (df['reg1'].shift(1) <= df['reg2'].shift(1)),
-                1,
-                0
-            )
-            
-            # Sell Signal: When the 25-period line (reg1) crosses below the 50-period line (reg2)
-            df['sell_signal'] = np.where(
-                (df['reg1'] < df['reg2']) & (df['reg1'].shift(1) >= df['reg2'].shift(1)),
-                1,
-                0
-            )
-                    
-            # Save each ticker's data to a CSV file in the stockdata folder
-            df.to_csv(f'stockdata/{ticker}_{tf}_data.csv')
-
-            
-            hoursback =1 
-            # Filter for recent periods
-            recent_date_cutoff = df.index.max() - pd.Timedelta(hours=hoursback)
-            df = df[df.index >= recent_date_cutoff]
-            
-            # Filter rows with buy or sell signals
-            df_filtered = df[(df['buy_signal'] == 1) | (df['sell_signal'] == 1)]
-            
-            # Append results to screener list
-            if not df_filtered.empty:
-                for index, row in df_filtered.iterrows():
-                    screener_results.append({
-                        'Ticker': ticker,
-                        'Date': index,
-                        'Buy Signal': row['buy_signal'],
-                        'Sell Signal': row['sell_signal']
-                    })
+        # Linear Regression Curves, every ticker at once (same values as ta.linreg)
+        close = bars.panel('Close')
+        reg1 = bars.set('reg1', panel.linreg(close, 25))
+        reg2 = bars.set('reg2', panel.linreg(close, 50))
+
+        # Buy Signal: 25-period line (reg1) crosses above the 50-period line (reg2)
+        bars.set_flag('buy_signal', panel.crossover(reg1, reg2))
+        # Sell Signal: When the 25-period line (reg1) crosses below the 50-period line (reg2)
+        bars.set_flag('sell_signal', panel.crossunder(reg1, reg2))
+
+        # Save each ticker's data to the bar store in the stockdata folder
+        for ticker in bars.tickers:
+            store.write(ticker, tf, bars.frame(ticker))
+
+        hoursback = 1
+        # Signals within the recent period of each ticker's last bar
+        screener_results.append(bars.signals(
+            {'Buy Signal': 'buy_signal', 'Sell Signal': 'sell_signal'}, pd.Timedelta(hours=hoursback)))
 
     # Save screener results to a CSV file
-    screener_df = pd.DataFrame(screener_results)
+    screener_df = pd.concat(screener_results, ignore_index=True) if screener_results else pd.DataFrame()
     screener_df.to_csv('Regression_cross_screener_results_1h.csv', index=False)
 
+    # Alert only on signals no earlier run has sent (signalstore.py)
+    from signalstore import only_new, recorder
+    screener_df = only_new(screener_df, '1h', 'linreg_cross_1h')
+
 
     # Send results to Telegram
     if not screener_df.empty:
         message = "Hourly screener Results:\n Buy=linreg 25 crossover linreg 50 \n Sell=linreg 25 cross below linreg 50 \n" + screener_df.to_string(index=False)
-        send_telegram_message(message)
+        send_telegram_message(message, on_delivered=recorder(screener_df, '1h', 'linreg_cross_1h'))
 
     # Display a sample of the screener results
     print("Hourly screener Results:\n Buy=linreg 25 crossover linreg 50 \n Sell=linreg 25 cross below linreg 50 \n")
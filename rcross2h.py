@@ -1,105 +1,32 @@
 import os
-import pytz
-import requests
-import pandas as pd
-import pandas_ta as ta
-import numpy as np
-import yfinance as yf
-from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
-import time
+from dotenv import load_dotenv
+from market import is_us_market_open
+load_dotenv()
 ############################
 # 1. Market Open Check
 ############################
-def is_us_market_open():
-    """
-    Checks if the current time is within US market hours (9:30 AM - 4:00 PM ET)
-    and not on weekends.
-    """
-    eastern = pytz.timezone('US/Eastern')
-    now = datetime.now(eastern)
-    
-    # Market closed on weekends
-    if now.weekday() in [5, 6]:  # Saturday (5) or Sunday (6)
-        return False
-    
-    market_open = now.replace(hour=9, minute=25, second=0, microsecond=0)
-    market_close = now.replace(hour=16, minute=15, second=0, microsecond=0)
-    
-    return market_open <= now <= market_close
+# is_us_market_open comes from market.py, which imports nothing heavy.
 
 
 ############################
 # 2. Telegram Functions
 ############################
-def send_telegram_message(message: str):
-    """
-    Sends a given message to a Telegram chat.
-    Fill in your own bot token and chat ID below.
-    """
-    bot_token = "YOUR_TELEGRAM_BOT_TOKEN"
-    chat_id   = "YOUR_CHAT_ID"
-
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    data = {"chat_id": chat_id, "text": message}
-    response = requests.post(url, data=data)
-    return response.json()
-
-def can_send_telegram_message(file_path='telegram_time.txt', threshold_hours=2):
-    """
-    Checks if at least `threshold_hours` have passed since last Telegram message.
-    Uses a file for persistence between script runs.
-    Note: On Heroku, the file system is ephemeral across dyno restarts.
-    """
-    eastern = pytz.timezone('US/Eastern')
-    now = datetime.now(eastern)
-
-    if not os.path.exists(file_path):
-        # No file -> no previous send time -> we can send now
-        return True
-    
-    with open(file_path, 'r') as f:
-        timestamp_str = f.read().strip()
-        if not timestamp_str:
-            # File was empty
-            return True
-        
-        # Parse the stored ISO-format datetime
-        last_sent_time = datetime.fromisoformat(timestamp_str)
-
-    # Compare now vs. last send time
-    return (now - last_sent_time) >= timedelta(hours=threshold_hours)
-
-def update_telegram_send_time(file_path='telegram_time.txt'):
+def send_telegram_message(message: str, on_delivered=None):
     """
-    Writes the current time to a file, marking the last Telegram send time.
+    Sends a given message to the Telegram chat set by TELEGRAM_BOT_TOKEN
+    and TELEGRAM_CHAT_ID.
     """
-    eastern = pytz.timezone('US/Eastern')
-    now = datetime.now(eastern)
-    with open(file_path, 'w') as f:
-        f.write(now.isoformat())
+    from outbox import send_telegram_message as queue_message
+    # Queued on the shared outbox: split to Telegram's size cap, paced and
+    # retried in the background, flushed before the script exits
+    queue_message(message, on_delivered=on_delivered)
 
 
 ############################
 # 3. Utility Functions
 ############################
-def get_sp500_tickers():
-    """
-    Fetches S&P 500 tickers from Wikipedia.
-    """
-    url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    table = soup.find('table', {'id': 'constituents'})
-    tickers = [row.find('td').text.strip() for row in table.find_all('tr')[1:]]
-    return tickers
-
-def download_data(ticker, timeframe, start_date, end_date):
-    """
-    Wrapper around yfinance to download the specified interval data.
-    """
-    return yf.download(ticker, start=start_date, end=end_date, interval=timeframe)
-
+# get_sp500_tickers comes from universe.py, cached on disk between runs.
 
 ############################
 # 4. Main Screener
@@ -110,109 +37,71 @@ def main():
         print("The US market is currently closed. Script execution halted.")
         return
 
+    # Heavy imports only once we know there is work to do
+    import pandas as pd
+    import panel
+    from barstore import BarStore
+    from bars import Bars
+    from universe import get_sp500_tickers
+    from fetcher import download_many
+
     # 4B. Prepare directories
     os.makedirs('stockdata', exist_ok=True)
+    store = BarStore()
 
-    # 4C. Get and store S&P 500 tickers (caching them to CSV for reference)
-    sp500_tickers = get_sp500_tickers()
-    pd.DataFrame(sp500_tickers, columns=["Ticker"]) \
-        .to_csv('stockdata/sp500_tickers.csv', index=False)
-
-    # 4D. Read them back from CSV
-    tickers_df = pd.read_csv('stockdata/sp500_tickers.csv')
-    tickers = tickers_df['Ticker'].tolist()
+    # 4C. Get S&P 500 tickers (cached list, refreshed once a day)
+    tickers = get_sp500_tickers()
 
     # 4E. Define timeframe & range
     timeframes = {'1h': timedelta(days=30)}
     recent_period = 2  # lookback (hours) for new signals
     end_date = datetime.now()
 
-    # 4F. Dictionary to store data
-    data = {tf: {} for tf in timeframes}
-
-    # 4G. Download & resample data
-    for ticker in tickers:
-        for tf, delta in timeframes.items():
-            start_date = end_date - delta
-            try:
-                df = download_data(ticker, tf, start_date, end_date)
-                time.sleep(1)
-                if df.empty:
-                    print(f"No data for {ticker} on {tf}. Skipping.")
-                    continue
-                
-                # Flatten MultiIndex columns if present
-                if isinstance(df.columns, pd.MultiIndex):
-                    df.columns = df.columns.get_level_values(0)
-                
-                # Check required columns
-                required_cols = ['Open', 'High', 'Low', 'Close', 'Volume']
-                if not all(col in df.columns for col in required_cols):
-                    print(f"Missing columns in {ticker} data. Skipping.")
-                    continue
-
-                # Resample 1-hour to 2-hour bars
-                df_resampled = df.resample('2h').agg({
-                    'Open': 'first',
-                    'High': 'max',
-                    'Low': 'min',
-                    'Close': 'last',
-                    'Volume': 'sum'
-                }).dropna()
-                
-                data[tf][ticker] = df_resampled
-            except Exception as e:
-                print(f"Failed downloading {ticker} on {tf}: {e}")
+    # 4F. Bars per timeframe: one compact container for all tickers (bars.py)
+    data = {}
+
+    # 4G. Download (all tickers concurrently, within the shared rate limit) & resample data
+    for tf, delta in timeframes.items():
+        start_date = end_date - delta
+        frames = download_many(tickers, tf, start_date, end_date)
+        for ticker, df in frames.items():
+            if df.empty:
+                print(f"No data for {ticker} on {tf}. Skipping.")
+        hourly = Bars.from_frames(frames)
+        if not hourly.tickers:
+            continue
+        # Resample 1-hour to 2-hour bars (a bin is kept where OHLC are all present)
+        panels = {field: hourly.panel(field) for field in hourly.values}
+        data[tf] = Bars.from_panels(panel.resample(panels, '2h'))
 
     # 4H. List to store screening results
     screener_results = []
 
-    # 4I. Loop over data, compute signals
-    for tf in timeframes:
-        for ticker, df in data[tf].items():
-            # Round OHLC
-            df['Open']  = df['Open'].round(2)
-            df['High']  = df['High'].round(2)
-            df['Low']   = df['Low'].round(2)
-            df['Close'] = df['Close'].round(2)
-            
-            # LinReg(25) & LinReg(50)
-            df['reg1'] = ta.linreg(df['Close'], length=25)
-            df['reg2'] = ta.linreg(df['Close'], length=50)
-            
-            # Buy signals: reg1 crosses above reg2
-            df['buy_signal'] = np.where(
-                (df['reg1'] > df['reg2']) & (df['reg1'].shift(1) <= df['reg2'].shift(1)),
-                1, 0
-            )
-
-            # Sell signals: reg1 crosses below reg2
-            df['sell_signal'] = np.where(
-                (df['reg1'] < df['reg2']) & (df['reg1'].shift(1) >= df['reg2'].shift(1)),
-                1, 0
-            )
-
-            # Save CSV
-            df.to_csv(f'stockdata/{ticker}_{tf}_data.csv')
-
-            # Filter to last 'recent_period' hours
-            if not df.empty:
-                recent_cutoff = df.index.max() - pd.Timedelta(hours=recent_period)
-                df_recent = df[df.index >= recent_cutoff]
-                
-                # Check signals
-                signals_df = df_recent[(df_recent['buy_signal'] == 1) | (df_recent['sell_signal'] == 1)]
-                if not signals_df.empty:
-                    for idx, row in signals_df.iterrows():
-                        screener_results.append({
-                            'Ticker': ticker,
-                            'Date': idx,
-                            'Buy_Signal': row['buy_signal'],
-                            'Sell_Signal': row['sell_signal']
-                        })
+    # 4I. Compute signals for every ticker at once
+    for tf, bars in data.items():
+        # Round OHLC
+        bars.round_prices(2)
+
+        # LinReg(25) & LinReg(50)
+        close = bars.panel('Close')
+        reg1 = bars.set('reg1', panel.linreg(close, 25))
+        reg2 = bars.set('reg2', panel.linreg(close, 50))
+
+        # Buy signals: reg1 crosses above reg2
+        bars.set_flag('buy_signal', panel.crossover(reg1, reg2))
+        # Sell signals: reg1 crosses below reg2
+        bars.set_flag('sell_signal', panel.crossunder(reg1, reg2))
+
+        # Save the 2-hour bars to the bar store
+        for ticker in bars.tickers:
+            store.write(ticker, '2h', bars.frame(ticker))
+
+        # Signals in the last 'recent_period' hours of each ticker
+        screener_results.append(bars.signals(
+            {'Buy_Signal': 'buy_signal', 'Sell_Signal': 'sell_signal'}, pd.Timedelta(hours=recent_period)))
 
     # 4J. Convert results to DataFrame and CSV
-    screener_df = pd.DataFrame(screener_results)
+    screener_df = pd.concat(screener_results, ignore_index=True) if screener_results else pd.DataFrame()
     screener_df.to_csv('Regression_cross_screener_results_2h.csv', index=False)
 
     # 4K. Print sample
@@ -223,17 +112,20 @@ def main():
         print("No buy/sell signals found in the last 2 hours.")
 
     ############################
-    # 5. Send to Telegram every 2 hours
+    # 5. Send new signals to Telegram
     ############################
-    if not screener_df.empty and can_send_telegram_message():
+    # Signals already alerted on by an earlier run are dropped (signalstore.py);
+    # recorded under this script's own key, apart from nrcross2h.py/two.py
+    from signalstore import only_new, recorder
+    screener_df = only_new(screener_df, '2h', 'rcross2h')
+    if not screener_df.empty:
         message = (
-            "Regression Cross Screener (sent every 2 hrs)\n"
+            "Regression Cross Screener\n"
             "Buy = linreg(25) crosses above linreg(50)\n"
             "Sell = linreg(25) crosses below linreg(50)\n\n"
             + screener_df.to_string(index=False)
         )
-        send_telegram_message(message)
-        update_telegram_send_time()
+        send_telegram_message(message, on_delivered=recorder(screener_df, '2h', 'rcross2h'))
 
 
 ############################
@@ -1,29 +1,19 @@
 import pandas as pd
-import yfinance as yf
 from datetime import datetime, timedelta
 import pandas_ta as ta
-import requests
-from bs4 import BeautifulSoup
+from barstore import BarStore
+from universe import get_sp500_tickers
+from fetcher import download_many
+from planner import plan_downloads, derive_frame
 # Function to fetch S&P 500 tickers from Wikipedia
 # Define the timeframes  Valid intervals: [1m, 2m, 5m, 15m, 30m, 60m, 90m, 1h, 1d, 5d, 1wk, 1mo, 3mo]
 
-def get_sp500_tickers():
-    url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    table = soup.find('table', {'id': 'constituents'})
-    tickers = [row.find('td').text.strip() for row in table.find_all('tr')[1:]]
-    return tickers
-
 # Get the S&P 500 tickers
 sp500_tickers = get_sp500_tickers()
 
-# Save the tickers to a CSV file
+# Save the tickers to a CSV file (indicator.py reads it)
 pd.DataFrame(sp500_tickers, columns=["Ticker"]).to_csv('sp500_tickers.csv', index=False)
-
-# Read the tickers from the CSV file
-tickers_df = pd.read_csv('sp500_tickers.csv')
-tickers = tickers_df['Ticker'].tolist()
+tickers = sp500_tickers
 
 # Define the timeframes and their corresponding date ranges
 timeframes = {
@@ -33,22 +23,26 @@ timeframes = {
     '1wk': timedelta(days=3*365)
 }
 
-# Function to download data for a given ticker and timeframe
-def download_data(ticker, timeframe, start_date, end_date):
-    return yf.download(ticker, start=start_date, end=end_date, interval=timeframe)
-
 # Dictionary to store data for each timeframe
 data = {tf: {} for tf in timeframes}
 
-# Download data for each ticker and timeframe
+# One download per interval covers every timeframe built from it
+# (1wk is resampled from the 1d bars instead of downloaded again)
+downloads = plan_downloads(timeframes.items())
+
+# Download each interval for all tickers concurrently
 end_date = datetime.now()
-for ticker in tickers:
-    for tf, delta in timeframes.items():
-        start_date = end_date - delta
-        try:
-            data[tf][ticker] = download_data(ticker, tf, start_date, end_date)
-        except Exception as e:
-            print(f"Failed to download data for {ticker} with timeframe {tf}: {e}")
+for interval, item in downloads.items():
+    start_date = end_date - item['lookback']
+    for ticker, df in download_many(tickers, interval, start_date, end_date).items():
+        if df.empty:
+            print(f"No data available for {ticker} on interval {interval}. Skipping.")
+            continue
+        # yf.download returns (Price, Ticker) columns even for one ticker
+        if isinstance(df.columns, pd.MultiIndex):
+            df.columns = df.columns.get_level_values(0)
+        for tf, lookback in item['timeframes'].items():
+            data[tf][ticker] = derive_frame(df, tf, lookback)
 
 # Applying technical indicators using pandas_ta
 for tf in timeframes:
@@ -59,10 +53,11 @@ for tf in timeframes:
         # Add more indicators as needed
         data[tf][ticker] = df
 
-# Save data to CSV files for each timeframe
+# Save data to the bar store, one file per timeframe and ticker
+store = BarStore()
 for tf in timeframes:
-    combined_data = pd.concat(data[tf], keys=data[tf].keys(), names=['Ticker', 'Date'])
-    combined_data.to_csv(f'sp500_ohlc_data_{tf}.csv')
+    for ticker, df in data[tf].items():
+        store.write(ticker, tf, df)
 
 # Display a sample of the data
 for tf in timeframes:
@@ -0,0 +1,39 @@
+import metrics
+
+############################
+# Shared HTTP Session
+############################
+# The cached, rate-limited session every bulk download goes through. It is
+# built on first use rather than at import time: opening the SQLite cache and
+# importing requests_cache is wasted work for a run that
+# exits because the market is closed.
+#
+# Responses are cached in yfinance.cache by httpcache.BoundedSQLiteCache:
+# compressed, expired by bar interval and kept under SCANNER_CACHE_MB.
+
+_session = None
+
+
+def get_session():
+    """
+    Returns the process-wide CachedLimiterSession, creating it on first call.
+    """
+    global _session
+    if _session is None:
+        from requests import Session
+        from requests_cache import CacheMixin
+        from httpcache import BoundedSQLiteCache, expire_after
+        from ratelimit import SharedLimiterMixin
+
+        # Cache hits never reach the limiter; misses draw from the rate shared
+        # by every screener process on the host (ratelimit.py)
+        class CachedLimiterSession(CacheMixin, SharedLimiterMixin, Session):
+            def request(self, method, url, *args, **kwargs):
+                # Intraday responses go stale within minutes, daily ones in hours
+                kwargs.setdefault('expire_after', expire_after(url, kwargs.get('params')))
+                return super().request(method, url, *args, **kwargs)
+
+        _session = CachedLimiterSession(backend=BoundedSQLiteCache("yfinance.cache"))
+        # Requests, cache hits and bytes per stage of the open run
+        metrics.watch_session(_session)
+    return _session
@@ -0,0 +1,145 @@
+import os
+import sqlite3
+import time
+from datetime import timedelta
+
+import pandas as pd
+
+############################
+# Signal Dedup Store
+############################
+# The screeners look back over a window (the last 1-2 hours or day) that
+# overlaps the previous run, so the same crossover used to be sent again on
+# every run. Every signal that is alerted on is recorded here, keyed by
+# (ticker, timeframe, strategy, bar timestamp); each run checks its
+# candidates against the store in one query and alerts only on the new ones.
+#
+# A signal is recorded only once Telegram has accepted the message carrying
+# it (outbox.py calls `recorder(...)` back after delivery), so an alert the
+# outbox gave up on is sent again by the next run rather than lost.
+#
+# The store is a small SQLite file (stockdata/signals.sqlite). Rows older
+# than the retention period are pruned whenever it is opened, well past any
+# screener's look-back window, so it never grows beyond a few weeks of
+# signals. SCANNER_DEDUP=0 turns the filtering off.
+
+DB_PATH = os.path.join('stockdata', 'signals.sqlite')
+RETENTION = timedelta(days=30)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signals (
+    ticker     TEXT    NOT NULL,
+    timeframe  TEXT    NOT NULL,
+    strategy   TEXT    NOT NULL,
+    bar_time   INTEGER NOT NULL,   -- bar timestamp, epoch seconds UTC
+    emitted_at INTEGER NOT NULL,   -- when it was first alerted on
+    PRIMARY KEY (ticker, timeframe, strategy, bar_time)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS signals_bar_time ON signals (bar_time);
+"""
+
+
+def _epoch_seconds(dates):
+    """
+    Bar timestamps as UTC epoch seconds; naive (daily) dates are taken as UTC.
+    """
+    dates = pd.DatetimeIndex(pd.to_datetime(pd.Series(dates), utc=True))
+    return (dates - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+
+
+class SignalStore:
+    """
+    Records alerted signals and filters out the ones already alerted on.
+    """
+
+    def __init__(self, path=DB_PATH, retention=RETENTION):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self.prune(retention)
+
+    def prune(self, retention=RETENTION):
+        """
+        Deletes signals whose bar is older than `retention`.
+        """
+        cutoff = int(time.time() - retention.total_seconds())
+        with self.conn:
+            self.conn.execute('DELETE FROM signals WHERE bar_time < ?', (cutoff,))
+
+    def _keys(self, results, timeframe, strategy):
+        tickers = results['Ticker'].astype(str).to_numpy()
+        bar_times = _epoch_seconds(results['Date']).to_numpy(dtype='int64')
+        return [(t, timeframe, strategy, int(b)) for t, b in zip(tickers, bar_times)]
+
+    def unseen(self, results, timeframe, strategy):
+        """
+        Returns the rows of `results` (with 'Ticker' and 'Date' columns) not
+        yet recorded for (`timeframe`, `strategy`).
+        """
+        if results is None or results.empty:
+            return results
+        rows = self._keys(results, timeframe, strategy)
+        with self.conn:
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS candidates '
+                              '(ticker TEXT, timeframe TEXT, strategy TEXT, bar_time INTEGER)')
+            self.conn.execute('DELETE FROM candidates')
+            self.conn.executemany('INSERT INTO candidates VALUES (?, ?, ?, ?)', rows)
+            seen = set(self.conn.execute(
+                'SELECT c.ticker, c.bar_time FROM candidates c JOIN signals s '
+                'ON s.ticker = c.ticker AND s.timeframe = c.timeframe '
+                'AND s.strategy = c.strategy AND s.bar_time = c.bar_time'))
+        is_new = [(t, b) not in seen for t, _, _, b in rows]
+        return results[is_new]
+
+    def record(self, results, timeframe, strategy):
+        """
+        Records the rows of `results` as alerted on.
+        """
+        if results is None or results.empty:
+            return
+        now = int(time.time())
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO signals VALUES (?, ?, ?, ?, ?)',
+                [row + (now,) for row in self._keys(results, timeframe, strategy)])
+
+    def close(self):
+        self.conn.close()
+
+
+def only_new(results, timeframe, strategy, path=DB_PATH):
+    """
+    `SignalStore.unseen` on the default store: the signals in `results` not
+    alerted on by an earlier run. SCANNER_DEDUP=0 returns `results` as is.
+    """
+    if os.getenv('SCANNER_DEDUP') == '0' or results is None or results.empty:
+        return results
+    store = SignalStore(path)
+    try:
+        return store.unseen(results, timeframe, strategy)
+    finally:
+        store.close()
+
+
+def mark_alerted(results, timeframe, strategy, path=DB_PATH):
+    """
+    `SignalStore.record` on the default store. Nothing with SCANNER_DEDUP=0.
+    """
+    if os.getenv('SCANNER_DEDUP') == '0' or results is None or results.empty:
+        return
+    store = SignalStore(path)
+    try:
+        store.record(results, timeframe, strategy)
+    finally:
+        store.close()
+
+
+def recorder(results, timeframe, strategy):
+    """
+    A callback marking `results` as alerted on, for the outbox's
+    `on_delivered`.
+    """
+    return lambda: mark_alerted(results, timeframe, strategy)
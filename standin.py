@@ -0,0 +1,438 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+############################
+# Local Service Stand-ins
+############################
+# In-process HTTP stand-ins for the three services the scanner talks to, so
+# the downloader, the universe scraper and the alerting can be load-tested
+# offline and deterministically:
+#
+#     Yahoo      /v8/finance/chart/{symbol} (plus the cookie/crumb handshake)
+#     Wikipedia  /wiki/{page} with an index constituents table
+#     Telegram   /bot{token}/sendMessage, recording what was sent
+#
+# `StandIn.session()` returns a requests Session whose https:// traffic to
+# those hosts is routed to the local server; pass it wherever a session is
+# accepted (yf.Tickers, yf.download, fetcher.download_many,
+# universe.get_tickers, outbox.Outbox). Give download_many `limiter=None`
+# too, so stand-in traffic stays out of the host's shared Yahoo rate
+# limiter (ratelimit.py).
+#
+# Responses come from fixtures (FIXTURES_DIR/{service}/...) when present and
+# are generated otherwise: deterministic random-walk bars per symbol and a
+# table of synthetic tickers. In record mode, requests are forwarded to the
+# real service once and the responses saved as fixtures.
+#
+# Each service can be given latency, a request-rate limit answered with 429,
+# and a share of 5xx failures:
+#
+#     python standin.py bench --tickers 100 --latency 0.05 --rate 50 --errors 0.02
+#     python standin.py record --tickers AAPL MSFT --interval 60m
+
+FIXTURES_DIR = 'fixtures'
+
+HOSTS = {
+    'fc.yahoo.com': 'yahoo',
+    'query1.finance.yahoo.com': 'yahoo',
+    'query2.finance.yahoo.com': 'yahoo',
+    'guce.yahoo.com': 'yahoo',
+    'consent.yahoo.com': 'yahoo',
+    'en.wikipedia.org': 'wikipedia',
+    'api.telegram.org': 'telegram',
+}
+
+EASTERN = 'America/New_York'
+ORIGIN = int(pd.Timestamp('2024-01-01', tz='UTC').timestamp())   # first synthetic bar
+
+
+class Faults:
+    """
+    Latency, rate limit and failure settings for one service.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, rate=None, errors=0.0, seed=0):
+        self.latency = latency      # seconds added to every response
+        self.jitter = jitter        # +/- seconds of random extra latency
+        self.rate = rate            # requests per second before answering 429
+        self.errors = errors        # share of requests answered with a 5xx
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = rate or 0.0
+        self.updated = time.monotonic()
+
+    def delay(self):
+        with self.lock:
+            return max(self.latency + self.random.uniform(-self.jitter, self.jitter), 0.0)
+
+    def limited(self):
+        """
+        True if this request is over the rate (token bucket of one second).
+        """
+        if not self.rate:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return False
+            return True
+
+    def failed(self):
+        with self.lock:
+            return self.random.random() < self.errors
+
+
+############################
+# Synthetic Responses
+############################
+def _bar_times(interval, start, end):
+    """
+    Epoch seconds of the regular-session bars of `interval` in [start, end).
+    """
+    day = lambda t: pd.Timestamp(t, unit='s', tz='UTC').tz_convert(EASTERN).tz_localize(None).normalize()
+    days = pd.bdate_range(day(start), day(end)).tz_localize(EASTERN)
+    opens = (days - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1) + (9 * 60 + 30) * 60
+    if interval in ('60m', '1h'):
+        offsets = np.arange(0, 390 * 60, 3600)
+    elif interval.endswith('m'):
+        offsets = np.arange(0, 390 * 60, int(interval[:-1]) * 60)
+    else:
+        offsets = np.array([0])
+    times = (np.asarray(opens)[:, None] + offsets[None, :]).ravel()
+    return times[(times >= start) & (times < end)].tolist()
+
+
+def _span(params):
+    """
+    (period1, period2) in epoch seconds from chart query parameters.
+    """
+    now = int(time.time())
+    if 'period1' in params:
+        return int(params['period1']), int(params.get('period2', now))
+    value = params.get('range', '1mo')
+    units = {'d': 86400, 'mo': 30 * 86400, 'y': 365 * 86400, 'wk': 7 * 86400}
+    for suffix, seconds in units.items():
+        if value.endswith(suffix) and value[:-len(suffix)].isdigit():
+            return now - int(value[:-len(suffix)]) * seconds, now
+    return now - 730 * 86400, now
+
+
+def chart_json(symbol, interval, start, end):
+    """
+    A Yahoo v8 chart response with a deterministic random walk for `symbol`.
+    """
+    # The walk starts at a fixed date, so a symbol's bars are the same
+    # whatever window is asked for
+    everything = _bar_times(interval, ORIGIN, end)
+    first = next((i for i, t in enumerate(everything) if t >= start), len(everything))
+    rng = np.random.default_rng(zlib.crc32(f'{symbol}/{interval}'.encode()))
+    base = 50 + rng.random() * 200
+    closes = np.round(base * np.exp(np.cumsum(rng.normal(0, 0.01, len(everything)))), 2)
+    times, close = everything[first:], closes[first:]
+    n = len(times)
+    steps = np.random.default_rng([zlib.crc32(symbol.encode()), first])
+    spread = np.abs(steps.normal(0, 0.004, n))
+    quote = {
+        'open': np.round(close * (1 + steps.normal(0, 0.002, n)), 2).tolist(),
+        'high': np.round(close * (1 + spread), 2).tolist(),
+        'low': np.round(close * (1 - spread), 2).tolist(),
+        'close': close.tolist(),
+        'volume': steps.integers(1000, 100000, n).tolist(),
+    }
+    days = sorted({t - (t - 13 * 3600 - 30 * 60) % 86400 for t in times})
+    meta = {
+        'currency': 'USD', 'symbol': symbol, 'instrumentType': 'EQUITY',
+        'exchangeName': 'NMS', 'exchangeTimezoneName': EASTERN, 'timezone': 'EDT',
+        'gmtoffset': -14400, 'priceHint': 2, 'dataGranularity': interval,
+        'regularMarketPrice': quote['close'][-1] if n else None,
+        'validRanges': ['1d', '5d', '1mo', '3mo', '6mo', '1y', '2y', '5y', '10y', 'ytd', 'max'],
+        'tradingPeriods': [[{'timezone': 'EDT', 'gmtoffset': -14400,
+                             'start': d, 'end': d + 390 * 60}] for d in days],
+    }
+    return {'chart': {'result': [{
+        'meta': meta,
+        'timestamp': times,
+        'indicators': {'quote': [quote], 'adjclose': [{'adjclose': quote['close']}]},
+    }], 'error': None}}
+
+
+def constituents_html(tickers):
+    rows = ''.join(f'<tr><td>{t}</td><td>{t} Inc.</td></tr>' for t in tickers)
+    return ('<html><body><table id="constituents" class="wikitable sortable">'
+            f'<tr><th>Symbol</th><th>Security</th></tr>{rows}</table></body></html>')
+
+
+def synthetic_tickers(n):
+    return [f'SYN{i:04d}' for i in range(n)]
+
+
+############################
+# Server
+############################
+class StandIn:
+    """
+    The stand-in server. Use as a context manager; `session()` gives a
+    requests Session routed to it.
+    """
+
+    def __init__(self, faults=None, fixtures_dir=FIXTURES_DIR, record=False, universe_size=500):
+        self.faults = {'yahoo': Faults(), 'wikipedia': Faults(), 'telegram': Faults()}
+        self.faults.update(faults or {})
+        self.fixtures_dir = fixtures_dir
+        self.record = record
+        self.universe = synthetic_tickers(universe_size)
+        self.sent = []          # Telegram messages: (chat_id, text)
+        self.requests = {'yahoo': 0, 'wikipedia': 0, 'telegram': 0}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
+
+    def session(self):
+        """
+        A requests Session whose traffic to the known hosts goes here.
+        """
+        session = requests.Session()
+        session.mount('https://', _LocalAdapter(self.port))
+        return session
+
+    def _fixture_path(self, service, name):
+        return os.path.join(self.fixtures_dir, service, name)
+
+    def _respond(self, service, host, path, params, body):
+        """
+        Returns (status, headers, body bytes) for one request.
+        """
+        if service == 'yahoo':
+            if host == 'fc.yahoo.com' or 'consent' in host:
+                return 200, {'Set-Cookie': 'A3=d=standin; Domain=.yahoo.com; Path=/'}, b''
+            if path.startswith('/v1/test/getcrumb'):
+                return 200, {'Content-Type': 'text/plain'}, b'standin-crumb'
+            if path.startswith('/v8/finance/chart/'):
+                symbol = path.rsplit('/', 1)[-1]
+                interval = params.get('interval', '1d')
+                fixture = self._fixture_path('yahoo', f'{symbol}_{interval}.json')
+                if os.path.exists(fixture):
+                    with open(fixture, 'rb') as f:
+                        return 200, {'Content-Type': 'application/json'}, f.read()
+                data = chart_json(symbol, interval, *_span(params))
+                return 200, {'Content-Type': 'application/json'}, json.dumps(data).encode()
+        elif service == 'wikipedia':
+            page = path.rsplit('/', 1)[-1]
+            fixture = self._fixture_path('wikipedia', f'{page}.html')
+            if os.path.exists(fixture):
+                with open(fixture, 'rb') as f:
+                    return 200, {'Content-Type': 'text/html'}, f.read()
+            return 200, {'Content-Type': 'text/html', 'ETag': '"standin"'}, \
+                constituents_html(self.universe).encode()
+        elif service == 'telegram' and path.endswith('/sendMessage'):
+            form = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+            with self.lock:
+                self.sent.append((form.get('chat_id'), form.get('text', '')))
+            return 200, {'Content-Type': 'application/json'}, b'{"ok":true,"result":{}}'
+        return 404, {}, b'not found'
+
+    def _record(self, service, host, path, query, method, body, headers):
+        """
+        Forwards to the real service and stores the response as a fixture.
+        """
+        url = f'https://{host}{path}' + (f'?{query}' if query else '')
+        response = requests.request(method, url, data=body or None, timeout=30,
+                                    headers={'User-Agent': headers.get('User-Agent', 'Mozilla/5.0')})
+        name = None
+        if service == 'yahoo' and path.startswith('/v8/finance/chart/'):
+            params = {k: v[0] for k, v in parse_qs(query).items()}
+            name = f"{path.rsplit('/', 1)[-1]}_{params.get('interval', '1d')}.json"
+        elif service == 'wikipedia':
+            name = f"{path.rsplit('/', 1)[-1]}.html"
+        if name is not None and response.status_code == 200:
+            path = self._fixture_path(service, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(response.content)
+        return response.status_code, {'Content-Type': response.headers.get('Content-Type', '')}, \
+            response.content
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _serve(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+                # The adapter sends /{original host}/{original path}
+                _, host, rest = self.path.split('/', 2)
+                parts = urlsplit('/' + rest)
+                service = HOSTS.get(host, 'unknown')
+                faults = standin.faults.get(service)
+                with standin.lock:
+                    standin.requests[service] = standin.requests.get(service, 0) + 1
+                if faults is not None:
+                    time.sleep(faults.delay())
+                if faults is not None and faults.limited():
+                    status, headers = 429, {'Retry-After': '1', 'Content-Type': 'application/json'}
+                    payload = b'{"ok":false,"error_code":429,"parameters":{"retry_after":1}}' \
+                        if service == 'telegram' else b'Too Many Requests'
+                elif faults is not None and faults.failed():
+                    status, headers, payload = 502, {}, b'Bad Gateway'
+                elif standin.record:
+                    status, headers, payload = standin._record(
+                        service, host, parts.path, parts.query, method, body, self.headers)
+                else:
+                    params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                    status, headers, payload = standin._respond(service, host, parts.path, params, body)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._serve('GET')
+
+            def do_POST(self):
+                self._serve('POST')
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class _LocalAdapter(HTTPAdapter):
+    """
+    Rewrites https://{host}/{path} to http://127.0.0.1:{port}/{host}/{path}.
+    """
+
+    def __init__(self, port, **kwargs):
+        self.port = port
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        request.url = f'http://127.0.0.1:{self.port}/{parts.hostname}{parts.path}' + \
+            (f'?{parts.query}' if parts.query else '')
+        return super().send(request, **kwargs)
+
+
+############################
+# Load Tests
+############################
+def _timed(label, func):
+    start = time.perf_counter()
+    try:
+        result = func()
+        status = ''
+    except Exception as e:
+        result, status = None, f'  ({e!r})'
+    print(f"{label:<34} {time.perf_counter() - start:8.2f}s{status}")
+    return result
+
+
+def bench(n_tickers=100, interval='60m', days=30, faults=None, messages=20):
+    """
+    Times the bulk yf.Tickers path, the serial yf.download path, the
+    concurrent fetcher, the universe scrape and the Telegram fan-out against
+    the stand-ins.
+    """
+    import yfinance as yf
+    import fetcher
+    import universe
+    import outbox
+    from datetime import datetime, timedelta
+
+    with StandIn(faults=faults, universe_size=n_tickers) as standin:
+        session = standin.session()
+        tickers = _timed('universe scrape', lambda: universe.parse_tickers(
+            session.get(universe.UNIVERSES['sp500']['url'], timeout=10).content,
+            universe.UNIVERSES['sp500']['table']))
+        tickers = tickers or standin.universe
+        end = datetime.now()
+        start = end - timedelta(days=days)
+
+        # Tickers.history does not hand its session on to yf.download
+        _timed(f'bulk yf.Tickers ({len(tickers)})', lambda: yf.Tickers(
+            ' '.join(tickers), session=session).history(period=f'{days}d', interval=interval,
+                                                        session=session, progress=False))
+        _timed(f'serial yf.download ({len(tickers)})', lambda: [
+            yf.download(t, start=start, end=end, interval=interval, session=session,
+                        progress=False, auto_adjust=True) for t in tickers])
+        _timed(f'fetcher.download_many ({len(tickers)})', lambda: fetcher.download_many(
+            tickers, interval, start, end, rate=1000, burst=50, session=session, limiter=None))
+
+        os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'standin')
+        os.environ.setdefault('TELEGRAM_CHAT_ID', '1')
+        os.environ.setdefault('CROSS_TELEGRAM_BOT_TOKEN', 'standin-cross')
+        os.environ.setdefault('CROSS_TELEGRAM_CHAT_ID', '2')
+        box = outbox.Outbox(session=session, interval=0.0)
+
+        def fan_out():
+            for i in range(messages):
+                box.send(f'alert {i}', 'default')
+                box.send(f'alert {i}', 'cross')
+            box.flush()
+        _timed(f'telegram fan-out ({2 * messages})', fan_out)
+        print(f"requests served: {standin.requests}, telegram messages: {len(standin.sent)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Yahoo/Wikipedia/Telegram stand-ins")
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('bench', help="load-test the scanner's HTTP paths offline")
+    run.add_argument('--tickers', type=int, default=100)
+    run.add_argument('--interval', default='60m')
+    run.add_argument('--days', type=int, default=30)
+    run.add_argument('--latency', type=float, default=0.0)
+    run.add_argument('--jitter', type=float, default=0.0)
+    run.add_argument('--rate', type=float, help="requests/second before 429s")
+    run.add_argument('--errors', type=float, default=0.0, help="share of 5xx answers")
+    record = sub.add_parser('record', help="save real responses as fixtures")
+    record.add_argument('--tickers', nargs='+', required=True)
+    record.add_argument('--interval', default='60m')
+    record.add_argument('--days', type=int, default=30)
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        yahoo = Faults(args.latency, args.jitter, args.rate, args.errors)
+        bench(args.tickers, args.interval, args.days, faults={'yahoo': yahoo})
+    else:
+        import yfinance as yf
+        import universe
+        with StandIn(record=True) as standin:
+            session = standin.session()
+            for name in universe.UNIVERSES:
+                session.get(universe.UNIVERSES[name]['url'], timeout=30)
+            for ticker in args.tickers:
+                yf.Ticker(ticker, session=session).history(period=f'{args.days}d', interval=args.interval)
+        print(f"Fixtures written to {FIXTURES_DIR}/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+import time
+
+############################
+# Startup / Import-time Report
+############################
+# Runs each entry script the way cron or the Procfile would, with the market
+# forced closed (SCANNER_MARKET_OPEN=0), under `python -X importtime`. Prints
+# the wall time of the whole invocation, how many modules were imported, and
+# the slowest top-level imports, so heavy imports creeping back in front of
+# the market check show up at once.
+#
+#     python startup_report.py                 # default scripts
+#     python startup_report.py two.py main.py  # selected scripts
+
+SCRIPTS = ['main.py', 'two.py', 'nrcross2h.py', 'sellcross.py', 'rcross1h.py', 'rcross1d.py',
+           'rcross2h.py', 'twotest.py', 'engine.py']
+TOP = 5
+
+
+def parse_importtime(stderr):
+    """
+    Returns [(module, cumulative microseconds)] for the top-level imports in
+    `-X importtime` output, plus the total number of modules imported.
+    """
+    top_level = []
+    count = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        count += 1
+        # Nested imports are indented under the module that pulled them in
+        if not name.startswith('  '):
+            top_level.append((name.strip(), int(cumulative_us)))
+    return top_level, count
+
+
+def measure(script):
+    env = dict(os.environ, SCANNER_MARKET_OPEN='0')
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', script],
+                            env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    top_level, count = parse_importtime(result.stderr)
+    return elapsed, count, sorted(top_level, key=lambda item: -item[1])[:TOP], result.returncode
+
+
+def main(scripts):
+    print(f"Closed-market startup, {sys.executable}")
+    for script in scripts:
+        elapsed, count, slowest, returncode = measure(script)
+        status = '' if returncode == 0 else f'  (exit code {returncode})'
+        print(f"\n{script}: {elapsed * 1000:.0f} ms, {count} modules imported{status}")
+        for name, cumulative_us in slowest:
+            print(f"    {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or SCRIPTS)
@@ -0,0 +1,309 @@
+import json
+import math
+import os
+from collections import deque
+
+import pandas as pd
+
+############################
+# Incremental Indicator State
+############################
+# Keeps linreg(25)/linreg(50) on Close and the 25-bar R² (smoothed over 3
+# bars) on hl2 as running sums per ticker, persisted between scheduled runs.
+# Each new bar updates the sums in O(1) instead of replaying 30 days of
+# history. The newest bar of a run may still be forming, so it is evaluated
+# on a throw-away copy and only committed on the next run, once it is final.
+#
+# Running sums pick up rounding error as values are added and removed, so
+# every `check_every` commits the sums are rebuilt from the stored window and
+# compared; any drift beyond `DRIFT_TOLERANCE` is reported and corrected.
+
+STATE_VERSION = 1
+DRIFT_TOLERANCE = 1e-9
+
+
+class RollingWindow:
+    """
+    Σy, Σk·y and Σy² over the last `length` values, with k = 0..length-1
+    inside the window. Values are stored relative to `ref` (the first value
+    seen) so the sums stay small.
+    """
+
+    def __init__(self, length, ref=None, values=None):
+        self.length = length
+        self.ref = ref
+        self.values = deque(values or [], maxlen=length)
+        self.sum_y = self.sum_ky = self.sum_yy = 0.0
+        self.recompute()
+
+    def recompute(self):
+        """
+        Rebuilds the sums from the stored window. Returns the largest
+        difference to the running sums it replaces, relative to Σy².
+        """
+        values = list(self.values)
+        old = (self.sum_y, self.sum_ky, self.sum_yy)
+        self.sum_y = sum(values)
+        self.sum_ky = sum(k * y for k, y in enumerate(values))
+        self.sum_yy = sum(y * y for y in values)
+        new = (self.sum_y, self.sum_ky, self.sum_yy)
+        scale = max(abs(self.sum_yy), 1.0)
+        return max(abs(a - b) for a, b in zip(old, new)) / scale
+
+    def push(self, value):
+        if self.ref is None:
+            self.ref = value
+        y = value - self.ref
+        if len(self.values) == self.length:
+            dropped = self.values[0]
+            # Every remaining value moves one slot left: Σk·y loses Σy - dropped
+            self.sum_ky -= self.sum_y - dropped
+            self.sum_y -= dropped
+            self.sum_yy -= dropped * dropped
+            k = self.length - 1
+        else:
+            k = len(self.values)
+        self.sum_ky += k * y
+        self.sum_y += y
+        self.sum_yy += y * y
+        self.values.append(y)
+
+    def _moments(self):
+        n = self.length
+        sxy = self.sum_ky - (n - 1) / 2.0 * self.sum_y
+        syy = self.sum_yy - self.sum_y * self.sum_y / n
+        sxx = n * (n * n - 1) / 12.0
+        return sxy, syy, sxx
+
+    def linreg(self):
+        """
+        Regression value at the newest bar (same as `ta.linreg`), or NaN
+        during warmup.
+        """
+        if len(self.values) < self.length:
+            return math.nan
+        sxy, _, sxx = self._moments()
+        mean_y = self.sum_y / self.length + self.ref
+        return mean_y + (sxy / sxx) * (self.length - 1) / 2.0
+
+    def r2(self):
+        """
+        R² against the bar index, or NaN during warmup or on a flat window.
+        """
+        if len(self.values) < self.length:
+            return math.nan
+        sxy, syy, sxx = self._moments()
+        if syy <= 1e-12 * max(self.sum_yy, 1.0):
+            return math.nan
+        return min(sxy * sxy / (sxx * syy), 1.0)
+
+    def copy(self):
+        return RollingWindow(self.length, self.ref, list(self.values))
+
+    def to_dict(self):
+        return {'length': self.length, 'ref': self.ref, 'values': list(self.values)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['length'], data['ref'], data['values'])
+
+
+class TickerState:
+    """
+    Indicator state for one ticker: the rolling windows plus the last values
+    needed to detect crossovers on the next bar.
+    """
+
+    def __init__(self, fast=25, slow=50, r2_length=25, avg_len=3):
+        self.fast = RollingWindow(fast)
+        self.slow = RollingWindow(slow)
+        self.r2 = RollingWindow(r2_length)
+        self.r2_recent = deque(maxlen=avg_len)
+        self.last = {'reg1': math.nan, 'reg2': math.nan, 'r2_smoothed': math.nan}
+        self.last_ts = None
+        self.commits = 0
+
+    def step(self, close, hl2):
+        """
+        Adds one bar and returns its indicator values and signal flags.
+        """
+        self.fast.push(close)
+        self.slow.push(close)
+        self.r2.push(hl2)
+        reg1 = self.fast.linreg()
+        reg2 = self.slow.linreg()
+        r2 = self.r2.r2()
+        self.r2_recent.append(r2)
+        if len(self.r2_recent) == self.r2_recent.maxlen:
+            r2_smoothed = sum(self.r2_recent) / len(self.r2_recent)
+        else:
+            r2_smoothed = math.nan
+
+        prev = self.last
+        row = {
+            'reg1': reg1,
+            'reg2': reg2,
+            'r2': r2,
+            'r2_smoothed': r2_smoothed,
+            # NaN compares False, so warmup bars never signal
+            'buy_signal': int(reg1 > reg2 and prev['reg1'] <= prev['reg2']),
+            'sell_signal': int(reg1 < reg2 and prev['reg1'] >= prev['reg2']),
+            'cross_signal': int(prev['r2_smoothed'] > 0.9 and r2_smoothed <= 0.9),
+        }
+        self.last = {'reg1': reg1, 'reg2': reg2, 'r2_smoothed': r2_smoothed}
+        return row
+
+    def copy(self):
+        clone = TickerState.__new__(TickerState)
+        clone.fast = self.fast.copy()
+        clone.slow = self.slow.copy()
+        clone.r2 = self.r2.copy()
+        clone.r2_recent = deque(self.r2_recent, maxlen=self.r2_recent.maxlen)
+        clone.last = dict(self.last)
+        clone.last_ts = self.last_ts
+        clone.commits = self.commits
+        return clone
+
+    def check_drift(self):
+        """
+        Rebuilds every running sum from its window; returns the worst drift.
+        """
+        return max(window.recompute() for window in (self.fast, self.slow, self.r2))
+
+    def to_dict(self):
+        return {
+            'fast': self.fast.to_dict(),
+            'slow': self.slow.to_dict(),
+            'r2': self.r2.to_dict(),
+            'r2_recent': list(self.r2_recent),
+            'avg_len': self.r2_recent.maxlen,
+            'last': self.last,
+            'last_ts': self.last_ts,
+            'commits': self.commits,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls.__new__(cls)
+        state.fast = RollingWindow.from_dict(data['fast'])
+        state.slow = RollingWindow.from_dict(data['slow'])
+        state.r2 = RollingWindow.from_dict(data['r2'])
+        state.r2_recent = deque(data['r2_recent'], maxlen=data['avg_len'])
+        state.last = data['last']
+        state.last_ts = data['last_ts']
+        state.commits = data['commits']
+        return state
+
+
+class IndicatorState:
+    """
+    Per-ticker indicator state for one timeframe, loaded from and saved to a
+    JSON file between runs.
+    """
+
+    def __init__(self, path, fast=25, slow=50, r2_length=25, avg_len=3, check_every=50):
+        self.path = path
+        self.params = {'fast': fast, 'slow': slow, 'r2_length': r2_length, 'avg_len': avg_len}
+        self.check_every = check_every
+        self.tickers = {}
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """
+        Loads saved state, or returns an empty state if the file is missing,
+        unreadable or was written with different parameters.
+        """
+        state = cls(path, **kwargs)
+        if not os.path.exists(path):
+            return state
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read indicator state {path}, starting fresh: {e}")
+            return state
+        if data.get('version') != STATE_VERSION or data.get('params') != state.params:
+            return state
+        state.tickers = {ticker: TickerState.from_dict(item) for ticker, item in data['tickers'].items()}
+        return state
+
+    def save(self):
+        data = {
+            'version': STATE_VERSION,
+            'params': self.params,
+            'tickers': {ticker: item.to_dict() for ticker, item in self.tickers.items()},
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def _new_bars(self, ticker, index):
+        """
+        Returns the position of the first bar the state has not committed, or
+        None when the state cannot be continued and must be rebuilt.
+        """
+        item = self.tickers.get(ticker)
+        if item is None or item.last_ts is None:
+            return None
+        last_ts = pd.Timestamp(item.last_ts)
+        pos = index.searchsorted(last_ts)
+        # The committed bar must still be in the data, otherwise there is a gap
+        if pos >= len(index) or index[pos] != last_ts:
+            return None
+        return pos + 1
+
+    def update(self, bars):
+        """
+        Advances every ticker with the bars it has not seen yet. `bars` is a
+        dict of (bars x tickers) panels with at least 'High', 'Low' and
+        'Close'. Returns one row per evaluated bar with the indicator values
+        and flags; tickers without usable state are rebuilt from all bars.
+        """
+        close = bars['Close']
+        hl2 = (bars['High'] + bars['Low']) / 2
+        rows = []
+        for ticker in close.columns:
+            series = close[ticker].dropna()
+            if series.empty:
+                continue
+            ticker_hl2 = hl2[ticker].reindex(series.index)
+            start = self._new_bars(ticker, series.index)
+            if start is None:
+                self.tickers[ticker] = TickerState(**self.params)
+                start = 0
+            item = self.tickers[ticker]
+
+            # Commit every finished bar; the newest one is evaluated on a copy.
+            last = len(series) - 1
+            for pos in range(start, last):
+                row = item.step(series.iat[pos], ticker_hl2.iat[pos])
+                item.last_ts = series.index[pos].isoformat()
+                item.commits += 1
+                if item.commits % self.check_every == 0:
+                    drift = item.check_drift()
+                    if drift > DRIFT_TOLERANCE:
+                        print(f"Indicator state drift {drift:.2e} for {ticker}; sums rebuilt.")
+                rows.append(dict(row, Ticker=ticker, Date=series.index[pos]))
+            if start <= last:
+                row = item.copy().step(series.iat[last], ticker_hl2.iat[last])
+                rows.append(dict(row, Ticker=ticker, Date=series.index[last]))
+
+        columns = ['Ticker', 'Date', 'reg1', 'reg2', 'r2', 'r2_smoothed',
+                   'buy_signal', 'sell_signal', 'cross_signal']
+        return pd.DataFrame(rows, columns=columns)
+
+
+def recent_signals(rows, flags, recent):
+    """
+    Picks flagged rows from `IndicatorState.update` within `recent` (a
+    Timedelta) of each ticker's last bar. `flags` maps output column names to
+    row columns, e.g. {'Buy Signal': 'buy_signal'}.
+    """
+    columns = ['Ticker', 'Date'] + list(flags)
+    if rows.empty:
+        return pd.DataFrame(columns=columns)
+    cutoff = rows.groupby('Ticker')['Date'].transform('max') - recent
+    flagged = rows[list(flags.values())].eq(1).any(axis=1)
+    picked = rows[(rows['Date'] >= cutoff) & flagged]
+    return picked.rename(columns={v: k for k, v in flags.items()})[columns].reset_index(drop=True)
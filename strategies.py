@@ -0,0 +1,238 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+import panel
+
+############################
+# Strategy Registry
+############################
+# Each screener signal is a plugin: a Strategy subclass declaring the bars it
+# needs (timeframe, look-back, input fields) and how to turn them into 0/1
+# flag panels. `@register` adds an instance to STRATEGIES; engine.py fetches
+# every dataset the registered strategies need once and evaluates all of
+# them against it.
+#
+# Indicators are requested through `Dataset.compute`, which caches them per
+# dataset, so two strategies asking for linreg(Close, 25) on the same bars
+# share one computation.
+
+STRATEGIES = {}
+
+
+def register(cls):
+    """
+    Class decorator adding one instance of `cls` to the registry.
+    """
+    strategy = cls()
+    if strategy.name in STRATEGIES:
+        raise ValueError(f"Strategy {strategy.name} is already registered")
+    STRATEGIES[strategy.name] = strategy
+    return cls
+
+
+class Dataset:
+    """
+    The (bars x tickers) panels for one timeframe, plus a cache of the
+    indicators computed on them.
+    """
+
+    def __init__(self, timeframe, bars):
+        self.timeframe = timeframe
+        self.bars = bars
+        self._cache = {}
+        self._tails = {}
+
+    def field(self, name):
+        """
+        A price field panel; 'hl2' is derived from High and Low.
+        """
+        if name == 'hl2':
+            if 'hl2' not in self._cache:
+                self._cache['hl2'] = (self.bars['High'] + self.bars['Low']) / 2
+            return self._cache['hl2']
+        return self.bars[name]
+
+    def compute(self, func, source, *args):
+        """
+        Returns `func(field(source), *args)`, computed once per dataset.
+        """
+        key = (func.__name__, source, args)
+        if key not in self._cache:
+            self._cache[key] = func(self.field(source), *args)
+        return self._cache[key]
+
+    def tail(self, recent, warmup):
+        """
+        A Dataset of just the bars needed to evaluate the last `recent` of
+        each ticker with `warmup` bars of look-back (see panel.tail_start).
+        Strategies asking for the same tail share it and its indicators.
+        """
+        key = (recent, warmup)
+        if key not in self._tails:
+            start = panel.tail_start(self.bars['Close'], recent, warmup)
+            bars = {field: values.iloc[start:] for field, values in self.bars.items()}
+            self._tails[key] = Dataset(self.timeframe, bars)
+        return self._tails[key]
+
+
+class Strategy:
+    """
+    Base class for a registered signal. Subclasses set the class attributes
+    and implement `signals`.
+    """
+    name = None
+    timeframe = '1d'                 # bar size, see planner.py
+    lookback = timedelta(days=90)    # history the signals need
+    inputs = ('Close',)              # fields the strategy reads
+    recent = pd.Timedelta(days=1)    # report flags this close to the last bar
+    schedule = None                  # ET run times for daemon.py; None = by timeframe
+    warmup = None                    # bars of look-back before `recent` the signals
+                                     # need; None = the whole history (e.g. RSI)
+    state_flags = None               # output column -> state.IndicatorState flag giving
+                                     # the same signal, for daemon.py; None = panels only
+    results_csv = None
+    title = ''
+    legend = ''
+
+    def signals(self, data):
+        """
+        Returns a dict mapping output columns (e.g. 'Buy Signal') to 0/1 panels.
+        """
+        raise NotImplementedError
+
+    def evaluate(self, data, tail=False):
+        """
+        Flagged bars within `recent` of each ticker's last bar. With `tail`,
+        the indicators are only computed over the last `recent` bars plus
+        `warmup`, which gives the same flags for windowed indicators.
+        """
+        if tail and self.warmup is not None:
+            data = data.tail(self.recent, self.warmup)
+        return panel.recent_signals(self.signals(data), data.bars['Close'], self.recent)
+
+    def message(self, results):
+        """
+        Telegram text for `results`, or None when there is nothing to send.
+        """
+        if results.empty:
+            return None
+        return f"{self.title}:\n{self.legend}\n\n" + results.to_string(index=False)
+
+
+############################
+# Linear Regression Cross
+############################
+class LinregCross(Strategy):
+    """
+    Buy when linreg(25) crosses above linreg(50), sell when it crosses below.
+    """
+    fast = 25
+    slow = 50
+    # linreg(50) on the bar before the window, for the cross
+    warmup = slow
+    state_flags = {'Buy Signal': 'buy_signal', 'Sell Signal': 'sell_signal'}
+    legend = ("Buy = linreg(25) crosses above linreg(50)\n"
+              "Sell = linreg(25) crosses below linreg(50)")
+
+    def signals(self, data):
+        reg1 = data.compute(panel.linreg, 'Close', self.fast)
+        reg2 = data.compute(panel.linreg, 'Close', self.slow)
+        return {
+            'Buy Signal': panel.crossover(reg1, reg2),
+            'Sell Signal': panel.crossunder(reg1, reg2),
+        }
+
+
+@register
+class LinregCross1h(LinregCross):
+    # rcross1h.py
+    name = 'linreg_cross_1h'
+    timeframe = '1h'
+    lookback = timedelta(days=30)
+    recent = pd.Timedelta(hours=1)
+    results_csv = 'Regression_cross_screener_results_1h.csv'
+    title = 'Hourly Screener Results'
+
+
+@register
+class LinregCross2h(LinregCross):
+    # nrcross2h.py and the linreg half of two.py
+    name = 'linreg_cross_2h'
+    timeframe = '2h'
+    lookback = timedelta(days=30)
+    recent = pd.Timedelta(hours=2)
+    results_csv = 'Regression_linreg_screener_results_2h.csv'
+    title = '2hr Screener Results'
+
+
+@register
+class LinregCross1d(LinregCross):
+    # rcross1d.py
+    name = 'linreg_cross_1d'
+    timeframe = '1d'
+    lookback = timedelta(days=90)
+    recent = pd.Timedelta(days=1)
+    results_csv = 'Regression_cross_screener_results_1d.csv'
+    title = 'Daily Screener Results'
+
+
+############################
+# R² Cross-under
+############################
+@register
+class R2Cross2h(Strategy):
+    """
+    r2_smoothed (Length=25, AvgLen=3) on hl2 crossing under 0.9.
+    """
+    # sellcross.py and the R² half of two.py
+    name = 'r2_cross_2h'
+    timeframe = '2h'
+    lookback = timedelta(days=30)
+    inputs = ('High', 'Low', 'Close')
+    recent = pd.Timedelta(hours=2)
+    results_csv = 'Regression_cross_screener_results_2h.csv'
+    title = '2hr Screener Results'
+    legend = "Signal: r2_smoothed (Length=25, AvgLen=3) crossing under 0.9"
+    length = 25
+    avg_len = 3
+    threshold = 0.9
+    # R²(25) under a 3-bar SMA, on the bar before the window too
+    warmup = length + avg_len - 1
+    state_flags = {'Cross Signal': 'cross_signal'}
+
+    def signals(self, data):
+        _, r2_smoothed = data.compute(panel.r2, 'hl2', self.length, self.avg_len)
+        return {'Cross Signal': panel.crossunder_level(r2_smoothed, self.threshold)}
+
+
+############################
+# R² Trend with RSI Extremes
+############################
+@register
+class R2Rsi1d(Strategy):
+    """
+    Buy when smoothed R² (14 bars, x100) is above 90 and RSI(14) below 30;
+    sell when it is above 90 and RSI(14) above 70.
+    """
+    # main.py
+    name = 'r2_rsi_1d'
+    timeframe = '1d'
+    lookback = timedelta(days=90)
+    recent = pd.Timedelta(days=1)
+    results_csv = 'screener_results_1d.csv'
+    title = 'Daily Screener Results'
+    legend = "Buy: R² > 90 and RSI_14 < 30\nSell: R² > 90 and RSI_14 > 70"
+    # RSI is recursive (Wilder smoothing), so a tail would change its values;
+    # this strategy always uses the full history
+    warmup = None
+
+    def signals(self, data):
+        r2_raw, _ = data.compute(panel.r2, 'Close', 14, 3)
+        r2_smoothed = panel.sma(r2_raw * 100, 3)
+        rsi_14 = data.compute(panel.rsi, 'Close', 14)
+        return {
+            'Buy Signal': ((r2_smoothed > 90) & (rsi_14 < 30)).astype(np.int8),
+            'Sell Signal': ((r2_smoothed > 90) & (rsi_14 > 70)).astype(np.int8),
+        }
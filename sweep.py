@@ -0,0 +1,260 @@
+import argparse
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+import panel
+from barstore import BarStore
+from planner import source, derive_panels
+from replay import load_bars
+from rsquared import window_sum
+
+############################
+# Parameter Sweep
+############################
+# Evaluates grids of lengths, smoothings and thresholds for the three signal
+# families over the whole universe in one pass:
+#
+#     linreg cross   linreg(fast) crossing linreg(slow)              (25/50 in the cross scripts)
+#     R² cross       SMA(R², avg_len) on hl2 crossing under a level  (25/3/0.9 in sellcross.py)
+#     R² + RSI       SMA(R² x100) above a level with RSI extremes    (14/3/90, RSI 14 in main.py)
+#
+# Each price panel is packed once (see panel.py) and its cumulative sums of
+# y, y² and i·y are built once; the moments of every window length in the
+# grid are then differences of those same sums, and each length is computed
+# only once however many combinations use it. Signal counts and forward-
+# return hit statistics come straight from the packed arrays.
+#
+# The shared sums run over the whole history instead of being restarted per
+# block as in rsquared.window_moments, so values can differ from panel.r2 /
+# panel.linreg in the last digits (about 1e-10 on three years of daily bars;
+# the signal counts match). Use replay.py to confirm a chosen combination
+# with the exact screener code.
+#
+#     python sweep.py                            # daily bars from the store
+#     python sweep.py --timeframe 2h --horizon 3 --out sweep_2h.csv
+
+LINREG_GRID = {
+    'fast': [10, 14, 20, 25, 30],
+    'slow': [30, 50, 75, 100],
+}
+R2_CROSS_GRID = {
+    'length': [14, 20, 25, 30],
+    'avg_len': [1, 3, 5],
+    'threshold': [0.8, 0.85, 0.9, 0.95],
+}
+R2_RSI_GRID = {
+    'length': [14, 20, 25],
+    'avg_len': [3],
+    'threshold': [80, 85, 90],
+    'rsi_length': [14],
+    'oversold': [25, 30],
+    'overbought': [70, 75],
+}
+
+# +1: a hit is a rise over the horizon, -1: a fall
+SIDES = {'Buy Signal': 1, 'Sell Signal': -1, 'Cross Signal': -1}
+
+
+class WindowSums:
+    """
+    Cumulative sums of one packed (bars x tickers) array, shared by every
+    window length asked of it.
+    """
+
+    def __init__(self, packed):
+        n = packed.shape[0]
+        valid = ~np.isnan(packed)
+        # Centre each ticker on its first bar to keep the sums small
+        self.ref = np.nan_to_num(packed[0]) if n else np.zeros(packed.shape[1])
+        y = np.where(valid, packed - self.ref, 0.0)
+        self.idx = np.arange(n, dtype=np.float64)[:, None]
+
+        def cumulative(values):
+            out = np.zeros((n + 1,) + packed.shape[1:])
+            np.cumsum(values, axis=0, out=out[1:])
+            return out
+
+        self.sum_y = cumulative(y)
+        self.sum_yy = cumulative(y * y)
+        self.sum_iy = cumulative(self.idx * y)
+        self.count = cumulative(valid)
+        self.shape = packed.shape
+        self._moments = {}
+
+    def moments(self, length):
+        """
+        (mean_y, sxy, syy, sum_yy) of every `length`-bar window, like
+        rsquared.window_moments.
+        """
+        if length not in self._moments:
+            out = [np.full(self.shape, np.nan) for _ in range(4)]
+            if self.shape[0] >= length:
+                def window(csum):
+                    return csum[length:] - csum[:-length]
+                full = window(self.count) == length
+                sum_y, sum_yy, sum_iy = window(self.sum_y), window(self.sum_yy), window(self.sum_iy)
+                # x runs 0..length-1 inside each window
+                start = self.idx[length - 1:] - (length - 1)
+                sum_x = length * (length - 1) / 2.0
+                values = (
+                    sum_y / length + self.ref,
+                    (sum_iy - start * sum_y) - sum_x * sum_y / length,
+                    sum_yy - sum_y * sum_y / length,
+                    sum_yy,
+                )
+                for target, value in zip(out, values):
+                    target[length - 1:] = np.where(full, value, np.nan)
+            self._moments[length] = tuple(out)
+        return self._moments[length]
+
+    def linreg(self, length):
+        mean_y, sxy, _, _ = self.moments(length)
+        sxx = length * (length * length - 1) / 12.0
+        return mean_y + (sxy / sxx) * ((length - 1) / 2.0)
+
+    def r2(self, length):
+        _, sxy, syy, sum_yy = self.moments(length)
+        sxx = length * (length * length - 1) / 12.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            flat = syy <= 1e-12 * np.maximum(sum_yy, 1.0)
+            r2 = np.where(flat, np.nan, (sxy * sxy) / (sxx * syy))
+        return np.minimum(r2, 1.0)
+
+
+def _prev(arr):
+    out = np.full(arr.shape, np.nan)
+    out[1:] = arr[:-1]
+    return out
+
+
+def _stats(flags, forward, side):
+    """
+    Signal count, tickers flagged, hit rate and mean forward return of one
+    (bars x tickers) boolean flag array.
+    """
+    returns = forward[flags]
+    returns = returns[~np.isnan(returns)]
+    return {
+        'signals': int(flags.sum()),
+        'tickers': int(flags.any(axis=0).sum()),
+        'hit_rate': float(np.mean(returns * side > 0)) if len(returns) else np.nan,
+        'mean_return': float(returns.mean()) if len(returns) else np.nan,
+    }
+
+
+def _grid(grid):
+    keys = list(grid)
+    for values in itertools.product(*(grid[key] for key in keys)):
+        yield dict(zip(keys, values))
+
+
+class Sweep:
+    """
+    Runs the parameter grids over one timeframe's (bars x tickers) panels.
+    Indicators are cached per length, so overlapping grids share them.
+    """
+
+    def __init__(self, bars, horizon=5):
+        close = bars['Close'].to_numpy(dtype=np.float64)
+        hl2 = ((bars['High'] + bars['Low']) / 2).to_numpy(dtype=np.float64)
+        # Pack every field with the Close order so rows line up per ticker
+        self.close, order = panel.pack(close)
+        self.hl2 = np.take_along_axis(hl2, order, axis=0)
+        self.sums = {'Close': WindowSums(self.close), 'hl2': WindowSums(self.hl2)}
+        self.horizon = horizon
+        self.forward = np.full(self.close.shape, np.nan)
+        if horizon < self.close.shape[0]:
+            self.forward[:-horizon] = self.close[horizon:] / self.close[:-horizon] - 1
+        self._cache = {}
+
+    def _cached(self, key, func):
+        if key not in self._cache:
+            self._cache[key] = func()
+        return self._cache[key]
+
+    def smoothed_r2(self, source, length, avg_len):
+        return self._cached(('r2', source, length, avg_len),
+                            lambda: window_sum(self.sums[source].r2(length), avg_len) / avg_len)
+
+    def rsi(self, length):
+        # The packed Close is already packed, so panel.rsi leaves its order alone
+        return self._cached(('rsi', length),
+                            lambda: panel.rsi(pd.DataFrame(self.close), length).to_numpy())
+
+    def _row(self, family, params, name, flags):
+        return dict(family=family, **params, signal=name,
+                    **_stats(flags, self.forward, SIDES[name]))
+
+    def linreg_cross(self, grid=LINREG_GRID):
+        rows = []
+        for params in _grid(grid):
+            if params['fast'] >= params['slow']:
+                continue
+            fast = self.sums['Close'].linreg(params['fast'])
+            slow = self.sums['Close'].linreg(params['slow'])
+            prev_fast, prev_slow = _prev(fast), _prev(slow)
+            rows.append(self._row('linreg_cross', params, 'Buy Signal',
+                                  (fast > slow) & (prev_fast <= prev_slow)))
+            rows.append(self._row('linreg_cross', params, 'Sell Signal',
+                                  (fast < slow) & (prev_fast >= prev_slow)))
+        return rows
+
+    def r2_cross(self, grid=R2_CROSS_GRID):
+        rows = []
+        for params in _grid(grid):
+            smoothed = self.smoothed_r2('hl2', params['length'], params['avg_len'])
+            flags = (_prev(smoothed) > params['threshold']) & (smoothed <= params['threshold'])
+            rows.append(self._row('r2_cross', params, 'Cross Signal', flags))
+        return rows
+
+    def r2_rsi(self, grid=R2_RSI_GRID):
+        rows = []
+        for params in _grid(grid):
+            trend = self.smoothed_r2('Close', params['length'], params['avg_len']) * 100 > params['threshold']
+            rsi = self.rsi(params['rsi_length'])
+            rows.append(self._row('r2_rsi', params, 'Buy Signal', trend & (rsi < params['oversold'])))
+            rows.append(self._row('r2_rsi', params, 'Sell Signal', trend & (rsi > params['overbought'])))
+        return rows
+
+    def run(self):
+        """
+        Every grid; one row per (combination, signal).
+        """
+        results = pd.DataFrame(self.linreg_cross() + self.r2_cross() + self.r2_rsi())
+        stats = ['signal', 'signals', 'tickers', 'hit_rate', 'mean_return']
+        return results[[c for c in results.columns if c not in stats] + stats]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep signal parameters over stored history")
+    parser.add_argument('--timeframe', default='1d')
+    parser.add_argument('--horizon', type=int, default=5, help="bars ahead for the hit statistics")
+    parser.add_argument('--days', type=int, help="first extend the store to this many days of history")
+    parser.add_argument('--out', default='sweep_results.csv')
+    args = parser.parse_args()
+
+    tickers = session = None
+    if args.days is not None:
+        from universe import get_sp500_tickers
+        from session import get_session
+        tickers, session = get_sp500_tickers(), get_session()
+    bars = load_bars(source(args.timeframe)[0], BarStore(), tickers, args.days, session)
+    if not bars:
+        print(f"No stored bars for {args.timeframe}.")
+        return
+    bars = derive_panels(bars, args.timeframe)
+
+    started = time.perf_counter()
+    results = Sweep(bars, args.horizon).run()
+    elapsed = time.perf_counter() - started
+    results.to_csv(args.out, index=False)
+    close = bars['Close']
+    print(f"{len(results)} rows for {close.shape[1]} tickers x {close.shape[0]} bars "
+          f"written to {args.out} in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+import panel
+from bars import Bars
+
+
+def frames(seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2026-03-02 09:30', periods=120, freq='h', tz='America/New_York')
+    out = {}
+    for i, ticker in enumerate(['A', 'B', 'C']):
+        ix = index[i * 10:]
+        close = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(ix)))), 2)
+        out[ticker] = pd.DataFrame({'Open': close, 'High': close + 0.5, 'Low': close - 0.5,
+                                    'Close': close, 'Volume': rng.integers(1, 5e7, len(ix))}, index=ix)
+    return out
+
+
+def test_union_axis_and_frame_round_trip():
+    source = frames()
+    bars = Bars.from_frames(source, dtype=np.float64)
+    assert len(bars.index) == 120
+    assert np.isnan(bars['Close'][:20, 2]).all()
+    for ticker, df in source.items():
+        # Bars keeps ns times; pandas may build the source index in us
+        pd.testing.assert_frame_equal(bars.frame(ticker, list(df.columns)), df.astype(float),
+                                      check_freq=False, check_index_type=False)
+
+
+def test_default_is_float64(monkeypatch):
+    monkeypatch.delenv('SCANNER_FLOAT32', raising=False)
+    bars = Bars.from_frames(frames())
+    assert all(values.dtype == np.float64 for values in bars.values.values())
+
+
+def test_float32_prices_give_same_signals(monkeypatch):
+    monkeypatch.setenv('SCANNER_FLOAT32', '1')
+    compact = Bars.from_frames(frames())
+    wide = Bars.from_frames(frames(), dtype=np.float64)
+    assert compact['Close'].dtype == np.float32 and compact['Volume'].dtype == np.float64
+    for bars in (compact, wide):
+        bars.round_prices(2)
+        close = bars.panel('Close')
+        reg1 = bars.set('reg1', panel.linreg(close, 25))
+        reg2 = bars.set('reg2', panel.linreg(close, 50))
+        bars.set_flag('buy_signal', panel.crossover(reg1, reg2))
+    assert compact['reg1'].dtype == np.float64
+    np.testing.assert_array_equal(compact['buy_signal'], wide['buy_signal'])
+    pd.testing.assert_frame_equal(compact.frame('B'), wide.frame('B'))
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from barstore import BarStore
+
+
+def bars(start, periods, freq='h', tz='America/New_York'):
+    index = pd.date_range(start, periods=periods, freq=freq, tz=tz)
+    values = np.arange(periods, dtype=float)
+    return pd.DataFrame({'Open': values, 'Close': values + 0.5, 'Volume': values * 100}, index=index)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BarStore(str(tmp_path))
+
+
+def test_round_trip(store):
+    df = bars('2026-03-02 09:30', 20)
+    store.write('BRK.B', '60m', df)
+    pd.testing.assert_frame_equal(store.read('BRK.B', '60m'), df, check_freq=False)
+    assert store.tickers('60m') == ['BRK.B']
+    assert store.latest_timestamp('BRK.B', '60m') == df.index[-1]
+    assert store.earliest_timestamp('BRK.B', '60m') == df.index[0]
+    assert store.read('MSFT', '60m') is None
+
+
+def test_range_read_with_naive_and_aware_bounds(store):
+    df = bars('2026-03-02', 30, freq='D', tz=None)
+    store.write('A', '1d', df)
+    naive = store.read('A', '1d', start='2026-03-10', end='2026-03-12')
+    aware = store.read('A', '1d', start=pd.Timestamp('2026-03-10', tz='UTC'),
+                       end=pd.Timestamp('2026-03-12', tz='UTC'))
+    assert list(naive.index.day) == [10, 11, 12]
+    pd.testing.assert_frame_equal(naive, aware)
+
+
+def test_append_replaces_from_first_new_bar(store):
+    old = bars('2026-03-02 09:30', 10)
+    store.write('A', '60m', old)
+    new = bars('2026-03-02 16:30', 5) + 1000
+    store.append('A', '60m', new)
+    stored = store.read('A', '60m')
+    expected = pd.concat([old[old.index < new.index[0]], new])
+    pd.testing.assert_frame_equal(stored, expected, check_freq=False)
+
+
+def test_append_with_new_column_falls_back(store):
+    old = bars('2026-03-02 09:30', 10)
+    store.write('A', '60m', old)
+    new = bars('2026-03-02 19:30', 3).assign(reg1=1.0)
+    store.append('A', '60m', new)
+    stored = store.read('A', '60m')
+    assert len(stored) == 13
+    assert stored['reg1'].isna().sum() == 10
+
+
+def test_panels_round_trip(store):
+    a, b = bars('2026-03-02 09:30', 10), bars('2026-03-02 12:30', 4)
+    panels = {field: pd.concat({'A': a[field], 'B': b[field]}, axis=1) for field in a.columns}
+    store.write_panels('60m', panels)
+    loaded = store.read_panels('60m', ['A', 'B'])
+    for field, values in panels.items():
+        pd.testing.assert_frame_equal(loaded[field], values, check_freq=False, check_names=False)
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
+
+import download
+from barstore import BarStore
+from datasource import DataSource
+
+
+class FakeSource(DataSource):
+    """
+    Business-day or hourly bars up to now, priced from the bar time so that
+    overlapping downloads agree. Daily bars are tz-naive, as yfinance
+    returns them.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.calls = []
+
+    def _index(self, start, lookback):
+        now = pd.Timestamp(datetime.now(pytz.utc))
+        begin = now - lookback if start is None else pd.Timestamp(start)
+        if self.interval == '1d':
+            if begin.tzinfo is not None:
+                begin = begin.tz_convert(None)
+            return pd.bdate_range(begin.normalize(), now.tz_convert(None).normalize())
+        return pd.date_range(begin.ceil('h'), now.floor('h'), freq='h')
+
+    def history(self, tickers, interval, start=None, end=None, lookback=None):
+        index = self._index(start, lookback)
+        self.calls.append(('tail' if start is not None else 'full', list(tickers)))
+        price = (index.as_unit('ns').asi8 // 10**9 % 100000).astype(float)
+        panels = {field: pd.DataFrame({t: price + i for i, t in enumerate(tickers)}, index=index)
+                  for field in download.FIELDS}
+        return download._join(panels)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BarStore(str(tmp_path / 'bars'))
+
+
+def test_daily_bars_with_naive_index(store):
+    source = FakeSource('1d')
+    first = download.fetch_history(['A', 'B'], '1d', timedelta(days=90), store, source=source)
+    again = download.fetch_history(['A', 'B'], '1d', timedelta(days=90), store, source=source)
+    assert first.index.tz is None
+    assert [kind for kind, _ in source.calls] == ['full', 'tail']
+    pd.testing.assert_frame_equal(first, again, check_freq=False)
+
+
+def test_short_run_keeps_longer_history(store):
+    source = FakeSource('1d')
+    long = download.fetch_history(['A'], '1d', timedelta(days=400), store, source=source)
+    short = download.fetch_history(['A'], '1d', timedelta(days=90), store, source=source)
+    assert len(short) < len(long)
+    stored = store.read('A', download.raw_partition('1d'))
+    assert stored.index[0] <= long.index[0]
+    # The stored history still covers the long window: a tail download
+    download.fetch_history(['A'], '1d', timedelta(days=400), store, source=source)
+    assert [kind for kind, _ in source.calls] == ['full', 'tail', 'tail']
+
+
+def test_history_starting_after_window_is_refreshed(store):
+    source = FakeSource('1d')
+    download.fetch_history(['A'], '1d', timedelta(days=90), store, source=source)
+    longer = download.fetch_history(['A'], '1d', timedelta(days=400), store, source=source)
+    assert [kind for kind, _ in source.calls] == ['full', 'full']
+    assert longer.index[0] < pd.Timestamp(datetime.now()) - pd.Timedelta(days=390)
+
+
+def test_intraday_tail_is_appended(store):
+    source = FakeSource('60m')
+    first = download.fetch_history(['A', 'B'], '60m', timedelta(days=5), store, source=source)
+    stored = store.read('A', download.raw_partition('60m'))
+    # Drop the newest bars so the next run has a tail to fetch
+    store.write('A', download.raw_partition('60m'), stored.iloc[:-3])
+    again = download.fetch_history(['A', 'B'], '60m', timedelta(days=5), store, source=source)
+    assert source.calls[-1][0] == 'tail'
+    assert again.index.tz is not None
+    pd.testing.assert_frame_equal(first, again, check_freq=False)
+
+
+def test_gap_triggers_full_refresh(store):
+    source = FakeSource('60m')
+    download.fetch_history(['A'], '60m', timedelta(days=5), store, source=source)
+    stored = store.read('A', download.raw_partition('60m'))
+    # A newest stored bar the source never returns does not join up
+    odd = stored.iloc[[-1]].copy()
+    odd.index = odd.index - pd.Timedelta(minutes=30)
+    store.write('A', download.raw_partition('60m'), pd.concat([stored.iloc[:-1], odd]))
+    download.fetch_history(['A'], '60m', timedelta(days=5), store, source=source)
+    assert [kind for kind, _ in source.calls] == ['full', 'tail', 'full']
@@ -0,0 +1,51 @@
+import threading
+import time
+
+import pandas as pd
+from yfinance.exceptions import YFPricesMissingError
+
+from datasource import DataSource
+from fetcher import download_many
+
+
+class FakeSource(DataSource):
+    """
+    Answers after `delay` seconds, recording how many requests overlap.
+    """
+
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.active = self.peak = 0
+        self.lock = threading.Lock()
+
+    def ticker_history(self, ticker, interval, start, end, timeout=None):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            if ticker == 'NONE':
+                raise YFPricesMissingError(ticker, '')
+            if ticker == 'BAD':
+                raise ConnectionError('reset')
+            index = pd.date_range(start, periods=3, freq='D')
+            return pd.DataFrame({'Close': [1.0, 2.0, 3.0]}, index=index)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def test_concurrent_and_bounded():
+    source = FakeSource()
+    tickers = [f'T{i}' for i in range(24)]
+    frames = download_many(tickers, '1d', '2026-03-02', '2026-03-05', concurrency=4, rate=1000,
+                           burst=1000, source=source, limiter=None)
+    assert list(frames) == tickers
+    assert 1 < source.peak <= 4
+
+
+def test_missing_and_failed_tickers():
+    frames = download_many(['A', 'NONE', 'BAD'], '1d', '2026-03-02', '2026-03-05', rate=1000,
+                           burst=1000, retries=0, source=FakeSource(0), limiter=None)
+    assert set(frames) == {'A', 'NONE'}
+    assert frames['NONE'].empty
@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+import pytest
+
+from httpcache import DEFAULT_TTL, expire_after
+
+CHART = 'https://query2.finance.yahoo.com/v8/finance/chart/AAPL'
+
+
+@pytest.mark.parametrize('interval, ttl', [('60m', timedelta(minutes=5)), ('1d', timedelta(hours=1)),
+                                           ('1wk', timedelta(hours=6))])
+def test_expiry_by_interval(interval, ttl):
+    assert expire_after(CHART, {'interval': interval}) == ttl
+    assert expire_after(f'{CHART}?range=1mo&interval={interval}') == ttl
+
+
+def test_other_requests_use_default():
+    assert expire_after('https://en.wikipedia.org/wiki/List_of_S%26P_500_companies') == DEFAULT_TTL
@@ -0,0 +1,22 @@
+from datetime import date
+
+from market import is_trading_day, market_holidays
+
+
+def test_holidays_2026():
+    assert sorted(market_holidays(2026)) == [
+        date(2026, 1, 1), date(2026, 1, 19), date(2026, 2, 16), date(2026, 4, 3),
+        date(2026, 5, 25), date(2026, 6, 19), date(2026, 7, 3), date(2026, 9, 7),
+        date(2026, 11, 26), date(2026, 12, 25),
+    ]
+
+
+def test_saturday_new_year_is_not_made_up():
+    assert date(2021, 12, 31) not in market_holidays(2021)
+    assert date(2022, 1, 1) not in market_holidays(2022)
+
+
+def test_trading_days():
+    assert is_trading_day(date(2026, 11, 27))
+    assert not is_trading_day(date(2026, 11, 26))
+    assert not is_trading_day(date(2026, 11, 28))
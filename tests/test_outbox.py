@@ -0,0 +1,28 @@
+from outbox import split_message
+
+
+def test_short_message_is_one_part():
+    assert split_message('\n\nhead\n\nbody') == ['\n\nhead\n\nbody']
+
+
+def test_split_keeps_rows_and_blank_lines():
+    text = '\n\nhead\n\n' + '\n'.join(f'row {i:03d}' for i in range(30)) + '\n\ntail'
+    parts = split_message(text, 50)
+    assert all(len(part) <= 50 for part in parts)
+    assert parts[0].startswith('\n\nhead\n\nrow 000')
+    assert parts[-1].endswith('\n\ntail')
+    assert '\n'.join(parts).split('\n') == [line for line in text.split('\n')]
+
+
+def test_no_blank_parts_at_a_split():
+    text = 'a' * 40 + '\n\n\n' + 'b' * 40
+    assert split_message(text, 45) == ['a' * 40, 'b' * 40]
+
+
+def test_long_line_is_cut():
+    assert split_message('x' * 120, 50) == ['x' * 50, 'x' * 50, 'x' * 20]
+
+
+def test_length_counts_utf16_units():
+    parts = split_message('\U0001F680' * 30, 50)
+    assert [len(part) for part in parts] == [25, 5]
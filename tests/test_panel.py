@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import panel
+
+
+def random_panel(n=300, cols=4, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2026-01-02 09:30', periods=n, freq='h', tz='America/New_York')
+    close = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.01, (n, cols)), axis=0)), 2)
+    # A late listing, so the per-ticker paths are exercised
+    close[:n // 3, -1] = np.nan
+    return pd.DataFrame(close, index=index, columns=[f'T{i}' for i in range(cols)])
+
+
+def polyfit_linreg(series, length):
+    """
+    Least-squares line through each window, evaluated at its last bar.
+    """
+    x = np.arange(length)
+    out = np.full(len(series), np.nan)
+    for end in range(length, len(series) + 1):
+        slope, intercept = np.polyfit(x, series[end - length:end], 1)
+        out[end - 1] = intercept + slope * (length - 1)
+    return out
+
+
+@pytest.mark.parametrize('length', [25, 50])
+def test_linreg_matches_polyfit(length):
+    close = random_panel()
+    result = panel.linreg(close, length)
+    for ticker in close.columns:
+        series = close[ticker].dropna()
+        expected = polyfit_linreg(series.to_numpy(), length)
+        np.testing.assert_allclose(result[ticker].dropna().to_numpy(),
+                                   expected[~np.isnan(expected)], rtol=1e-10)
+        # Warmup bars stay NaN
+        assert result[ticker].loc[series.index[:length - 1]].isna().all()
+
+
+def test_rsi_bounds_and_warmup():
+    close = random_panel()
+    rsi = panel.rsi(close, 14)
+    assert rsi['T0'].iloc[:14].isna().all()
+    values = rsi.to_numpy()
+    assert np.nanmin(values) >= 0 and np.nanmax(values) <= 100
+
+
+def test_rsi_matches_pandas_ta():
+    ta = pytest.importorskip('pandas_ta')
+    close = random_panel()
+    result = panel.rsi(close, 14)
+    for ticker in close.columns:
+        series = close[ticker].dropna()
+        np.testing.assert_allclose(result[ticker].dropna(), ta.rsi(series, 14).dropna(), rtol=1e-10)
+
+
+def test_crossovers_match_per_ticker_loop():
+    close = random_panel()
+    reg1, reg2 = panel.linreg(close, 25), panel.linreg(close, 50)
+    buy, sell = panel.crossover(reg1, reg2), panel.crossunder(reg1, reg2)
+    assert buy.to_numpy().sum() > 0
+    for ticker in close.columns:
+        rows = close[ticker].notna()
+        fast, slow = reg1[ticker][rows], reg2[ticker][rows]
+        expected_buy = np.where((fast > slow) & (fast.shift(1) <= slow.shift(1)), 1, 0)
+        expected_sell = np.where((fast < slow) & (fast.shift(1) >= slow.shift(1)), 1, 0)
+        np.testing.assert_array_equal(buy[ticker][rows], expected_buy)
+        np.testing.assert_array_equal(sell[ticker][rows], expected_sell)
+
+
+def test_crossunder_level():
+    values = pd.DataFrame({'A': [0.95, 0.92, 0.9, 0.85, 0.95, 0.8]})
+    np.testing.assert_array_equal(panel.crossunder_level(values, 0.9)['A'], [0, 0, 1, 0, 0, 1])
+
+
+def test_tail_gives_same_flags():
+    close = random_panel()
+    recent = pd.Timedelta(hours=20)
+    full = panel.crossover(panel.linreg(close, 25), panel.linreg(close, 50))
+    start = panel.tail_start(close, recent, 50)
+    assert start > 0
+    tail = close.iloc[start:]
+    flags = panel.crossover(panel.linreg(tail, 25), panel.linreg(tail, 50))
+    expected = panel.recent_signals({'Buy': full}, close, recent)
+    pd.testing.assert_frame_equal(panel.recent_signals({'Buy': flags}, tail, recent), expected)
+
+
+def test_recent_signals_per_ticker_window():
+    index = pd.date_range('2026-01-02', periods=4, freq='D')
+    close = pd.DataFrame({'A': [1.0, 2.0, 3.0, 4.0], 'B': [1.0, 2.0, np.nan, np.nan]}, index=index)
+    flags = pd.DataFrame({'A': [1, 0, 1, 0], 'B': [0, 1, 0, 0]}, index=index)
+    result = panel.recent_signals({'Signal': flags}, close, pd.Timedelta(days=1))
+    assert list(zip(result['Ticker'], result['Date'])) == [('A', index[2]), ('B', index[1])]
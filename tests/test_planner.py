@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from planner import derive_panels, plan_downloads
+
+
+def test_requests_merge_per_interval():
+    downloads = plan_downloads([('1h', timedelta(days=30)), ('2h', timedelta(days=30)),
+                                ('4h', timedelta(days=60)), ('1d', timedelta(days=90)),
+                                ('1wk', timedelta(days=365))])
+    assert set(downloads) == {'60m', '1d'}
+    assert downloads['60m']['lookback'] == timedelta(days=60)
+    assert downloads['60m']['timeframes'] == {'1h': timedelta(days=30), '2h': timedelta(days=30),
+                                              '4h': timedelta(days=60)}
+    assert downloads['1d']['lookback'] == timedelta(days=365)
+
+
+def test_intraday_lookback_is_clamped():
+    downloads = plan_downloads([('1h', timedelta(days=3650))])
+    assert downloads['60m']['lookback'] == timedelta(days=730)
+
+
+def test_2h_bars_from_60m():
+    index = pd.date_range('2026-03-02 10:00', periods=6, freq='h', tz='America/New_York')
+    values = pd.DataFrame({'A': np.arange(6.0)}, index=index)
+    bars = {'Open': values, 'High': values + 1, 'Low': values - 1, 'Close': values, 'Volume': values}
+    derived = derive_panels(bars, '2h')
+    assert list(derived['Open']['A']) == [0.0, 2.0, 4.0]
+    assert list(derived['High']['A']) == [2.0, 4.0, 6.0]
+    assert list(derived['Close']['A']) == [1.0, 3.0, 5.0]
+    assert list(derived['Volume']['A']) == [1.0, 5.0, 9.0]
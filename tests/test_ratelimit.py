@@ -0,0 +1,25 @@
+import ratelimit
+from ratelimit import SharedLimiter
+
+
+def test_rate_adapts_and_is_shared(tmp_path):
+    path = str(tmp_path / 'ratelimit.sqlite')
+    first = SharedLimiter('svc', path=path, initial_rate=2.0)
+    second = SharedLimiter('svc', path=path)
+    first.observe(200, 0.1)
+    assert second.rate == 2.0 + ratelimit.INCREASE
+    second.observe(429, 0.1, retry_after='0')
+    assert first.rate == (2.0 + ratelimit.INCREASE) * ratelimit.BACKOFF
+    # Within the cooldown a second 429 does not cut the rate again
+    first.observe(429, 0.1, retry_after='0')
+    assert second.rate == (2.0 + ratelimit.INCREASE) * ratelimit.BACKOFF
+    first.close()
+    second.close()
+
+
+def test_bucket_holds_a_burst(tmp_path):
+    limiter = SharedLimiter('svc', path=str(tmp_path / 'ratelimit.sqlite'), initial_rate=100.0)
+    waits = [limiter.acquire() for _ in range(int(ratelimit.BURST))]
+    assert waits == [0.0] * len(waits)
+    assert limiter.acquire() > 0
+    limiter.close()
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rsquared import R2_TOLERANCE, rolling_r2, smoothed_r2, window_sum
+
+
+def random_walk(n, cols, seed=0, level=100.0):
+    rng = np.random.default_rng(seed)
+    return np.round(level * np.exp(np.cumsum(rng.normal(0, 0.01, (n, cols)), axis=0)), 2)
+
+
+def corrcoef_r2(series, length):
+    """
+    The per-window np.corrcoef the screeners used before rsquared.py.
+    """
+    x = np.arange(length)
+    out = np.full(len(series), np.nan)
+    for end in range(length, len(series) + 1):
+        window = series[end - length:end]
+        if np.isnan(window).any():
+            continue
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out[end - 1] = np.corrcoef(x, window)[0, 1] ** 2
+    return out
+
+
+@pytest.mark.parametrize('length', [14, 25])
+def test_rolling_r2_matches_corrcoef(length):
+    prices = random_walk(600, 3)
+    prices[100:110, 1] = np.nan
+    result = rolling_r2(prices, length)
+    for col in range(prices.shape[1]):
+        np.testing.assert_allclose(result[:, col], corrcoef_r2(prices[:, col], length),
+                                   atol=R2_TOLERANCE, equal_nan=True)
+
+
+def test_rolling_r2_high_price_level():
+    # Cancellation in Σy² grows with the price level; blocks keep it in check
+    prices = random_walk(2000, 1, seed=3, level=50000.0)
+    np.testing.assert_allclose(rolling_r2(prices, 25)[:, 0], corrcoef_r2(prices[:, 0], 25),
+                               atol=R2_TOLERANCE, equal_nan=True)
+
+
+def test_block_size_does_not_change_result():
+    prices = random_walk(500, 2, seed=1)
+    np.testing.assert_allclose(rolling_r2(prices, 25, block=7), rolling_r2(prices, 25),
+                               atol=1e-12, equal_nan=True)
+
+
+def test_flat_window_is_nan():
+    prices = np.r_[np.full(30, 10.0), np.arange(30.0)]
+    result = rolling_r2(prices, 25)
+    assert np.isnan(result[24:30]).all()
+    assert result[-1] == pytest.approx(1.0)
+
+
+def test_keeps_pandas_type():
+    frame = pd.DataFrame(random_walk(60, 2), columns=['A', 'B'])
+    result = rolling_r2(frame, 14)
+    assert isinstance(result, pd.DataFrame)
+    assert list(result.columns) == ['A', 'B']
+    series = rolling_r2(frame['A'], 14)
+    assert isinstance(series, pd.Series)
+    np.testing.assert_allclose(series.to_numpy(), result['A'].to_numpy(), equal_nan=True)
+
+
+def test_smoothed_r2_is_sma_of_r2():
+    series = pd.Series(random_walk(200, 1, seed=2)[:, 0])
+    r2, smoothed = smoothed_r2(series, 25, 3)
+    np.testing.assert_allclose(smoothed, r2.rolling(3).mean(), atol=1e-12, equal_nan=True)
+
+
+def test_window_sum_nan_windows():
+    arr = np.array([[1.0], [2.0], [np.nan], [4.0], [5.0], [6.0]])
+    np.testing.assert_array_equal(window_sum(arr, 2)[:, 0], [np.nan, 3.0, np.nan, np.nan, 9.0, 11.0])
@@ -0,0 +1,36 @@
+import pandas as pd
+
+from signalstore import mark_alerted, only_new, recorder
+
+
+def signals(*dates):
+    return pd.DataFrame({'Ticker': ['A'] * len(dates), 'Date': pd.to_datetime(list(dates), utc=True),
+                         'Buy Signal': [1] * len(dates)})
+
+
+def test_only_new_until_recorded(tmp_path, monkeypatch):
+    monkeypatch.delenv('SCANNER_DEDUP', raising=False)
+    path = str(tmp_path / 'signals.sqlite')
+    now = pd.Timestamp.now(tz='UTC').floor('h')
+    first = signals(now - pd.Timedelta(hours=1))
+    assert len(only_new(first, '1h', 'x', path=path)) == 1
+    # Not recorded yet (e.g. the alert failed): still new
+    assert len(only_new(first, '1h', 'x', path=path)) == 1
+    mark_alerted(first, '1h', 'x', path=path)
+    both = signals(now - pd.Timedelta(hours=1), now)
+    assert list(only_new(both, '1h', 'x', path=path)['Date']) == [now]
+    # Other strategies and timeframes are keyed apart
+    assert len(only_new(first, '1h', 'y', path=path)) == 1
+    assert len(only_new(first, '2h', 'x', path=path)) == 1
+
+
+def test_recorder_and_dedup_switch(tmp_path, monkeypatch):
+    monkeypatch.setenv('SCANNER_DEDUP', '0')
+    path = str(tmp_path / 'signals.sqlite')
+    rows = signals(pd.Timestamp.now(tz='UTC').floor('h'))
+    mark_alerted(rows, '1h', 'x', path=path)
+    assert len(only_new(rows, '1h', 'x', path=path)) == 1
+    monkeypatch.delenv('SCANNER_DEDUP')
+    monkeypatch.chdir(tmp_path)
+    recorder(rows, '1h', 'x')()
+    assert only_new(rows, '1h', 'x').empty
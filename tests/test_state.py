@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+import panel
+from state import IndicatorState, RollingWindow, recent_signals
+
+
+def random_bars(n=200, cols=3, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2026-01-02 10:00', periods=n, freq='2h', tz='America/New_York')
+    close = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.01, (n, cols)), axis=0)), 2)
+    spread = np.abs(rng.normal(0, 0.5, (n, cols)))
+    columns = [f'T{i}' for i in range(cols)]
+    bars = {
+        'Close': pd.DataFrame(close, index=index, columns=columns),
+        'High': pd.DataFrame(np.round(close + spread, 2), index=index, columns=columns),
+        'Low': pd.DataFrame(np.round(close - spread, 2), index=index, columns=columns),
+    }
+    bars['Close'].iloc[:40, -1] = np.nan
+    return bars
+
+
+def full_recompute(bars):
+    close = bars['Close']
+    hl2 = (bars['High'] + bars['Low']) / 2
+    reg1, reg2 = panel.linreg(close, 25), panel.linreg(close, 50)
+    _, r2_smoothed = panel.r2(hl2.where(close.notna()), 25, 3)
+    return {
+        'reg1': reg1,
+        'reg2': reg2,
+        'r2_smoothed': r2_smoothed,
+        'buy_signal': panel.crossover(reg1, reg2),
+        'sell_signal': panel.crossunder(reg1, reg2),
+        'cross_signal': panel.crossunder_level(r2_smoothed, 0.9),
+    }
+
+
+def stacked(values):
+    return values.stack().rename_axis(['Date', 'Ticker'])
+
+
+def check_rows(rows, expected):
+    rows = rows.set_index(['Date', 'Ticker'])
+    assert rows.index.isin(stacked(expected['buy_signal']).index).all()
+    assert rows['reg2'].notna().sum() > 0 and rows['buy_signal'].sum() > 0
+    for column, values in expected.items():
+        want = stacked(values).reindex(rows.index)
+        if column.endswith('_signal'):
+            np.testing.assert_array_equal(rows[column].to_numpy(), want.to_numpy())
+        else:
+            np.testing.assert_allclose(rows[column].to_numpy(), want.to_numpy(), rtol=1e-9, equal_nan=True)
+
+
+def test_rolling_window_matches_polyfit():
+    rng = np.random.default_rng(1)
+    values = 100 + np.cumsum(rng.normal(0, 1, 80))
+    window = RollingWindow(25)
+    for value in values:
+        window.push(value)
+    slope, intercept = np.polyfit(np.arange(25), values[-25:], 1)
+    assert abs(window.linreg() - (intercept + slope * 24)) < 1e-9
+    assert abs(window.r2() - np.corrcoef(np.arange(25), values[-25:])[0, 1] ** 2) < 1e-9
+
+
+def test_incremental_update_matches_full_recompute(tmp_path):
+    bars = random_bars()
+    expected = full_recompute(bars)
+    path = str(tmp_path / 'state.json')
+    rows = []
+    # One run per new bar after the first 120, reloading the state each time
+    for end in [120] + list(range(121, 201)):
+        state = IndicatorState.load(path)
+        rows.append(state.update({f: v.iloc[:end] for f, v in bars.items()}))
+        state.save()
+    # Every bar is evaluated at least once; the latest evaluation counts
+    rows = pd.concat(rows).drop_duplicates(['Ticker', 'Date'], keep='last')
+    assert len(rows) == int(bars['Close'].notna().to_numpy().sum())
+    check_rows(rows, expected)
+
+
+def test_gap_rebuilds_state(tmp_path):
+    bars = random_bars()
+    state = IndicatorState(str(tmp_path / 'state.json'))
+    state.update({f: v.iloc[:100] for f, v in bars.items()})
+    # The committed bar is missing from the next data: start again
+    later = {f: v.drop(v.index[98]) for f, v in bars.items()}
+    rows = state.update(later)
+    assert len(rows) == int(later['Close'].notna().to_numpy().sum())
+
+
+def test_drift_check_rebuilds_sums():
+    window = RollingWindow(25)
+    for value in np.linspace(1e4, 1.1e4, 5000):
+        window.push(value)
+    window.sum_y += 1.0
+    assert window.recompute() > 0
+    assert window.recompute() == 0
+
+
+def test_recent_signals_picks_flagged_rows():
+    index = pd.date_range('2026-01-02', periods=3, freq='D')
+    rows = pd.DataFrame({'Ticker': ['A'] * 3, 'Date': index, 'buy_signal': [1, 0, 1]})
+    picked = recent_signals(rows, {'Buy Signal': 'buy_signal'}, pd.Timedelta(days=1))
+    assert list(picked.columns) == ['Ticker', 'Date', 'Buy Signal']
+    assert list(picked['Date']) == [index[2]]
@@ -1,83 +1,46 @@
 import os
-import pytz
-import requests
-import pandas as pd
-import pandas_ta as ta
-import numpy as np
-import yfinance as yf
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
+from datetime import timedelta
 from dotenv import load_dotenv
+from market import is_us_market_open
+import metrics
 load_dotenv('/home/ubuntu/spxscanner/.env')
 
 ############################
 # 1. Market Open Check
 ############################
-def is_us_market_open():
-    """
-    Checks if the current time is within US market hours (9:30 AM - 4:00 PM ET)
-    and not on weekends.
-    """
-    eastern = pytz.timezone('US/Eastern')
-    now = datetime.now(eastern)
-    if now.weekday() in [5, 6]:  # Saturday and Sunday
-        return False
-    market_open = now.replace(hour=9, minute=30, second=0, microsecond=0)
-    market_close = now.replace(hour=16, minute=0, second=0, microsecond=0)
-    return market_open <= now <= market_close
+# is_us_market_open comes from market.py, which imports nothing heavy.
 
 ############################
 # 2. Telegram Functions
 ############################
-def send_telegram_message(message):
+def send_telegram_message(message, on_delivered=None):
     """
     Sends a given message using the default Telegram bot.
     """
-    bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
-    chat_id = os.getenv("TELEGRAM_CHAT_ID")
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    data = {"chat_id": chat_id, "text": message}
-    requests.post(url, data=data)
+    from outbox import send_telegram_message as queue_message
+    # Queued on the shared outbox: split to Telegram's size cap, paced and
+    # retried in the background, flushed before the script exits
+    with metrics.stage('telegram', items=1):
+        queue_message(message, on_delivered=on_delivered)
 
 def send_cross_telegram_message(message):
     """
     Sends a given message using the cross Telegram bot.
     """
-    cross_bot_token = os.getenv("CROSS_TELEGRAM_BOT_TOKEN")
-    cross_chat_id = os.getenv("CROSS_TELEGRAM_CHAT_ID")
-    url = f"https://api.telegram.org/bot{cross_bot_token}/sendMessage"
-    data = {"chat_id": cross_chat_id, "text": message}
-    requests.post(url, data=data)
+    from outbox import send_telegram_message as queue_message
+    with metrics.stage('telegram', items=1):
+        queue_message(message, channel='cross')
 
 ############################
 # 3. Utility Functions
 ############################
-def get_sp500_tickers():
-    """
-    Fetches the S&P 500 tickers from Wikipedia.
-    """
-    url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    table = soup.find('table', {'id': 'constituents'})
-    return [row.find('td').text.strip() for row in table.find_all('tr')[1:]]
+# get_sp500_tickers comes from universe.py, cached on disk between runs.
 
 ############################
 # 4. Bulk Download Setup using CachedLimiterSession and yf.Tickers
 ############################
-from requests import Session
-from requests_cache import CacheMixin, SQLiteCache
-from requests_ratelimiter import LimiterMixin, MemoryQueueBucket
-from pyrate_limiter import Duration, RequestRate, Limiter
-
-class CachedLimiterSession(CacheMixin, LimiterMixin, Session):
-    pass
-
-session = CachedLimiterSession(
-    limiter=Limiter(RequestRate(2, Duration.SECOND * 5)),  # max 2 requests per 5 seconds
-    bucket_class=MemoryQueueBucket,
-    backend=SQLiteCache("yfinance.cache"),
-)
+# The CachedLimiterSession comes from session.get_session(), built on first
+# use so a closed-market run never opens the SQLite cache.
 
 ############################
 # 5. Main Screener
@@ -86,35 +49,39 @@ def main():
     if not is_us_market_open():
         print("The US market is currently closed. Script execution halted.")
         return
+    metrics.start_run('two')
+    
+    # Heavy imports only once we know there is work to do
+    import pandas as pd
+    import panel
+    from barstore import BarStore
+    from universe import get_sp500_tickers
+    from download import fetch_history
+    from session import get_session
+    from state import IndicatorState, recent_signals
+    import parallel
     
     # Create directory to store data
     os.makedirs('stockdata', exist_ok=True)
+    store = BarStore()
     
-    # Get S&P 500 tickers and save to CSV
-    sp500_tickers = get_sp500_tickers()
-    pd.DataFrame(sp500_tickers, columns=["Ticker"]).to_csv('stockdata/sp500_tickers.csv', index=False)
-    
-    # Read tickers from CSV
-    tickers = pd.read_csv('stockdata/sp500_tickers.csv')['Ticker'].tolist()
+    # Get S&P 500 tickers (cached list, refreshed once a day)
+    tickers = get_sp500_tickers()
     
     # Define the timeframe for bulk downloading 60m data over the past 30 days.
     # We will later resample these bars to 2-hour bars.
     timeframes = {'60m': timedelta(days=30)}
     recent_period = 2  # Look back the last 2 hours for new signals
     
-    # Create a Tickers object with the custom CachedLimiterSession
-    tickers_str = " ".join(tickers)
-    dat = yf.Tickers(tickers_str, session=session)
-    
     # Containers for both screener results
     linreg_results = []   # Linear Regression signals
     r2_results = []       # R² indicator cross signals
     
     # Loop over defined timeframes (only '60m' here)
     for tf, delta in timeframes.items():
-        period_str = f"{delta.days}d"
         try:
-            his_data = dat.history(period=period_str, interval=tf)
+            # Reuse stored bars and download only the missing tail
+            his_data = fetch_history(tickers, tf, delta, store, session=get_session())
         except Exception as e:
             print(f"Error downloading bulk data for interval {tf}: {e}")
             continue
@@ -124,113 +91,57 @@ def main():
         for ticker in tickers:
             if ticker not in available_tickers:
                 print(f"Ticker {ticker} not found in historical data, skipping.")
-                continue
-            try:
-                # Extract data for a single ticker and make a copy
-                df = his_data.xs(ticker, axis=1, level='Ticker').copy()
-                # Flatten the columns if needed
-                df.columns = df.columns.get_level_values(0)
-                
-                # Convert timestamps to Eastern Time.
-                if df.index.tz is None:
-                    df.index = df.index.tz_localize('UTC').tz_convert('US/Eastern')
-                else:
-                    df.index = df.index.tz_convert('US/Eastern')
-                
-                # Round OHLC values to two decimals
-                for col in ['Open', 'High', 'Low', 'Close']:
-                    if col in df.columns:
-                        df.loc[:, col] = df[col].round(2)
-                
-                # Resample the 60m data into 2-hour bars
-                df_resampled = df.resample('2h').agg({
-                    'Open': 'first',
-                    'High': 'max',
-                    'Low': 'min',
-                    'Close': 'last',
-                    'Volume': 'sum'
-                }).dropna()
-                
-                # ---------------------------
-                # Linear Regression Signals
-                # ---------------------------
-                df_resampled['reg1'] = ta.linreg(df_resampled['Close'], length=25)
-                df_resampled['reg2'] = ta.linreg(df_resampled['Close'], length=50)
-                df_resampled['buy_signal'] = np.where(
-                    (df_resampled['reg1'] > df_resampled['reg2']) &
-                    (df_resampled['reg1'].shift(1) <= df_resampled['reg2'].shift(1)),
-                    1, 0
-                )
-                df_resampled['sell_signal'] = np.where(
-                    (df_resampled['reg1'] < df_resampled['reg2']) &
-                    (df_resampled['reg1'].shift(1) >= df_resampled['reg2'].shift(1)),
-                    1, 0
-                )
-                
-                # ---------------------------
-                # R² Indicator Signals
-                # ---------------------------
-                # Compute hl2 as average of High and Low
-                df_resampled['hl2'] = (df_resampled['High'] + df_resampled['Low']) / 2
-                length = 25
-                avg_len = 3
-                threshold = 0.9
-
-                def calc_r2(series):
-                    if len(series) < length:
-                        return np.nan
-                    x = np.arange(length)
-                    r = np.corrcoef(x, series)[0, 1]
-                    return r**2
-
-                df_resampled['r2'] = df_resampled['hl2'].rolling(window=length).apply(calc_r2, raw=False)
-                df_resampled['r2_smoothed'] = df_resampled['r2'].rolling(window=avg_len).mean()
-                df_resampled['cross_signal'] = np.where(
-                    (df_resampled['r2_smoothed'].shift(1) > threshold) &
-                    (df_resampled['r2_smoothed'] <= threshold),
-                    1, 0
-                )
-                
-                # Save the resampled data to CSV for reference
-                csv_filename = f'stockdata/{ticker}_2h_data.csv'
-                df_resampled.to_csv(csv_filename)
-                
-                # ---------------------------
-                # Filter for Recent Signals (Last 2 Hours)
-                # ---------------------------
-                if not df_resampled.empty:
-                    recent_cutoff = df_resampled.index.max() - pd.Timedelta(hours=recent_period)
-                    df_recent = df_resampled[df_resampled.index >= recent_cutoff]
-                    
-                    # Linear regression signals filtering
-                    df_linreg = df_recent[(df_recent['buy_signal'] == 1) | (df_recent['sell_signal'] == 1)]
-                    if not df_linreg.empty:
-                        for idx, row in df_linreg.iterrows():
-                            linreg_results.append({
-                                'Ticker': ticker,
-                                'Date': idx,
-                                'Buy Signal': row['buy_signal'],
-                                'Sell Signal': row['sell_signal']
-                            })
-                    
-                    # R² indicator cross signals filtering
-                    df_r2 = df_recent[df_recent['cross_signal'] == 1]
-                    if not df_r2.empty:
-                        for idx, row in df_r2.iterrows():
-                            r2_results.append({
-                                'Ticker': ticker,
-                                'Date': idx,
-                                'Cross Signal': row['cross_signal']
-                            })
-            except Exception as e:
-                print(f"Failed to process data for ticker {ticker} on timeframe {tf}: {e}")
+        
+        # Split into one (bars x tickers) panel per field, rounded to 2 decimals
+        bars = panel.from_history(his_data)
+        
+        # Convert timestamps to Eastern Time.
+        for field, values in bars.items():
+            if values.index.tz is None:
+                values.index = values.index.tz_localize('UTC').tz_convert('US/Eastern')
+            else:
+                values.index = values.index.tz_convert('US/Eastern')
+        
+        # Resample the 60m data into 2-hour bars (all tickers at once)
+        bars = panel.resample(bars, '2h')
+        close = bars['Close']
+        
+        # ---------------------------
+        # Linear Regression and R² Signals
+        # ---------------------------
+        # linreg(25)/linreg(50) on Close and r2_smoothed (Length=25, AvgLen=3)
+        # on hl2, crossing under 0.9. The saved state is advanced with only the
+        # bars that arrived since the last run.
+        state = IndicatorState.load(f'stockdata/two_{tf}_state.json')
+        # SCANNER_WORKERS > 1 spreads the tickers over a process pool
+        with metrics.stage('indicators', items=close.shape[1]):
+            evaluated = parallel.update(state, bars)
+        state.save()
+        
+        # Save the resampled bars to the bar store for reference
+        store.write_panels('2h', bars)
+        
+        # ---------------------------
+        # Filter for Recent Signals (Last 2 Hours)
+        # ---------------------------
+        recent = pd.Timedelta(hours=recent_period)
+        linreg_results.append(recent_signals(
+            evaluated, {'Buy Signal': 'buy_signal', 'Sell Signal': 'sell_signal'}, recent))
+        r2_results.append(recent_signals(evaluated, {'Cross Signal': 'cross_signal'}, recent))
     
     # Save results to CSV files
-    linreg_df = pd.DataFrame(linreg_results)
-    linreg_df.to_csv('Regression_linreg_screener_results_2h.csv', index=False)
+    linreg_df = pd.concat(linreg_results, ignore_index=True) if linreg_results else pd.DataFrame()
+    with metrics.stage('csv', items=len(linreg_df)):
+        linreg_df.to_csv('Regression_linreg_screener_results_2h.csv', index=False)
+    
+    r2_df = pd.concat(r2_results, ignore_index=True) if r2_results else pd.DataFrame()
+    with metrics.stage('csv', items=len(r2_df)):
+        r2_df.to_csv('Regression_cross_screener_results_2h.csv', index=False)
     
-    r2_df = pd.DataFrame(r2_results)
-    r2_df.to_csv('Regression_cross_screener_results_2h.csv', index=False)
+    # Alert only on signals no earlier run has sent (signalstore.py)
+    from signalstore import only_new, recorder
+    linreg_df = only_new(linreg_df, '2h', 'linreg_cross_2h')
+    r2_df = only_new(r2_df, '2h', 'r2_cross_2h')
     
     # ---------------------------
     # Send Telegram Alerts regardless of signals found
@@ -248,7 +159,7 @@ def main():
         print("No linear regression signals found in the last 2 hours.")
         message_linreg = "2hr Screener Results:\nNo linear regression signals found in the last 2 hours."
     
-    send_telegram_message(message_linreg)
+    send_telegram_message(message_linreg, on_delivered=recorder(linreg_df, '2h', 'linreg_cross_2h'))
     
     # R² Indicator Alert
     if not r2_df.empty:
@@ -263,10 +174,14 @@ def main():
         message_r2 = "2hr Screener Results:\nNo R² cross signals found in the last 2 hours."
     
     # Instead of sending to a different channel, send both messages to the same channel:
-    send_telegram_message(message_r2)
+    send_telegram_message(message_r2, on_delivered=recorder(r2_df, '2h', 'r2_cross_2h'))
 
 ############################
 # 6. Entry Point
 ############################
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        # Export the per-stage timings (see metrics.py)
+        metrics.finish_run()
@@ -1,14 +1,7 @@
 import os
-import time
-import pytz
-import requests
-import pandas as pd
-import pandas_ta as ta
-import numpy as np
-import yfinance as yf
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
+from datetime import timedelta
 from dotenv import load_dotenv
+from market import is_us_market_open
 import logging
 
 # Load environment variables
@@ -33,114 +26,82 @@ logging.basicConfig(
 ############################
 # 1. Market Open Check
 ############################
-def is_us_market_open():
-    """
-    Checks if the current time is within US market hours (9:30 AM - 4:00 PM ET)
-    and not on weekends.
-    """
-    eastern = pytz.timezone('US/Eastern')
-    now = datetime.now(eastern)
-    if now.weekday() in [5, 6]:  # Saturday and Sunday
-        return False
-    market_open = now.replace(hour=9, minute=30, second=0, microsecond=0)
-    market_close = now.replace(hour=16, minute=0, second=0, microsecond=0)
-    return market_open <= now <= market_close
+# is_us_market_open comes from market.py, which imports nothing heavy.
 
 ############################
 # 2. Telegram Functions
 ############################
-def send_telegram_message(message):
+def send_telegram_message(message, on_delivered=None):
     """
     Sends a given message using the default Telegram bot.
     """
-    bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
-    chat_id = os.getenv("TELEGRAM_CHAT_ID")
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    data = {"chat_id": chat_id, "text": message}
-    response = requests.post(url, data=data)
-    logging.info(f"Sent message to default channel. Response status: {response.status_code}")
-    return response
+    from outbox import send_telegram_message as queue_message
+    # Queued on the shared outbox: split to Telegram's size cap, paced and
+    # retried in the background, flushed before the script exits
+    queue_message(message, on_delivered=on_delivered)
+    logging.info("Queued message for the default channel.")
 
-def send_cross_telegram_message(message):
+def send_cross_telegram_message(message, on_delivered=None):
     """
     Sends a given message using the cross Telegram bot.
     """
-    cross_bot_token = os.getenv("CROSS_TELEGRAM_BOT_TOKEN")
-    cross_chat_id = os.getenv("CROSS_TELEGRAM_CHAT_ID")
-    url = f"https://api.telegram.org/bot{cross_bot_token}/sendMessage"
-    data = {"chat_id": cross_chat_id, "text": message}
-    response = requests.post(url, data=data)
-    logging.info(f"Sent message to cross channel. Response status: {response.status_code}")
-    return response
+    from outbox import send_telegram_message as queue_message
+    queue_message(message, channel='cross', on_delivered=on_delivered)
+    logging.info("Queued message for the cross channel.")
 
 ############################
 # 3. Utility Functions
 ############################
-def get_sp500_tickers():
-    """
-    Fetches the S&P 500 tickers from Wikipedia.
-    """
-    url = 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies'
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-    table = soup.find('table', {'id': 'constituents'})
-    tickers = [row.find('td').text.strip() for row in table.find_all('tr')[1:]]
-    logging.info("Fetched S&P 500 tickers")
-    return tickers
+# get_sp500_tickers comes from universe.py, cached on disk between runs.
 
 ############################
 # 4. Bulk Download Setup using CachedLimiterSession and yf.Tickers
 ############################
-from requests import Session
-from requests_cache import CacheMixin, SQLiteCache
-from requests_ratelimiter import LimiterMixin, MemoryQueueBucket
-from pyrate_limiter import Duration, RequestRate, Limiter
-
-class CachedLimiterSession(CacheMixin, LimiterMixin, Session):
-    pass
-
-session = CachedLimiterSession(
-    limiter=Limiter(RequestRate(2, Duration.SECOND * 5)),  # max 2 requests per 5 seconds
-    bucket_class=MemoryQueueBucket,
-    backend=SQLiteCache("yfinance.cache"),
-)
+# The CachedLimiterSession comes from session.get_session(), built inside
+# main() after the market check so a closed-market run never opens the
+# SQLite cache.
 
 ############################
 # 5. Main Screener
 ############################
 def main():
-    # if not is_us_market_open():
-    #     logging.info("The US market is currently closed. Script execution halted.")
-    #     return
+    # SCANNER_MARKET_OPEN=1 forces a run outside market hours for testing
+    if not is_us_market_open():
+        logging.info("The US market is currently closed. Script execution halted.")
+        return
+
+    # Heavy imports only once we know there is work to do
+    import pandas as pd
+    import pandas_ta as ta
+    import numpy as np
+    from rsquared import smoothed_r2
+    from barstore import BarStore
+    from universe import get_sp500_tickers
+    from download import fetch_history
+    from session import get_session
+    session = get_session()
     
     # Create directory to store data
     os.makedirs('stockdata', exist_ok=True)
+    store = BarStore()
     
-    # Get S&P 500 tickers and save to CSV
-    sp500_tickers = get_sp500_tickers()
-    pd.DataFrame(sp500_tickers, columns=["Ticker"]).to_csv('stockdata/sp500_tickers.csv', index=False)
-    
-    # Read tickers from CSV
-    tickers = pd.read_csv('stockdata/sp500_tickers.csv')['Ticker'].tolist()
+    # Get S&P 500 tickers (cached list, refreshed once a day)
+    tickers = get_sp500_tickers()
     
     # Define the timeframe for bulk downloading 60m data over the past 30 days.
     # We will later resample these bars to 2-hour bars.
     timeframes = {'60m': timedelta(days=30)}
     recent_period = 2  # Look back the last 2 hours for new signals
     
-    # Create a Tickers object with the custom CachedLimiterSession
-    tickers_str = " ".join(tickers)
-    dat = yf.Tickers(tickers_str, session=session)
-    
     # Containers for both screener results
     linreg_results = []   # Linear Regression signals
     r2_results = []       # R² indicator cross signals
     
     # Loop over defined timeframes (only '60m' here)
     for tf, delta in timeframes.items():
-        period_str = f"{delta.days}d"
         try:
-            his_data = dat.history(period=period_str, interval=tf)
+            # Reuse stored bars and download only the missing tail
+            his_data = fetch_history(tickers, tf, delta, store, session=session)
             logging.info(f"Downloaded historical data for interval {tf}")
         except Exception as e:
             logging.error(f"Error downloading bulk data for interval {tf}: {e}")
@@ -196,24 +157,15 @@ def main():
                 avg_len = 3
                 threshold = 0.9
 
-                def calc_r2(series):
-                    if len(series) < length:
-                        return np.nan
-                    x = np.arange(length)
-                    r = np.corrcoef(x, series)[0, 1]
-                    return r**2
-
-                df_resampled['r2'] = df_resampled['hl2'].rolling(window=length).apply(calc_r2, raw=False)
-                df_resampled['r2_smoothed'] = df_resampled['r2'].rolling(window=avg_len).mean()
+                df_resampled['r2'], df_resampled['r2_smoothed'] = smoothed_r2(df_resampled['hl2'], length, avg_len)
                 df_resampled['cross_signal'] = np.where(
                     (df_resampled['r2_smoothed'].shift(1) > threshold) &
                     (df_resampled['r2_smoothed'] <= threshold),
                     1, 0
                 )
                 
-                # Save the resampled data to CSV for reference
-                csv_filename = f'stockdata/{ticker}_2h_data.csv'
-                df_resampled.to_csv(csv_filename)
+                # Save the resampled data to the bar store for reference
+                store.write(ticker, '2h', df_resampled)
                 logging.info(f"Processed and saved data for ticker {ticker}")
                 
                 # ---------------------------
@@ -255,6 +207,12 @@ def main():
     r2_df.to_csv('Regression_cross_screener_results_2h.csv', index=False)
     logging.info("Saved R² screener results to CSV.")
     
+    # Alert only on signals no earlier run has sent (signalstore.py);
+    # recorded under this script's own keys, apart from two.py
+    from signalstore import only_new, recorder
+    linreg_df = only_new(linreg_df, '2h', 'twotest_linreg_2h')
+    r2_df = only_new(r2_df, '2h', 'twotest_r2_2h')
+    
     # ---------------------------
     # Send Telegram Alerts regardless of signals found
     # ---------------------------
@@ -271,10 +229,7 @@ def main():
         logging.info("No Linear Regression signals found in the last 2 hours.")
         message_linreg = "2hr Screener Results:\nNo Linear Regression signals found in the last 2 hours."
     
-    send_telegram_message(message_linreg)
-    
-    # Wait for 2 seconds between alerts
-    time.sleep(2)
+    send_telegram_message(message_linreg, on_delivered=recorder(linreg_df, '2h', 'twotest_linreg_2h'))
     
     # R² Indicator Alert
     if not r2_df.empty:
@@ -288,7 +243,7 @@ def main():
         logging.info("No R² signals found in the last 2 hours.")
         message_r2 = "2hr Screener Results:\nNo R² signals found in the last 2 hours."
     
-    send_cross_telegram_message(message_r2)
+    send_cross_telegram_message(message_r2, on_delivered=recorder(r2_df, '2h', 'twotest_r2_2h'))
 
 ############################
 # 6. Entry Point
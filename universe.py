@@ -0,0 +1,123 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import lxml.html
+import pytz
+import requests
+
+############################
+# Cached Index Universes
+############################
+# Index constituents change a few times a quarter, so instead of fetching and
+# parsing the Wikipedia page on every run the ticker list is cached on disk
+# (stockdata/universe/{name}.json) and reused for `ttl`. Once the TTL has
+# passed the page is revalidated with If-None-Match / If-Modified-Since; a 304
+# only refreshes the timestamp. If Wikipedia cannot be reached, the stale list
+# is used rather than failing the run.
+#
+# Tables are parsed with lxml, which is much faster than BeautifulSoup's
+# html.parser on these pages.
+
+CACHE_DIR = os.path.join('stockdata', 'universe')
+DEFAULT_TTL = timedelta(hours=24)
+TIMEOUT = 20
+
+UNIVERSES = {
+    'sp500': {
+        'url': 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies',
+        'table': '//table[@id="constituents"]',
+    },
+    'russell2000': {
+        'url': 'https://en.wikipedia.org/wiki/List_of_Russell_2000_companies',
+        'table': '//table[contains(concat(" ", normalize-space(@class), " "), " wikitable ")'
+                 ' and contains(concat(" ", normalize-space(@class), " "), " sortable ")]',
+    },
+}
+
+
+def parse_tickers(html, table_xpath):
+    """
+    First-column text of every data row of the first table matching
+    `table_xpath`.
+    """
+    tables = lxml.html.fromstring(html).xpath(table_xpath)
+    if not tables:
+        raise ValueError("Could not find the table containing the tickers.")
+    rows = tables[0].xpath('.//tr[td]')
+    return [row.xpath('./td')[0].text_content().strip() for row in rows]
+
+
+def _cache_path(name):
+    return os.path.join(CACHE_DIR, f'{name}.json')
+
+
+def _load(name):
+    try:
+        with open(_cache_path(name), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save(name, cached):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_path(name)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(cached, f)
+    os.replace(tmp_path, path)
+
+
+def get_tickers(name, ttl=DEFAULT_TTL, session=None):
+    """
+    Returns the tickers of universe `name` ('sp500' or 'russell2000'),
+    from the on-disk cache while it is younger than `ttl`.
+    """
+    source = UNIVERSES[name]
+    now = datetime.now(pytz.utc)
+    cached = _load(name)
+    if cached is not None and now - datetime.fromisoformat(cached['fetched_at']) < ttl:
+        return cached['tickers']
+
+    headers = {}
+    if cached is not None:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+    try:
+        response = (session or requests).get(source['url'], headers=headers, timeout=TIMEOUT)
+        if response.status_code == 304 and cached is not None:
+            cached['fetched_at'] = now.isoformat()
+            _save(name, cached)
+            return cached['tickers']
+        response.raise_for_status()
+        tickers = parse_tickers(response.content, source['table'])
+    except Exception as e:
+        if cached is None:
+            raise
+        print(f"Could not refresh the {name} universe, using the cached list: {e}")
+        return cached['tickers']
+
+    _save(name, {
+        'tickers': tickers,
+        'fetched_at': now.isoformat(),
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    })
+    return tickers
+
+
+def get_sp500_tickers(ttl=DEFAULT_TTL):
+    """
+    The S&P 500 tickers, from the cache when fresh.
+    """
+    return get_tickers('sp500', ttl)
+
+
+def get_russell_2000_tickers(ttl=DEFAULT_TTL):
+    """
+    The Russell 2000 tickers, from the cache when fresh.
+    """
+    return get_tickers('russell2000', ttl)